@@ -0,0 +1,29 @@
+"""Index photos, comments and tags by user and time
+
+Revision ID: 3f6a9d2c7b15
+Revises: 8d41f0c6e2b7
+Create Date: 2026-10-19 15:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f6a9d2c7b15'
+down_revision: Union[str, None] = '8d41f0c6e2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_photos_user_id_updated_at', 'photos', ['user_id', 'updated_at'], unique=False)
+    op.create_index('ix_comments_user_id_updated_at', 'comments', ['user_id', 'updated_at'], unique=False)
+    op.create_index('ix_tags_user_id_created_at', 'tags', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tags_user_id_created_at', table_name='tags')
+    op.drop_index('ix_comments_user_id_updated_at', table_name='comments')
+    op.drop_index('ix_photos_user_id_updated_at', table_name='photos')
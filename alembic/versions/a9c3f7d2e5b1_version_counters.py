@@ -0,0 +1,31 @@
+"""Version counters for optimistic concurrency
+
+Revision ID: a9c3f7d2e5b1
+Revises: c7e4a1b8d035
+Create Date: 2026-10-19 19:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3f7d2e5b1'
+down_revision: Union[str, None] = 'c7e4a1b8d035'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # наявні рядки отримують версію 1 зі значення за замовчуванням, без переписування таблиць на PostgreSQL
+    op.add_column('photos', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('tags', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('comments', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('comments', 'version')
+    op.drop_column('tags', 'version')
+    op.drop_column('photos', 'version')
@@ -0,0 +1,34 @@
+"""Soft delete photos
+
+Revision ID: c7e4a1b8d035
+Revises: 3f6a9d2c7b15
+Create Date: 2026-10-19 16:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7e4a1b8d035'
+down_revision: Union[str, None] = '3f6a9d2c7b15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_photos_deleted_at'), 'photos', ['deleted_at'], unique=False)
+    # лічильники адмінського списку рахують лише видимі фото
+    op.drop_index('ix_photos_user_id_updated_at', table_name='photos')
+    op.create_index('ix_photos_user_id_updated_at', 'photos', ['user_id', 'updated_at'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'), sqlite_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_photos_user_id_updated_at', table_name='photos')
+    op.create_index('ix_photos_user_id_updated_at', 'photos', ['user_id', 'updated_at'], unique=False)
+    op.drop_index(op.f('ix_photos_deleted_at'), table_name='photos')
+    op.drop_column('photos', 'deleted_at')
@@ -0,0 +1,26 @@
+"""Photo purge claims
+
+Revision ID: e2b6d4f8a0c3
+Revises: a9c3f7d2e5b1
+Create Date: 2026-10-20 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b6d4f8a0c3'
+down_revision: Union[str, None] = 'a9c3f7d2e5b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('photos', sa.Column('purge_claimed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('photos', 'purge_claimed_at')
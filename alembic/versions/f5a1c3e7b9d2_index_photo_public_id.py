@@ -0,0 +1,26 @@
+"""Index photo public ids
+
+Revision ID: f5a1c3e7b9d2
+Revises: e2b6d4f8a0c3
+Create Date: 2026-10-20 11:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a1c3e7b9d2'
+down_revision: Union[str, None] = 'e2b6d4f8a0c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # імпорт шукає вже вставлені фото пакета за public_id, без індексу кожен пакет сканує всю таблицю
+    op.create_index(op.f('ix_photos_public_id'), 'photos', ['public_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_photos_public_id'), table_name='photos')
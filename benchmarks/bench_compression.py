@@ -0,0 +1,81 @@
+"""
+Bandwidth and CPU cost of gzip and brotli levels on real list payloads.
+
+The photo list and comment list bodies are produced by the application itself and then
+compressed at every level, reporting the compressed size, ratio and time per body.
+
+Usage::
+
+    python -m benchmarks.bench_compression [--photos 100] [--comments 100] [--repeat 50]
+"""
+import argparse
+import gzip
+import json
+import time
+
+import brotli
+
+from benchmarks.common import make_session_factory, seed_photos, make_client, login
+from src.database.models import Comment, Photo
+
+
+GZIP_LEVELS = [1, 4, 6, 9]
+BROTLI_QUALITIES = [0, 2, 4, 6, 9, 11]
+
+
+def time_compression(compress, body: bytes, repeat: int) -> dict:
+    """
+    The time_compression function compresses ``body`` ``repeat`` times and reports the size and mean time.
+
+    :param compress: Callable taking the body and returning the compressed body
+    :param body: bytes: Uncompressed payload
+    :param repeat: int: Number of compressions to average over
+    :return: A dictionary with the compressed size, ratio and milliseconds per body
+    """
+    started = time.perf_counter()
+    for _ in range(repeat):
+        compressed = compress(body)
+    elapsed = (time.perf_counter() - started) / repeat
+    return {
+        "bytes": len(compressed),
+        "ratio": round(len(body) / len(compressed), 2),
+        "ms": round(elapsed * 1000, 3),
+        "mb_per_s": round(len(body) / elapsed / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--comments", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    _, session_factory = make_session_factory()
+    with session_factory() as db:
+        user = seed_photos(db, args.photos)
+        photo_ids = [photo_id for photo_id, in db.query(Photo.id)]
+        db.add_all(Comment(text=f"Comment number {i} about this photo, with a few more words in it",
+                           user_id=user.id, photos_id=photo_ids[i % len(photo_ids)])
+                   for i in range(args.comments))
+        db.commit()
+        user_id = user.id
+
+    client = make_client(session_factory)
+    headers = {**login(client), "Accept-Encoding": "identity"}
+    payloads = {
+        "photo_list": client.get(f"/api/photos/?limit={args.photos}", headers=headers).content,
+        "comment_list": client.get(f"/api/comments/all/{user_id}", headers=headers).content,
+    }
+
+    for name, body in payloads.items():
+        for level in GZIP_LEVELS:
+            result = time_compression(lambda data: gzip.compress(data, compresslevel=level), body, args.repeat)
+            print(json.dumps({"payload": name, "raw_bytes": len(body), "coding": "gzip", "level": level, **result}))
+        for quality in BROTLI_QUALITIES:
+            result = time_compression(lambda data: brotli.compress(data, quality=quality), body, args.repeat)
+            print(json.dumps({"payload": name, "raw_bytes": len(body), "coding": "br", "level": quality, **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Requests per second of ``GET /api/photos/`` for pages of 100 photos.
+
+Usage::
+
+    python -m benchmarks.bench_photo_list [--photos 100] [--duration 5] [--fields id,image_url]
+"""
+import argparse
+import json
+
+from benchmarks.common import make_session_factory, seed_photos, make_client, login, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--photos", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--fields", default=None, help="sparse fieldset passed as ?fields=")
+    args = parser.parse_args()
+
+    _, session_factory = make_session_factory()
+    with session_factory() as db:
+        seed_photos(db, args.photos, args.tags)
+
+    client = make_client(session_factory)
+    headers = login(client)
+    url = f"/api/photos/?limit={args.photos}"
+    if args.fields:
+        url += f"&fields={args.fields}"
+    assert len(client.get(url, headers=headers).json()["photos"]) == args.photos
+
+    result = measure(lambda: client.get(url, headers=headers), duration=args.duration)
+    print(json.dumps({"endpoint": "GET /api/photos/", "photos": args.photos, "fields": args.fields, **result}))
+
+
+if __name__ == "__main__":
+    main()
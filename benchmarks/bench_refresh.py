@@ -0,0 +1,79 @@
+"""
+CPU cost of keeping a session alive: re-login with the password versus the refresh token.
+
+An access token lives 30 minutes, so an active client renews it twice an hour. Before refresh tokens
+every renewal was ``POST /api/auth/login`` with a bcrypt verify; now it is ``POST /api/auth/refresh``
+and the password is checked once per refresh token lifetime. CPU time is measured with
+``time.process_time`` around in-process requests, so it includes the test client on both sides.
+
+Usage::
+
+    python -m benchmarks.bench_refresh [--requests 50]
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import BENCH_PASSWORD, make_session_factory, seed_photos, make_client
+from src.conf.config import settings
+
+ACCESS_TOKEN_MINUTES = 30
+
+
+def cpu_ms(func, requests: int) -> float:
+    """
+    The cpu_ms function returns the mean process CPU time of one call of ``func`` in milliseconds.
+
+    :param func: Callable without arguments making one request
+    :param requests: int: Number of measured calls
+    :return: Mean CPU milliseconds per call
+    """
+    func()
+    started = time.process_time()
+    for _ in range(requests):
+        func()
+    return (time.process_time() - started) / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    _, session_factory = make_session_factory()
+    with session_factory() as db:
+        seed_photos(db, 1)
+    client = make_client(session_factory)
+    credentials = {"username": "bench@example.com", "password": BENCH_PASSWORD}
+
+    def login():
+        response = client.post("/api/auth/login", data=credentials)
+        response.raise_for_status()
+        return response.json()["refresh_token"]
+
+    refresh_token = login()
+
+    def refresh():
+        nonlocal refresh_token
+        response = client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+        response.raise_for_status()
+        refresh_token = response.json()["refresh_token"]
+
+    login_ms = cpu_ms(login, args.requests)
+    refresh_ms = cpu_ms(refresh, args.requests)
+    renewals_per_hour = 60 / ACCESS_TOKEN_MINUTES
+    logins_per_hour = 1 / (settings.refresh_token_ttl_days * 24)
+    before = renewals_per_hour * login_ms
+    after = renewals_per_hour * refresh_ms + logins_per_hour * login_ms
+    print(json.dumps({
+        "cpu_ms_per_login": round(login_ms, 2),
+        "cpu_ms_per_refresh": round(refresh_ms, 2),
+        "cpu_ms_per_session_hour_before": round(before, 2),
+        "cpu_ms_per_session_hour_after": round(after, 2),
+        "sessions_per_core_before": int(3600 * 1000 / before),
+        "sessions_per_core_after": int(3600 * 1000 / after),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
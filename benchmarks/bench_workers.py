@@ -0,0 +1,111 @@
+"""
+Compare the single-process development server with the multi-worker production server.
+
+Seeds a database once, then runs the same load test against ``uvicorn main:app`` and against
+``gunicorn main:app -c python:src.conf.server``, each started as a real server on a local port.
+The default mix is read-heavy, because SQLite serializes writers across processes; use
+``--database-url`` with PostgreSQL to include uploads and comments. Rate limits and Idempotency-Key
+handling are disabled in both servers, so the numbers measure request handling rather than 429 responses.
+
+Usage::
+
+    python -m benchmarks.bench_workers --concurrency 32 --duration 20 --report workers.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.loadtest import drive, parse_mix, summarize
+from benchmarks.seed import seed
+
+
+def server_commands(port: int, workers: int) -> dict:
+    return {
+        "single": ([sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+                    "--no-access-log"], {}),
+        "workers": ([sys.executable, "-m", "gunicorn", "main:app", "-c", "python:src.conf.server"],
+                    {"HOST": "127.0.0.1", "PORT": str(port), "WEB_WORKERS": str(workers),
+                     "PROMETHEUS_MULTIPROC_DIR": tempfile.mkdtemp(prefix="photoshare-metrics-")}),
+    }
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    """
+    The wait_ready function polls the server until it answers, so warm-up is not measured.
+
+    :param url: str: Base url of the server
+    :param timeout: float: Seconds to wait before giving up
+    :return: Nothing
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"Server at {url} did not start within {timeout:.0f} s")
+
+
+async def load(url: str, seeded, args) -> dict:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        started = time.perf_counter()
+        samples = await drive(client, seeded, parse_mix(args.mix), args.concurrency, args.duration, args.seed)
+        elapsed = time.perf_counter() - started
+    everything = [sample for operation in samples.values() for sample in operation]
+    return {"endpoints": {name: summarize(operation, elapsed) for name, operation in sorted(samples.items())},
+            "total": summarize(everything, elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--database-url", default="sqlite:///./loadtest.db")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--photos-per-user", type=int, default=50)
+    parser.add_argument("--mix", default="login=1,list=10,detail=10")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=0, help="gunicorn workers, one per core by default")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--report", default=None)
+    args = parser.parse_args()
+
+    seeded = seed(args.database_url, args.users, args.photos_per_user, seed_value=args.seed)
+    env = {**os.environ, "SQLALCHEMY_DATABASE_URL": args.database_url, "STORAGE_BACKEND": "local",
+           "RATE_LIMIT_ENABLED": "false", "IDEMPOTENCY_ENABLED": "false",
+           "LOCAL_STORAGE_PATH": tempfile.mkdtemp(prefix="photoshare-storage-"),
+           "CLOUDINARY_NAME": "bench", "CLOUDINARY_API_KEY": "bench", "CLOUDINARY_API_SECRET": "bench"}
+    url = f"http://127.0.0.1:{args.port}"
+
+    results = {}
+    for mode, (command, extra_env) in server_commands(args.port, args.workers).items():
+        server = subprocess.Popen(command, env={**env, **extra_env},
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(url)
+            results[mode] = asyncio.run(load(url, seeded, args))
+        finally:
+            # SIGTERM перевіряє й плавну зупинку: сервер має завершитися в межах graceful timeout
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+        total = results[mode]["total"]
+        print(f"{mode:<8} {total['rps']:>8.1f} rps  p50 {total['p50_ms']:>8.1f} ms  "
+              f"p95 {total['p95_ms']:>8.1f} ms  p99 {total['p99_ms']:>8.1f} ms  errors {total['errors']}")
+
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump({"config": vars(args), "results": results}, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
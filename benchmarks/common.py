@@ -0,0 +1,122 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The scripts run the application in-process against a throwaway SQLite database,
+so the settings that ``src.conf.config`` requires get harmless defaults here
+when they are not provided by the environment or the ``.env`` file. Rate limits and
+Idempotency-Key handling are off, the scripts repeat logins and refreshes far beyond the limits.
+"""
+import os
+import time
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("CLOUDINARY_NAME", "bench")
+os.environ.setdefault("CLOUDINARY_API_KEY", "bench")
+os.environ.setdefault("CLOUDINARY_API_SECRET", "bench")
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["IDEMPOTENCY_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from main import app
+from src.database.db import get_db
+from src.database.models import Base, User, Photo, Tag
+from src.services.auth import auth_service
+
+
+BENCH_PASSWORD = "benchpassword"
+
+
+def make_session_factory(url: str = "sqlite:///./bench.db"):
+    """
+    The make_session_factory function recreates the benchmark database and returns a session factory bound to it.
+
+    :param url: str: SQLAlchemy url of the benchmark database
+    :return: A tuple of the engine and the session factory
+    """
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def seed_photos(db, photos: int, tags_per_photo: int = 3, roles: str = "User") -> User:
+    """
+    The seed_photos function creates one user owning ``photos`` photos, each linked to ``tags_per_photo`` tags.
+
+    :param db: Session: Database session to seed
+    :param photos: int: Number of photos to create
+    :param tags_per_photo: int: Number of tags attached to every photo
+    :param roles: str: Role of the seeded user
+    :return: The seeded user
+    """
+    user = User(username="bench", email="bench@example.com",
+                password=auth_service.get_password_hash(BENCH_PASSWORD), roles=roles, is_active=True)
+    db.add(user)
+    db.flush()
+    tags = [Tag(title=f"tag{i}", user_id=user.id) for i in range(max(tags_per_photo * 4, 1))]
+    db.add_all(tags)
+    for i in range(photos):
+        db.add(Photo(
+            image_url=f"https://res.cloudinary.com/bench/image/upload/v1/bench_{i}.png",
+            description=f"Benchmark photo number {i} with a reasonably long description text",
+            user_id=user.id,
+            public_id=f"bench_{i}",
+            tags=[tags[(i + j) % len(tags)] for j in range(tags_per_photo)],
+        ))
+    db.commit()
+    return user
+
+
+def make_client(session_factory) -> TestClient:
+    """
+    The make_client function returns a TestClient whose requests use sessions from ``session_factory``.
+
+    :param session_factory: sessionmaker: Factory bound to the benchmark database
+    :return: A test client for the application
+    """
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    return TestClient(app)
+
+
+def login(client: TestClient, email: str = "bench@example.com") -> dict:
+    """
+    The login function authenticates the seeded user and returns the authorization headers.
+
+    :param client: TestClient: Client used for the login request
+    :param email: str: Email of the user to log in
+    :return: A dictionary with the Authorization header
+    """
+    response = client.post("/api/auth/login", data={"username": email, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def measure(func, duration: float = 5.0, warmup: int = 20) -> dict:
+    """
+    The measure function calls ``func`` repeatedly for ``duration`` seconds and reports the throughput.
+
+    :param func: Callable without arguments to benchmark
+    :param duration: float: Measurement window in seconds
+    :param warmup: int: Number of calls made before measuring
+    :return: A dictionary with the number of calls, requests per second and mean latency in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        func()
+        calls += 1
+    elapsed = time.perf_counter() - started
+    return {"calls": calls, "rps": round(calls / elapsed, 1), "mean_ms": round(elapsed / calls * 1000, 3)}
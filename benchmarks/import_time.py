@@ -0,0 +1,101 @@
+"""
+Report where the application spends its import time.
+
+Imports the module in a fresh interpreter with ``-X importtime`` and sums the self time of every
+module by top-level package, so heavy dependencies on the startup path stand out. The wall-clock
+time of a plain import is measured separately, because ``-X importtime`` adds overhead of its own.
+
+Usage::
+
+    python -m benchmarks.import_time                   # report for main
+    python -m benchmarks.import_time --budget-ms 1500  # fail when the median import is slower
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+
+ENV_DEFAULTS = {
+    "SQLALCHEMY_DATABASE_URL": "sqlite:///./bench.db",
+    "CLOUDINARY_NAME": "bench",
+    "CLOUDINARY_API_KEY": "bench",
+    "CLOUDINARY_API_SECRET": "bench",
+}
+
+
+def environment() -> Dict[str, str]:
+    return {**ENV_DEFAULTS, **os.environ}
+
+
+def import_wall_time(module: str, runs: int) -> List[float]:
+    """
+    The import_wall_time function measures how long a fresh interpreter takes to import ``module``.
+
+    :param module: str: Module to import
+    :param runs: int: Number of interpreters to start
+    :return: The wall-clock time of every run in milliseconds, interpreter start-up included
+    """
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], env=environment(), check=True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def import_profile(module: str) -> Tuple[List[Tuple[str, int, int]], int]:
+    """
+    The import_profile function parses the ``-X importtime`` output of importing ``module``.
+
+    :param module: str: Module to import
+    :return: A list of (module, self us, cumulative us) and the cumulative time of ``module`` in microseconds
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            env=environment(), capture_output=True, text=True, check=True)
+    modules, total = [], 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+        if name.strip() == module:
+            total = int(cumulative_us)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None, help="fail when the median import is slower")
+    args = parser.parse_args()
+
+    modules, total = import_profile(args.module)
+    packages = defaultdict(int)
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] += self_us
+
+    print(f"{'package':<30} {'self ms':>10} {'share':>7}")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<30} {self_us / 1000:>10.1f} {self_us / max(total, 1):>7.1%}")
+    print(f"\n{'slowest modules (cumulative)':<45} {'ms':>10}")
+    for name, _, cumulative_us in sorted(modules, key=lambda item: item[2], reverse=True)[:args.top]:
+        print(f"{name:<45} {cumulative_us / 1000:>10.1f}")
+
+    timings = import_wall_time(args.module, args.runs)
+    median = statistics.median(timings)
+    print(f"\nimport {args.module}: {total / 1000:.1f} ms under -X importtime, "
+          f"median wall time {median:.1f} ms over {args.runs} runs (interpreter start-up included)")
+    if args.budget_ms is not None and median > args.budget_ms:
+        print(f"Over the budget of {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Micro-benchmarks of the hot repository and service functions.
+
+Every database benchmark runs against SQLite databases seeded at several sizes (photos per user),
+each call with a fresh session like a request would get. Results are compared with the stored
+baseline and the run fails when a benchmark is slower than the baseline by more than the threshold.
+
+Usage::
+
+    python -m benchmarks.micro                       # compare with benchmarks/baselines/micro.json
+    python -m benchmarks.micro --sizes 100 --only get_user_photos
+    python -m benchmarks.micro --save                # record a new baseline, partial runs update their entries
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks import common  # noqa: F401 задає налаштування за замовчуванням
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.seed import seed
+from src.database.models import Tag, User
+from src.repository.comments import show_user_comments
+from src.repository.photos import get_user_photos, resolve_tags
+from src.schemas.schemas import TransformBodyModel
+from src.services.auth import auth_service
+from src.services.photos import build_transformation, make_qr_code
+
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+DEFAULT_SIZES = "100,1000,5000"
+
+TRANSFORM_BODY = TransformBodyModel.model_validate({
+    "circle": {"use_filter": True, "height": 400, "width": 400},
+    "effect": {"use_filter": True, "cartoonify": True},
+    "resize": {"use_filter": True, "fill": True, "height": 300, "width": 300},
+    "text": {"use_filter": True, "font_size": 70, "text": "PhotoShare"},
+    "rotate": {"use_filter": True, "width": 400, "degree": 45},
+})
+QR_DATA = "https://res.cloudinary.com/photoshare/image/upload/c_thumb,g_face,h_400,w_400/r_max/e_cartoonify/v1/user@example.com_1_1697000000.png"
+
+
+def timeit(func: Callable, rounds: int, min_round_time: float = 0.1) -> dict:
+    """
+    The timeit function measures the per-call time of ``func``.
+        The number of calls per round is calibrated so that a round lasts at least ``min_round_time``.
+
+    :param func: Callable: Function without arguments to measure
+    :param rounds: int: Number of measured rounds
+    :param min_round_time: float: Minimal duration of one round in seconds
+    :return: A dictionary with the median and minimum per-call time in milliseconds and the number of calls per round
+    """
+    func()
+    calls = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        if time.perf_counter() - started >= min_round_time:
+            break
+        calls *= 2
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(calls):
+            func()
+        timings.append((time.perf_counter() - started) / calls * 1000)
+    return {"median_ms": round(statistics.median(timings), 4), "min_ms": round(min(timings), 4), "calls": calls}
+
+
+def database_benchmarks(size: int, directory: str) -> Dict[str, Callable]:
+    """
+    The database_benchmarks function seeds a database with ``size`` photos per user and returns the benchmarks using it.
+
+    :param size: int: Number of photos of every user
+    :param directory: str: Directory for the SQLite file
+    :return: A dictionary of benchmark names and functions without arguments
+    """
+    url = f"sqlite:///{directory}/micro_{size}.db"
+    seeded = seed(url, users=5, photos_per_user=size, tags=200, tags_per_photo=3, comments_per_photo=2)
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    loop = asyncio.new_event_loop()
+
+    with session_factory() as db:
+        user = db.query(User).filter(User.email == seeded.emails[0]).first()
+        tag_titles = [tag.title for tag in db.query(Tag).order_by(Tag.id).limit(5)]
+    token = auth_service.create_access_token(data=auth_service.token_claims(user), expires_delta=3600)
+
+    def run_get_user_photos():
+        with session_factory() as db:
+            get_user_photos(user.id, size // 2, 20, db)
+
+    def run_resolve_tags():
+        with session_factory() as db:
+            resolve_tags(tag_titles, user, db)
+
+    def run_show_user_comments():
+        with session_factory() as db:
+            loop.run_until_complete(show_user_comments(user.id, db))
+
+    def run_get_current_user():
+        with session_factory() as db:
+            loop.run_until_complete(auth_service.get_current_user(token, db))
+
+    return {
+        "get_user_photos": run_get_user_photos,
+        "create_user_photo.resolve_tags": run_resolve_tags,
+        "show_user_comments": run_show_user_comments,
+        "get_current_user": run_get_current_user,
+    }
+
+
+CPU_BENCHMARKS = {
+    "transform_image.build_transformation": lambda: build_transformation(TRANSFORM_BODY),
+    "create_link_transform_image.make_qr_code": lambda: make_qr_code(QR_DATA),
+}
+
+
+def run(sizes: List[int], rounds: int, only: str | None) -> Dict[str, dict]:
+    """
+    The run function measures all benchmarks, the database ones once per dataset size.
+
+    :param sizes: List[int]: Dataset sizes, photos per user
+    :param rounds: int: Number of measured rounds
+    :param only: str | None: Run only benchmarks whose name contains this text
+    :return: A dictionary of results keyed by ``name[size]``
+    """
+    results = {}
+    for name, func in CPU_BENCHMARKS.items():
+        if not only or only in name:
+            results[name] = timeit(func, rounds)
+            print(f"{name:<45} {results[name]['median_ms']:>10.4f} ms", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix="photoshare-micro-") as directory:
+        for size in sizes:
+            for name, func in database_benchmarks(size, directory).items():
+                if not only or only in name:
+                    key = f"{name}[{size}]"
+                    results[key] = timeit(func, rounds)
+                    print(f"{key:<45} {results[key]['median_ms']:>10.4f} ms", file=sys.stderr)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """
+    The compare function prints the change against the baseline and returns the regressed benchmarks.
+
+    :param results: Dict[str, dict]: Results of this run
+    :param baseline: Dict[str, dict]: Stored baseline results
+    :param threshold: float: Allowed slowdown as a fraction, 0.25 means 25%
+    :return: Names of the benchmarks slower than the baseline by more than the threshold
+    """
+    regressions = []
+    print(f"{'benchmark':<45} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key, result in results.items():
+        if key not in baseline:
+            print(f"{key:<45} {'-':>12} {result['median_ms']:>12.4f} {'new':>8}")
+            continue
+        ratio = result["median_ms"] / baseline[key]["median_ms"]
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<45} {baseline[key]['median_ms']:>12.4f} {result['median_ms']:>12.4f} {ratio - 1:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated photos per user")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--only", default=None, help="run only benchmarks containing this text")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 means 25%%")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    results = run([int(size) for size in args.sizes.split(",")], args.rounds, args.only)
+    if args.save:
+        # часткові запуски (--only, --sizes) оновлюють лише свої записи
+        stored = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as baseline_file:
+                stored = json.load(baseline_file)["results"]
+        with open(args.baseline, "w") as baseline_file:
+            json.dump({"machine": {"python": platform.python_version(), "platform": platform.platform(),
+                                   "processor": platform.machine()},
+                       "results": {**stored, **results}}, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        raise SystemExit(f"No baseline at {args.baseline}, record one with --save")
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
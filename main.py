@@ -1,19 +1,50 @@
-import uvicorn
+import os
+
 from fastapi import FastAPI, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from fastapi.staticfiles import StaticFiles
 from typing import Annotated
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from src.routes.auth import router as auth_router
-from src.routes.photos import router as photos_router
+from sqlalchemy.orm.exc import StaleDataError
 
 from src.database.db import get_db
+from src.conf.config import settings
+from src.services.compression import CompressionMiddleware
+from src.services.etags import stale_data_handler
+from src.services.metrics import MetricsMiddleware
+from src.services.queries import QueryStatsMiddleware
+from src.services.profiling import ProfilingMiddleware
+from src.services.lifespan import lifespan
 
 from src.routes.auth import router as auth_router
+from src.routes.photos import router as photos_router
 from src.routes.comments import router as comment_router
 from src.routes.tags import router as tag_router
 from src.routes.users import router as user_router
-app = FastAPI()
+from src.routes.metrics import router as metrics_router
+
+# orjson серіалізує відповіді значно швидше за стандартний json
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
+
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, interval=settings.profiling_interval)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    maximum_size=settings.compression_maximum_size,
+    gzip_level=settings.compression_gzip_level,
+    brotli_quality=settings.compression_brotli_quality,
+    content_types=settings.compression_content_types,
+    cache_entries=settings.compression_cache_entries,
+    cache_bytes=settings.compression_cache_bytes,
+)
+app.add_middleware(QueryStatsMiddleware, debug=settings.debug)
+# додається останнім, тому охоплює весь запит, включно зі стисненням
+app.add_middleware(MetricsMiddleware)
+# зміни з оптимістичною перевіркою версії, які програли паралельному запиту
+app.add_exception_handler(StaleDataError, stale_data_handler)
 
 # Конфігурація OAuth2 для Swagger
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -25,6 +56,12 @@ app.include_router(photos_router, prefix='/api/photos')
 app.include_router(comment_router, prefix='/api/comments')
 app.include_router(tag_router, prefix='/api/tags')
 app.include_router(user_router, prefix='/api/users')
+app.include_router(metrics_router)
+
+if settings.storage_backend == "local":
+    # локальне сховище зображень замість Cloudinary
+    os.makedirs(settings.local_storage_path, exist_ok=True)
+    app.mount("/storage", StaticFiles(directory=settings.local_storage_path), name="storage")
 
 @app.get("/items/")
 async def read_items(token: Annotated[str, Depends(oauth2_scheme)]):
@@ -80,4 +117,6 @@ async def healthchecker(db: Session = Depends(get_db)):
         
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
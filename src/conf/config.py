@@ -1,3 +1,6 @@
+from functools import lru_cache
+from typing import List
+
 from pydantic_settings import BaseSettings, SettingsConfigDict 
 
 #configuration for variable environment
@@ -9,5 +12,123 @@ class Settings(BaseSettings):
     cloudinary_name: str
     cloudinary_api_key: str
     cloudinary_api_secret: str
-    
-settings = Settings()
+    debug: bool = False
+
+    # image storage: "cloudinary" or "local" for tests, load tests and local development
+    storage_backend: str = "cloudinary"
+    local_storage_path: str = "./storage"
+    local_storage_url: str = "http://localhost:8000/storage"
+
+    # production server (gunicorn -c python:src.conf.server), 0 workers means one per available core
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_workers: int = 0
+    web_keepalive: int = 5
+    web_backlog: int = 2048
+    web_limit_concurrency: int = 0
+    web_max_requests: int = 10000
+    web_max_requests_jitter: int = 1000
+    web_timeout: int = 60
+    web_graceful_timeout: int = 30
+    # proxies whose X-Forwarded-For is trusted for the client IP: comma-separated addresses or "*"
+    web_forwarded_allow_ips: str = "127.0.0.1"
+
+    # connections opened at startup so the first requests do not pay for them
+    db_warmup_connections: int = 2
+
+    # rotating refresh tokens, renewing an access token does not run bcrypt
+    refresh_token_ttl_days: int = 30
+
+    # token versions and active flags cached per worker, changes reach other workers within the ttl
+    auth_cache_ttl: float = 30.0
+    auth_cache_entries: int = 10000
+
+    # sliding-window rate limits "<count>/<period>", the memory backend counts per worker, redis per deployment
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_redis_url: str = "redis://localhost:6379/0"
+    rate_limit_memory_keys: int = 100000
+    rate_limit_login_ip: str = "20/minute"
+    rate_limit_login_account: str = "5/minute"
+    rate_limit_auth_ip: str = "10/minute"
+    rate_limit_upload_user: str = "60/hour"
+    rate_limit_comment_user: str = "300/hour"
+    rate_limit_transform_user: str = "120/hour"
+
+    # Idempotency-Key on photo upload and comment creation: responses kept for the ttl, seconds,
+    # a retry waits for the first request up to the lock timeout; the memory store works per worker
+    idempotency_enabled: bool = True
+    idempotency_backend: str = "memory"
+    idempotency_redis_url: str = "redis://localhost:6379/0"
+    idempotency_memory_keys: int = 10000
+    idempotency_ttl: float = 86400.0
+    idempotency_lock_timeout: float = 30.0
+    # the redis lock of a running request is renewed while it runs and expires this long after a crash,
+    # 0 uses web_timeout, after which gunicorn replaces a stuck worker as well
+    idempotency_lock_ttl: float = 0.0
+
+    # deleted photos are removed from the database and the storage in the background, seconds;
+    # a batch claimed by a worker that died is taken again after the claim ttl
+    photo_purge_enabled: bool = True
+    photo_purge_batch_size: int = 50
+    photo_purge_interval: float = 60.0
+    photo_purge_pause: float = 1.0
+    photo_purge_grace: float = 300.0
+    photo_purge_claim_ttl: float = 600.0
+
+    # photo library export: images downloaded at once, photos read per query and per archive
+    export_concurrency: int = 4
+    export_page_size: int = 100
+    export_max_photos: int = 5000
+
+    # python -m src.services.bulk_import: images uploaded at once and photos inserted per transaction
+    import_workers: int = 8
+    import_batch_size: int = 100
+
+    # GET /metrics is off by default; with a token Prometheus must send it as a bearer credential
+    metrics_enabled: bool = False
+    metrics_token: str = ""
+
+    # database instrumentation
+    slow_query_threshold_ms: float = 200.0
+
+    # event loop lag monitor, seconds
+    loop_monitor_enabled: bool = True
+    loop_monitor_interval: float = 0.1
+    loop_lag_threshold: float = 0.1
+
+    # ?profile=html|speedscope for administrators
+    profiling_enabled: bool = True
+    profiling_interval: float = 0.001
+
+    # response compression
+    compression_minimum_size: int = 500
+    compression_maximum_size: int = 4 * 1024 * 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+    compression_content_types: List[str] = ["application/json", "text/plain", "text/html"]
+    compression_cache_entries: int = 256
+    compression_cache_bytes: int = 16 * 1024 * 1024
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    The get_settings function reads the settings from the environment and the .env file once, on first use.
+
+    :return: The application settings
+    """
+    return Settings()
+
+
+class LazySettings:
+    """
+    Proxy that defers reading the settings to the first attribute access, so modules can be imported
+    (by tools, tests and the worker before it needs them) without parsing the environment.
+    """
+
+    def __getattr__(self, name: str):
+        return getattr(get_settings(), name)
+
+
+settings = LazySettings()
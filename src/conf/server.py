@@ -0,0 +1,83 @@
+"""
+Gunicorn configuration of the production server::
+
+    gunicorn main:app -c python:src.conf.server
+
+Gunicorn supervises one uvicorn worker per core, recycles workers after WEB_MAX_REQUESTS requests
+(with jitter, so they do not restart together) to bound memory growth, and on SIGTERM stops accepting
+connections and lets in-flight requests finish for up to WEB_GRACEFUL_TIMEOUT seconds.
+Behind a load balancer or a platform router set WEB_FORWARDED_ALLOW_IPS to its addresses (or "*" when
+only the router can reach the workers): the client IP, which the per-IP rate limits count by,
+is then read from X-Forwarded-For instead of being the address of the proxy.
+"""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+from src.conf.config import settings
+
+
+def available_cores() -> int:
+    """
+    The available_cores function counts the cores this process may run on, which respects container CPU sets.
+
+    :return: The number of usable cores
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class Worker(UvicornWorker):
+    """
+    Uvicorn worker with the settings gunicorn has no option for.
+    """
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        # понад цю кількість з'єднань воркер відповідає 503 замість того, щоб накопичувати чергу
+        "limit_concurrency": settings.web_limit_concurrency or None,
+        "timeout_graceful_shutdown": settings.web_graceful_timeout,
+    }
+
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_workers or available_cores()
+worker_class = "src.conf.server.Worker"
+keepalive = settings.web_keepalive
+backlog = settings.web_backlog
+max_requests = settings.web_max_requests
+max_requests_jitter = settings.web_max_requests_jitter
+timeout = settings.web_timeout
+graceful_timeout = settings.web_graceful_timeout
+forwarded_allow_ips = settings.web_forwarded_allow_ips
+accesslog = "-"
+
+
+def on_starting(server):
+    """
+    The on_starting function warns in the master about settings that need shared state once there are several workers.
+        The memory idempotency store is per worker: a retry that reaches another worker runs the request again,
+        and concurrent duplicates are not serialized. The application is not imported here, the check reads only settings.
+
+    :param server: Arbiter: The gunicorn master
+    :return: Nothing
+    """
+    if workers > 1 and settings.idempotency_enabled and settings.idempotency_backend == "memory":
+        server.log.warning("IDEMPOTENCY_BACKEND=memory does not protect against duplicates with %d workers, "
+                           "retries that reach another worker run again; set IDEMPOTENCY_BACKEND=redis", workers)
+
+
+def child_exit(server, worker):
+    """
+    The child_exit function removes the metrics files of a worker that exited, so /metrics
+    stops reporting its live gauges.
+
+    :param server: Arbiter: The gunicorn master
+    :param worker: Worker: The exited worker
+    :return: Nothing
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
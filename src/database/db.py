@@ -1,8 +1,11 @@
+import os
+
 from sqlalchemy import create_engine, Column, String, Integer, func
 from sqlalchemy.orm import sessionmaker
 from typing import List
 from sqlalchemy.sql.sqltypes import DateTime
 from src.conf.config import settings
+from src.services.queries import instrument_engine
 
 #connect to DB postgreSQL
 # POSTGRES_DB=postgres
@@ -12,11 +15,29 @@ from src.conf.config import settings
 SQLALCHEMY_DATABASE_URL = settings.sqlalchemy_database_url
 
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# SQLite дозволяє використовувати з'єднання лише в потоці, де його створено,
+# а сесії з get_db створюються в пулі потоків
+connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
+# метрики запитів по роутах, статистика запиту та журнал повільних запитів
+instrument_engine(engine, settings.slow_query_threshold_ms)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def reset_pool_after_fork():
+    """
+    The reset_pool_after_fork function gives a forked worker its own connection pool.
+        The inherited connections are dropped without being closed, because their sockets still belong to the parent.
+
+    :return: Nothing
+    """
+    engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=reset_pool_after_fork)
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
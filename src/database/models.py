@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, func, Table,Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, func, Table,Text, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
@@ -18,6 +18,8 @@ class User(Base):
                    name="user_roles"), default="User")
     created_at = Column('created_at', DateTime, default=func.now())
     is_active = Column(Boolean, default=True)
+    # збільшується при зміні пароля, email чи деактивації, що відкликає всі видані токени
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # відносини для фотографій і користувача
     photos = relationship("Photo", back_populates="user")
@@ -34,6 +36,11 @@ photo_2_tag = Table("photo_2_tag", Base.metadata,
     
 class Photo(Base):
     __tablename__ = "photos"
+    # кількість і остання активність користувача в адмінському списку читаються лише з індексу
+    __table_args__ = (
+        Index("ix_photos_user_id_updated_at", 'user_id', 'updated_at',
+              postgresql_where=text("deleted_at IS NULL"), sqlite_where=text("deleted_at IS NULL")),
+    )
     id = Column(Integer, primary_key=True)
     image_url = Column(String(300))
     description = Column(String(500), nullable=True)
@@ -46,11 +53,21 @@ class Photo(Base):
     user = relationship("User", back_populates="photos")
     image_transform = Column(String(200), nullable=True)
     qr_transform = Column(String(200), nullable=True)
-    public_id = Column(String(100), nullable=True)
+    # за public_id імпорт перевіряє, які фото пакета вже вставлені
+    public_id = Column(String(100), nullable=True, index=True)
+    # фото позначається видаленим одразу, рядок і файли у сховищі прибирає фоновий воркер
+    deleted_at = Column(DateTime, nullable=True, index=True)
+    # коли воркер взяв фото на видалення; файли прибираються поза транзакцією, тож рядок не блокується
+    purge_claimed_at = Column(DateTime, nullable=True)
     comment = relationship('Comment', backref="photos", cascade="all, delete-orphan")
+    # UPDATE перевіряє версію, тож паралельне редагування не перезаписується мовчки, а дає StaleDataError
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (Index("ix_comments_user_id_updated_at", 'user_id', 'updated_at'),)
 
     id = Column(Integer, primary_key=True)
     text = Column(Text, nullable=False)
@@ -59,18 +76,41 @@ class Comment(Base):
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
     photos_id = Column('photos_id', ForeignKey('photos.id', ondelete='CASCADE'), default=None)
     update_status = Column(Boolean, default=False)
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     user = relationship('User', backref="comments")
     post = relationship('Photo', backref="comments")
 
 
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    # зберігається лише sha256 токена, сам токен знає тільки клієнт
+    token_hash = Column(String(64), nullable=False, unique=True)
+    # усі токени, отримані ротацією від одного логіну, мають спільну родину
+    family = Column(String(32), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete='CASCADE'), nullable=False)
+    token_version = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=func.now())
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+
+
 class Tag(Base):
     __tablename__ = "tags"
+    __table_args__ = (Index("ix_tags_user_id_created_at", 'user_id', 'created_at'),)
 
     id = Column(Integer, primary_key=True)
     title = Column(String(100), nullable=False, unique=True)
     created_at = Column(DateTime, default=func.now())
     user_id = Column('user_id', ForeignKey('users.id', ondelete='CASCADE'), default=None)
+    version = Column(Integer, nullable=False, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     user = relationship('User', backref="tags")
     
@@ -1,29 +1,20 @@
 from datetime import datetime
-from sqlalchemy.orm import Session
+from typing import List
+from sqlalchemy import null
+from sqlalchemy.orm import Session, selectinload
 from fastapi import UploadFile
-import cloudinary
-from cloudinary.uploader import upload
-from cloudinary.uploader import destroy
-from sqlalchemy.orm import Session
 from fastapi.exceptions import HTTPException
 
-from src.database.models import Photo, User, Tag
-from src.conf.config import settings
-from src.schemas.schemas import PhotoCreate, PhotoUpdate, PhotoListResponse, TagResponse, PhotoResponse
+from src.database.models import Photo, User, Tag, photo_2_tag
+from src.schemas.schemas import PhotoCreate, PhotoUpdate
+from src.services import storage
 
+# Колонки фото, які можна вибрати через параметр fields
+PHOTO_COLUMNS = ("id", "image_url", "description", "created_at", "updated_at")
+
+# Видалені фото чекають на фоновий purge і не видимі жодному читанню
+NOT_DELETED = Photo.deleted_at.is_(None)
 
-def init_cloudinary():
-    """
-    The init_cloudinary function initializes the cloudinary library with the settings from our Django project's settings.py file.
-    
-    :return: A dictionary of the cloudinary configuration
-    """
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
 
 def get_public_id_from_image_url(image_url: str) -> str:
     """
@@ -38,7 +29,38 @@ def get_public_id_from_image_url(image_url: str) -> str:
     return public_id
 
 
-def create_user_photo(photo: PhotoCreate, image: UploadFile, current_user: User, db: Session) -> PhotoResponse:
+def resolve_tags(tag_titles: List[str], current_user: User, db: Session, commit: bool = True) -> List[Tag]:
+    """
+    The resolve_tags function finds the tags with the given titles, creating the missing ones for the current user.
+        All existing tags are read with one query and the missing ones are inserted with one commit,
+        however many titles there are.
+
+    :param tag_titles: List[str]: Titles of the tags
+    :param current_user: User: Owner of the newly created tags
+    :param db: Session: Access the database
+    :param commit: bool: False only flushes the new tags, so the caller commits them with the rest of its transaction
+    :return: The tags in the order of their titles
+    """
+    titles = list(dict.fromkeys(tag_titles))
+    if not titles:
+        return []
+    query = db.query(Tag).filter(Tag.title.in_(titles))
+    tags = {tag.title: tag for tag in query}
+    missing = [Tag(title=title, user_id=current_user.id) for title in titles if title not in tags]
+    if missing and not commit:
+        # flush видає id новим тегам, а зафіксує їх транзакція викликача
+        db.add_all(missing)
+        db.flush()
+        tags.update((tag.title, tag) for tag in missing)
+    elif missing:
+        db.add_all(missing)
+        db.commit()
+        # commit робить усі теги застарілими, одне читання оновлює їх разом
+        tags = {tag.title: tag for tag in query}
+    return [tags[title] for title in titles]
+
+
+def create_user_photo(photo: PhotoCreate, image: UploadFile, current_user: User, db: Session) -> Photo:
     """
     The create_user_photo function creates a new photo for the current user.
     
@@ -46,15 +68,14 @@ def create_user_photo(photo: PhotoCreate, image: UploadFile, current_user: User,
     :param image: UploadFile: Pass the image file to the function
     :param current_user: User: Get the user id of the current user
     :param db: Session: Access the database
-    :return: A photoresponse object
+    :return: The created photo with its tags loaded
     """
-    init_cloudinary()
     # Створюю унікальний public_id на основі поточного часу
     timestamp = datetime.now().timestamp()
     public_id = f"{current_user.email}_{current_user.id}_{int(timestamp)}"
 
     image_bytes = image.file.read()
-    upload_result = upload(image_bytes, public_id=public_id, overwrite=True)
+    upload_result = storage.upload(image_bytes, public_id=public_id, overwrite=True)
     image_url = upload_result['secure_url']
     photo_data = photo.dict()
     photo_data["image_url"] = image_url
@@ -64,15 +85,7 @@ def create_user_photo(photo: PhotoCreate, image: UploadFile, current_user: User,
     tag_titles = [tag.strip() for tag in photo_data['tags'][0].split(",") if tag.strip()]
     if len(tag_titles) > 5:
         raise HTTPException(status_code=400, detail="Too many tags provided")
-    tag_objects = []
-    for tag_name in tag_titles:
-        tag = db.query(Tag).filter(Tag.title == tag_name).first()
-        if not tag:
-            tag = Tag(title=tag_name, user_id=current_user.id)
-            db.add(tag)
-            db.commit()
-            db.refresh(tag)
-        tag_objects.append(tag)
+    tag_objects = resolve_tags(tag_titles, current_user, db)
     photo_data['tags'] = tag_objects
     db_photo = Photo(**photo_data)
     db_photo.tags = tag_objects
@@ -82,72 +95,168 @@ def create_user_photo(photo: PhotoCreate, image: UploadFile, current_user: User,
     db.commit()
     db.refresh(db_photo)
 
-    
-    photo_response_data = db_photo.__dict__
-    photo_response_data["tags"] = [TagResponse(id=tag.id, title=tag.title, created_at=tag.created_at) for tag in db_photo.tags]
-    photo_response_data.pop("_sa_instance_state", None)
-
-    return PhotoResponse(**photo_response_data)
+    # Рядок серіалізується один раз через response_model роуту
+    return db_photo
    
 
-def get_user_photos(user_id: int, skip: int, limit: int, db: Session) -> PhotoListResponse:
+def get_user_photos(user_id: int, skip: int, limit: int, db: Session) -> List[Photo]:
     """
     The get_user_photos function returns a list of photos for the specified user.
     If no user_id is provided, all photos are returned.
+    Tags of the whole page are loaded with one extra query instead of one query per photo.
     
     
     :param user_id: int: Filter the photos by user_id
     :param skip: int: Skip the first n photos
     :param limit: int: Limit the number of photos returned
     :param db: Session: Pass the database session to the function
-    :return: A list of photoresponse objects
+    :return: A list of photo rows with their tags loaded
     """
 
-    photos_query = db.query(Photo)
+    photos_query = db.query(Photo).options(selectinload(Photo.tags)).filter(NOT_DELETED)
     # Якщо user_id має значення None, не фільтруємо за user_id
     if user_id is not None:
         photos_query = photos_query.filter(Photo.user_id == user_id)
-    photos = photos_query.offset(skip).limit(limit).all()
-    
-    return [PhotoResponse(
-        id=photo.id,
-        image_url=photo.image_url,
-        description=photo.description,
-        created_at=photo.created_at,
-        updated_at=photo.updated_at,
-        tags=[TagResponse(id=tag.id, title=tag.title, created_at=tag.created_at) for tag in photo.tags]
-    ) for photo in photos]
+    return photos_query.order_by(Photo.id).offset(skip).limit(limit).all()
 
 
+def get_user_photos_by_ids(photo_ids: List[int], user_id: int, db: Session) -> List[Photo]:
+    """
+    The get_user_photos_by_ids function returns the visible photos among the given ids.
+        The photos are loaded with one query and all of their tags with one more query.
 
-def get_user_photo_by_id(photo_id: int, db: Session, current_user: User) -> PhotoResponse:
+    :param photo_ids: List[int]: Ids of the photos to load
+    :param user_id: int: Owner the photos must belong to, None for administrators
+    :param db: Session: Pass the database session to the function
+    :return: A list of photo rows with their tags loaded, in no particular order
     """
-    The get_user_photo_by_id function returns a PhotoResponse object for the photo with the specified ID.
-    
+    query = db.query(Photo).options(selectinload(Photo.tags)).filter(Photo.id.in_(photo_ids), NOT_DELETED)
+    if user_id is not None:
+        query = query.filter(Photo.user_id == user_id)
+    return query.all()
+
+
+def get_user_photos_versions(user_id: int, skip: int, limit: int, db: Session, with_tags: bool = True) -> List[tuple]:
+    """
+    The get_user_photos_versions function returns what the ETag of a photo page depends on, without loading full rows.
+        The page is selected exactly like in get_user_photos and joined with the ids and titles of its tags.
+
+    :param user_id: int: Filter the photos by user_id, None means all photos
+    :param skip: int: Skip the first n photos
+    :param limit: int: Limit the number of photos
+    :param db: Session: Pass the database session to the function
+    :param with_tags: bool: Join the tags, False when the representation does not contain them
+    :return: A list of (photo_id, updated_at, tag_id, tag_title) rows
+    """
+    page_query = db.query(Photo.id, Photo.updated_at).filter(NOT_DELETED)
+    if user_id is not None:
+        page_query = page_query.filter(Photo.user_id == user_id)
+    if not with_tags:
+        return [(photo_id, updated_at, None, None)
+                for photo_id, updated_at in page_query.order_by(Photo.id).offset(skip).limit(limit)]
+    page = page_query.order_by(Photo.id).offset(skip).limit(limit).subquery()
+    return (
+        db.query(page.c.id, page.c.updated_at, Tag.id, Tag.title)
+        .outerjoin(photo_2_tag, photo_2_tag.c.photo_id == page.c.id)
+        .outerjoin(Tag, Tag.id == photo_2_tag.c.tag_id)
+        .order_by(page.c.id)
+        .all()
+    )
+
+
+def get_user_photo_version(photo_id: int, user_id: int, db: Session, with_tags: bool = True) -> List[tuple]:
+    """
+    The get_user_photo_version function returns what the ETag of a single photo depends on, without loading the photo.
+
     :param photo_id: int: Specify the photo id
-    :param db: Session: Connect to the database
-    :param current_user: User: Check if the user is an administrator
-    :return: A photoresponse object
+    :param user_id: int: Owner the photo must belong to, None for administrators
+    :param db: Session: Pass the database session to the function
+    :param with_tags: bool: Join the tags, False when the representation does not contain them
+    :return: A list of (photo_id, updated_at, tag_id, tag_title) rows, empty if the photo is not visible
     """
-    if "Administrator" in current_user.roles.split(","):
-        user_id = None  # Адміністратор має доступ до фотографій будь-якого користувача
+    if with_tags:
+        query = db.query(Photo.id, Photo.updated_at, Tag.id, Tag.title).select_from(Photo).outerjoin(Photo.tags)
     else:
-        user_id = current_user.id
+        query = db.query(Photo.id, Photo.updated_at, null(), null())
+    query = query.filter(Photo.id == photo_id, NOT_DELETED)
+    if user_id is not None:
+        query = query.filter(Photo.user_id == user_id)
+    return query.all()
+
+
+def _select_photo_fields(fields: List[str], user_id: int, db: Session):
+    """
+    The _select_photo_fields function builds a query selecting only the requested photo columns.
+        ``id`` and ``updated_at`` are always selected because the ETag of the representation depends on them.
+
+    :param fields: List[str]: Requested fields of PhotoResponse
+    :param user_id: int: Owner the photos must belong to, None for administrators
+    :param db: Session: Pass the database session to the function
+    :return: A query of column rows
+    """
+    columns = {"id", "updated_at"} | {field for field in fields if field != "tags"}
+    query = db.query(*[getattr(Photo, column) for column in PHOTO_COLUMNS if column in columns]).filter(NOT_DELETED)
+    if user_id is not None:
+        query = query.filter(Photo.user_id == user_id)
+    return query
 
-    photo = db.query(Photo).filter(Photo.id == photo_id, (Photo.user_id == user_id) | (user_id == None)).first()
-    if not photo:
-        return None
 
-    return PhotoResponse(
-        id=photo.id,
-        image_url=photo.image_url,
-        description=photo.description,
-        created_at=photo.created_at,
-        updated_at=photo.updated_at,
-        tags=[TagResponse(id=tag.id, title=tag.title, created_at=tag.created_at) for tag in photo.tags]
+def _attach_tags(photos: List[dict], db: Session) -> List[dict]:
+    """
+    The _attach_tags function loads the tags of the given photo rows with a single query and adds them as ``tags``.
+
+    :param photos: List[dict]: Photo rows containing at least ``id``
+    :param db: Session: Pass the database session to the function
+    :return: The same rows, each with a list of tag dictionaries
+    """
+    by_id = {photo["id"]: photo for photo in photos}
+    for photo in photos:
+        photo["tags"] = []
+    if not by_id:
+        return photos
+    tags = (
+        db.query(photo_2_tag.c.photo_id, Tag.id, Tag.title, Tag.created_at)
+        .join(Tag, Tag.id == photo_2_tag.c.tag_id)
+        .filter(photo_2_tag.c.photo_id.in_(by_id))
+        .order_by(photo_2_tag.c.id)
     )
+    for photo_id, tag_id, title, created_at in tags:
+        by_id[photo_id]["tags"].append({"id": tag_id, "title": title, "created_at": created_at})
+    return photos
+
+
+def get_user_photos_fields(user_id: int, skip: int, limit: int, fields: List[str], db: Session) -> List[dict]:
+    """
+    The get_user_photos_fields function returns a page of photos projected to the requested fields.
+        Only the needed columns are selected and the tags are queried only when ``tags`` is requested.
+
+    :param user_id: int: Filter the photos by user_id, None means all photos
+    :param skip: int: Skip the first n photos
+    :param limit: int: Limit the number of photos returned
+    :param fields: List[str]: Requested fields of PhotoResponse
+    :param db: Session: Pass the database session to the function
+    :return: A list of dictionaries with the selected columns plus ``id`` and ``updated_at``
+    """
+    query = _select_photo_fields(fields, user_id, db).order_by(Photo.id).offset(skip).limit(limit)
+    photos = [dict(row._mapping) for row in query]
+    return _attach_tags(photos, db) if "tags" in fields else photos
 
 
+def get_user_photo_fields(photo_id: int, user_id: int, fields: List[str], db: Session) -> dict | None:
+    """
+    The get_user_photo_fields function returns one photo projected to the requested fields.
+
+    :param photo_id: int: Specify the photo id
+    :param user_id: int: Owner the photo must belong to, None for administrators
+    :param fields: List[str]: Requested fields of PhotoResponse
+    :param db: Session: Pass the database session to the function
+    :return: A dictionary with the selected columns, or None if the photo is not visible
+    """
+    row = _select_photo_fields(fields, user_id, db).filter(Photo.id == photo_id).first()
+    if row is None:
+        return None
+    photo = dict(row._mapping)
+    return _attach_tags([photo], db)[0] if "tags" in fields else photo
 
 
 def get_user_photo_by_id(photo_id: int, db: Session) -> Photo:
@@ -164,10 +273,10 @@ def get_user_photo_by_id(photo_id: int, db: Session) -> Photo:
     :return: A photo object, which is a row from the database
     """
     
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = db.query(Photo).filter(Photo.id == photo_id, NOT_DELETED).first()
     return photo
 
-def update_user_photo(photo: Photo, updated_photo: PhotoUpdate, current_user: User, db: Session) -> PhotoResponse:
+def update_user_photo(photo: Photo, updated_photo: PhotoUpdate, current_user: User, db: Session) -> Photo:
     """
     The update_user_photo function updates a photo in the database.
         Args:
@@ -180,7 +289,7 @@ def update_user_photo(photo: Photo, updated_photo: PhotoUpdate, current_user: Us
     :param updated_photo: PhotoUpdate: Update the photo
     :param current_user: User: Get the user id of the current user
     :param db: Session: Access the database
-    :return: A photoresponse object
+    :return: The updated photo
     """
     if updated_photo.description is not None:
         photo.description = updated_photo.description
@@ -197,20 +306,16 @@ def update_user_photo(photo: Photo, updated_photo: PhotoUpdate, current_user: Us
 
     photo.updated_at = datetime.utcnow()  # Оновлення поля updated_at
     db.commit()
-    return PhotoResponse(
-        id=photo.id,
-        image_url=photo.image_url,
-        description=photo.description,
-        created_at=photo.created_at,
-        updated_at=photo.updated_at,
-        tags=[TagResponse(id=tag.id, title=tag.title, created_at=tag.created_at) for tag in photo.tags]
-    )
+    return photo
 
 
 
 async def delete_user_photo(photo_id: int, user_id: int, is_admin: bool, db: Session):
     """
-    The delete_user_photo function deletes a photo from the database and Cloudinary.
+    The delete_user_photo function marks a photo as deleted.
+        The photo disappears from all reads at once; its row, comments, tags links and the images in the
+        storage are removed later in small batches by the purge worker (src.services.purge),
+        so the request does not wait for the storage and does not lock the tables.
         Args:
             photo_id (int): The id of the photo to be deleted.
             user_id (int): The id of the user who is deleting this photo.
@@ -224,25 +329,15 @@ async def delete_user_photo(photo_id: int, user_id: int, is_admin: bool, db: Ses
     :param db: Session: Pass the database session to the function
     :return: The deleted photo
     """
-    photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    photo = db.query(Photo).options(selectinload(Photo.tags)).filter(Photo.id == photo_id, NOT_DELETED).first()
     
     if not photo:
         return None  # Фото не знайдено
     
     if not is_admin and user_id != photo.user_id:
         raise HTTPException(status_code=403, detail="Permission denied")  # Користувач може видаляти лише свої фото
-    
-    # Видалення фотографії з Cloudinary за її public_id
-    public_id = get_public_id_from_image_url(photo.image_url)
-
-    init_cloudinary()
-    destroy(public_id)
-    destroy("PhotoshareApp_tr/" + public_id)
-    destroy("PhotoshareApp_tr/" + public_id + '_qr')
 
-    db.delete(photo)
+    photo.deleted_at = datetime.utcnow()
     db.commit()
     
     return photo
-
-
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from sqlalchemy.orm import Session
+
+from src.conf.config import settings
+from src.database.models import RefreshToken, User
+
+
+def hash_token(token: str) -> str:
+    """
+    The hash_token function returns the sha256 digest stored instead of the refresh token.
+        Refresh tokens are long random strings, so a fast hash is enough and keeps the lookup cheap.
+
+    :param token: str: The refresh token
+    :return: The hex digest of the token
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def issue_refresh_token(user: User, db: Session, family: str | None = None) -> str:
+    """
+    The issue_refresh_token function adds a new refresh token of the user to the session.
+        The caller commits the session.
+
+    :param user: User: Owner of the token
+    :param db: Session: Pass the database session to the function
+    :param family: str | None: Family of the rotated token, a new family for a login
+    :return: The refresh token to hand to the client
+    """
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        token_hash=hash_token(token),
+        family=family or secrets.token_hex(16),
+        user_id=user.id,
+        token_version=user.token_version or 0,
+        expires_at=datetime.utcnow() + timedelta(days=settings.refresh_token_ttl_days),
+    ))
+    return token
+
+
+async def create_refresh_token(user: User, db: Session) -> str:
+    """
+    The create_refresh_token function starts a new token family for a user who has just logged in.
+
+    :param user: User: The user who logged in
+    :param db: Session: Pass the database session to the function
+    :return: The refresh token to hand to the client
+    """
+    token = issue_refresh_token(user, db)
+    db.commit()
+    return token
+
+
+async def revoke_family(family: str, db: Session) -> None:
+    """
+    The revoke_family function revokes every token of a family, which logs out the session it belongs to.
+
+    :param family: str: Family to revoke
+    :param db: Session: Pass the database session to the function
+    :return: Nothing
+    """
+    db.query(RefreshToken).filter(RefreshToken.family == family, RefreshToken.revoked_at.is_(None)) \
+        .update({"revoked_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+async def rotate_refresh_token(token: str, db: Session) -> Tuple[User, str] | None:
+    """
+    The rotate_refresh_token function exchanges a refresh token for a new one of the same family.
+        A token can be used once. Presenting a used token means it was copied, so the whole family is
+        revoked and both the thief and the legitimate client have to log in again.
+        Tokens issued before a password change or deactivation are refused through the token version.
+
+    :param token: str: The refresh token presented by the client
+    :param db: Session: Pass the database session to the function
+    :return: The user and the new refresh token, or None when the token is not valid
+    """
+    record = db.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(token)).first()
+    if record is None or record.revoked_at is not None:
+        return None
+    now = datetime.utcnow()
+    # позначаємо токен використаним атомарно, щоб два паралельні запити не отримали дві нові пари
+    marked = db.query(RefreshToken).filter(RefreshToken.id == record.id, RefreshToken.used_at.is_(None)) \
+        .update({"used_at": now}, synchronize_session=False)
+    if not marked:
+        await revoke_family(record.family, db)
+        return None
+    if record.expires_at <= now:
+        db.commit()
+        return None
+
+    user = db.get(User, record.user_id)
+    if user is None or not user.is_active or (user.token_version or 0) != record.token_version:
+        db.commit()
+        await revoke_family(record.family, db)
+        return None
+    new_token = issue_refresh_token(user, db, record.family)
+    db.commit()
+    return user, new_token
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func, literal_column, or_, select, update
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
-from src.database.models import User
+from sqlalchemy.sql.functions import FunctionElement
+from src.database.models import Comment, Photo, Tag, User
 from src.schemas.schemas import UserModel
 
 async def get_user_by_id(user_id: int, db: Session) -> User:
@@ -50,3 +55,131 @@ async def create_user(user: UserModel, db: Session):
     db.refresh(db_user)
     return db_user
 
+
+
+class greatest(FunctionElement):
+    """
+    The largest of the arguments that are not NULL, NULL when all of them are.
+    """
+    inherit_cache = True
+
+
+@compiles(greatest)
+def _greatest_default(element, compiler, **kw):
+    return f"greatest({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest, "sqlite")
+def _greatest_sqlite(element, compiler, **kw):
+    # max() у SQLite повертає NULL, якщо NULL хоча б один аргумент, тому кожен аргумент доповнюємо рештою
+    args = [compiler.process(arg, **kw) for arg in element.clauses]
+    if len(args) == 1:
+        return args[0]
+    rotated = [", ".join(args[i:] + args[:i]) for i in range(len(args))]
+    return "max(" + ", ".join(f"coalesce({arg})" for arg in rotated) + ")"
+
+
+def user_stats_columns() -> dict:
+    """
+    The user_stats_columns function builds the per-user aggregates of the admin listing as correlated subqueries.
+        Every subquery is answered from the (user_id, time) index of its table, and only for the users the database
+        has to look at: the rows of the page, or all filtered users when the page is sorted by an aggregate.
+
+    :return: A dict of labeled column expressions by field name
+    """
+    # видалені фото, що чекають на purge, не рахуються
+    visible = Photo.deleted_at.is_(None)
+    photos_count = select(func.count()).where(Photo.user_id == User.id, visible).scalar_subquery()
+    comments_count = select(func.count()).where(Comment.user_id == User.id).scalar_subquery()
+    tags_count = select(func.count()).where(Tag.user_id == User.id).scalar_subquery()
+    last_photo = select(func.max(Photo.updated_at)).where(Photo.user_id == User.id, visible).scalar_subquery()
+    last_comment = select(func.max(Comment.updated_at)).where(Comment.user_id == User.id).scalar_subquery()
+    last_tag = select(func.max(Tag.created_at)).where(Tag.user_id == User.id).scalar_subquery()
+    return {
+        "photos_count": photos_count.label("photos_count"),
+        "comments_count": comments_count.label("comments_count"),
+        "tags_count": tags_count.label("tags_count"),
+        "last_activity": greatest(last_photo, last_comment, last_tag).label("last_activity"),
+    }
+
+
+async def get_users_with_stats(skip: int, limit: int, sort: str, descending: bool, db: Session,
+                               role: Optional[str] = None, is_active: Optional[bool] = None) -> Tuple[List[dict], int]:
+    """
+    The get_users_with_stats function returns a page of users with their photo, comment and tag counts,
+    the time of their last activity and the number of users matching the filters, all in one query.
+
+    :param skip: int: Number of users to skip
+    :param limit: int: Maximum number of users to return
+    :param sort: str: Field to sort by, a user column or one of the aggregates
+    :param descending: bool: Sort from the largest value
+    :param db: Session: Pass in the database session to the function
+    :param role: Optional[str]: Return only the users with this role
+    :param is_active: Optional[bool]: Return only active or only deactivated users
+    :return: A tuple of the users as dicts and the total number of matching users
+    """
+    filters = []
+    if role is not None:
+        filters.append(User.roles == role)
+    if is_active is not None:
+        filters.append(User.is_active.is_(is_active))
+
+    stats = user_stats_columns()
+    # загальна кількість - некорельований підзапит, база рахує його один раз
+    total = select(func.count(User.id)).where(*filters).scalar_subquery().label("total")
+    # агрегати сортуємо за їхньою назвою у списку вибірки, щоб не обчислювати підзапити вдруге
+    order = literal_column(sort) if sort in stats else getattr(User, sort)
+    order = order.desc().nulls_last() if descending else order.asc().nulls_first()
+    tiebreak = User.id.desc() if descending else User.id.asc()
+
+    rows = (
+        db.query(User.id, User.username, User.email, User.roles, User.is_active, User.created_at,
+                 *stats.values(), total)
+        .filter(*filters)
+        .order_by(order, tiebreak)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+    if not rows:
+        # сторінка за межами списку не несе total, тож лише тут потрібен окремий запит
+        count = 0 if skip == 0 else db.query(func.count(User.id)).filter(*filters).scalar()
+        return [], count
+    users = [row._asdict() for row in rows]
+    for user in users:
+        del user["total"]
+    return users, rows[0].total
+
+
+async def bulk_update_users(ids: List[int], db: Session, is_active: Optional[bool] = None,
+                            roles: Optional[str] = None) -> Tuple[List[int], List[int]]:
+    """
+    The bulk_update_users function sets the active flag and the role of many users with one UPDATE.
+        Only the users that actually change are written. Deactivation and a role change also bump
+        token_version, which revokes the issued access and refresh tokens of those users.
+        The caller commits and invalidates the cached token versions of the updated users.
+
+    :param ids: List[int]: Ids of the users to change
+    :param db: Session: Pass in the database session to the function
+    :param is_active: Optional[bool]: The new active flag, None leaves it unchanged
+    :param roles: Optional[str]: The new role, None leaves it unchanged
+    :return: A tuple of the ids of the updated users and the ids of the existing users
+    """
+    values, changed = {}, []
+    if is_active is not None:
+        values["is_active"] = is_active
+        changed.append(User.is_active.is_distinct_from(is_active))
+    if roles is not None:
+        values["roles"] = roles
+        changed.append(User.roles != roles)
+    if is_active is False or roles is not None:
+        values["token_version"] = User.token_version + 1
+
+    existing = [row.id for row in db.query(User.id).filter(User.id.in_(ids))]
+    if not existing or not changed:
+        return [], existing
+    updated = db.execute(
+        update(User).where(User.id.in_(existing), or_(*changed)).values(**values).returning(User.id),
+        execution_options={"synchronize_session": False},
+    ).scalars().all()
+    return updated, existing
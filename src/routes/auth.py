@@ -4,15 +4,23 @@ from sqlalchemy.orm import Session
 from typing import Dict
 from src.database.db import get_db
 from src.database.models import User
-from src.schemas.schemas import UserModel, UserResponse, TokenModel, UserDb
+from src.schemas.schemas import UserModel, UserResponse, TokenModel, UserDb, RefreshTokenModel
 from src.repository import users as repository_users
+from src.repository import tokens as repository_tokens
 from src.services.auth import auth_service
+from src.services.rate_limit import AccountRateLimiter, RateLimiter
 
 router = APIRouter(tags=["auth"])
 security = HTTPBearer()
 
+# bcrypt на кожну спробу входу робить підбір паролів дорогим і для сервера
+login_ip_limit = RateLimiter("login", "rate_limit_login_ip")
+login_account_limit = AccountRateLimiter("login", "rate_limit_login_account")
+auth_ip_limit = RateLimiter("auth", "rate_limit_auth_ip")
+
 #Реєстрація
-@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post("/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(auth_ip_limit)])
 async def signup(body: UserModel, db: Session = Depends(get_db)):
     """
     **The signup function creates a new user in the database.**
@@ -54,7 +62,8 @@ async def signup(body: UserModel, db: Session = Depends(get_db)):
 
 
 #Логін
-@router.post("/login", response_model=TokenModel)
+@router.post("/login", response_model=TokenModel,
+             dependencies=[Depends(login_ip_limit), Depends(login_account_limit)])
 async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):  # Додайте залежність db
     """
     **The login function is used to authenticate a user.**🚂
@@ -74,8 +83,38 @@ async def login(body: OAuth2PasswordRequestForm = Depends(), db: Session = Depen
         raise HTTPException(status_code=400, detail="User is not active")
 
     # Генерація JWT токена
-    access_token = auth_service.create_access_token(data={"sub": user.email, "message": "Logged successfully"})
+    access_token = auth_service.create_access_token(
+        data={**auth_service.token_claims(user), "message": "Logged successfully"}
+    )
+    refresh_token = await repository_tokens.create_refresh_token(user, db)
 
     # Повертаємо об'єкт відповіді
-    return {"access_token": access_token, "token_type": "bearer", "message": "Logged successfully"}
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer",
+            "message": "Logged successfully"}
+
+
+#Оновлення токена
+@router.post("/refresh", response_model=TokenModel, dependencies=[Depends(auth_ip_limit)])
+async def refresh(body: RefreshTokenModel, db: Session = Depends(get_db)):
+    """
+    **The refresh function exchanges a refresh token for a new access token and a new refresh token.**
+        **The password is not checked again, so renewing a session does not pay for bcrypt.**
+        **Every refresh token works once: reusing one revokes the whole session and returns `401`.🔁**
+
+    ___
+
+    - **:param**⚡ `body:` `RefreshTokenModel:` The refresh token received from login or the previous refresh\n
+    - **:param**⚡ `db:` `Session:` Pass the database connection to the function\n
+    **:return:** A new pair of access and refresh tokens
+    """
+    rotated = await repository_tokens.rotate_refresh_token(body.refresh_token, db)
+    if rotated is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    user, refresh_token = rotated
+
+    access_token = auth_service.create_access_token(
+        data={**auth_service.token_claims(user), "message": "Token refreshed"}
+    )
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer",
+            "message": "Token refreshed"}
 
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 
@@ -6,7 +6,10 @@ from src.database.db import get_db
 from src.schemas.schemas import CommentBase, CommentUpdate, CommentModel
 from src.repository import comments as repository_comments
 from src.services.auth import auth_service
+from src.services import etags
 from src.conf import messages as message
+from src.services.idempotency import Idempotency, IdempotentRequest
+from src.services.rate_limit import UserRateLimiter
 from src.services.roles import RoleChecker
 from src.database.models import User
 from src.schemas.schemas import Role
@@ -19,12 +22,17 @@ allowed_create_comments = RoleChecker([Role.Administrator, Role.Moderator, Role.
 allowed_update_comments = RoleChecker([Role.Administrator, Role.Moderator, Role.User])
 allowed_remove_comments = RoleChecker([Role.Administrator, Role.Moderator])
 
+# ліміт рахується після пошуку збереженої відповіді, тож повтор із тим самим ключем його не витрачає
+comment_limit = UserRateLimiter("comment", "rate_limit_comment_user")
+comment_idempotency = Idempotency("comment_create", limit=comment_limit)
+
 
 @router.post("/{photos_id}", response_model=CommentModel, dependencies=[Depends(allowed_create_comments)])
 async def create_comment(photos_id: int,
                          body: CommentBase,
                          db: Session = Depends(get_db),
-                         current_user: User = Depends(auth_service.get_current_user)
+                         current_user: User = Depends(auth_service.get_current_user),
+                         idempotent: IdempotentRequest = Depends(comment_idempotency)
                          ):
     """
     The `create_comment function` creates a new comment for the photo with the given id.\n\n
@@ -36,15 +44,20 @@ async def create_comment(photos_id: int,
     - **:param**🪄 `body`: _CommentBase_: Pass the data from the request body to the function\n
     - **:param**🪄 `db`: _Session_: Pass the database session to the repository layer\n
     - **:param**🪄 `current_user`: _User_: Get the current user\n
+    - **:param**🪄 `Idempotency-Key`: _header_: A retry with the same key returns the first comment instead of a duplicate\n
     **:return:** A comment object, which is then serialized as json
     """
+    if idempotent.response is not None:
+        return idempotent.response
     new_comment = await repository_comments.create_comment(photos_id, body, db, current_user)
-    return new_comment
+    return await idempotent.save(CommentModel, new_comment)
 
 
 @router.put("/{comment_id}", response_model=CommentUpdate, dependencies=[Depends(allowed_update_comments)])
 async def edit_comment(comment_id: int,
                        body: CommentBase,
+                       request: Request,
+                       response: Response,
                        db: Session = Depends(get_db),
                        current_user: User = Depends(auth_service.get_current_user)
                        ):
@@ -53,18 +66,25 @@ async def edit_comment(comment_id: int,
     **The function takes in the `comment_id`, body and db as parameters.
     It then calls the edit_comment function from `repository_comments` which returns an edited comment object if successful or `None` otherwise.
     If it is unsuccessful, it raises a 404 error with detail message `COMM_NOT_FOUND`.🐍**
+    **With `If-Match` set to the `ETag` of the comment, a comment changed in the meantime is not overwritten: the answer is 412.**
 
     ___
 
     - **:param**𓆙 `comment_id`: _int_: Identify the comment to be edited\n
     - **:param**𓆙 `body`: _CommentBase_: Pass the comment body to the edit_comment function\n
+    - **:param**𓆙 `If-Match`: _header_: ETag of the comment the change is based on\n
     - **:param**𓆙 `db`: _Session_: Get the database session\n
     - **:param**𓆙 `current_user`: _User_: Get the user who is currently logged in\n
     **:return:** None, but the function expects a CommentBase object\n
     """
+    if "if-match" in request.headers:
+        comment = await repository_comments.show_single_comment(comment_id, db, current_user)
+        if comment is not None:
+            etags.check_if_match(request, etags.version_etag(comment.version))
     edited_comment = await repository_comments.edit_comment(comment_id, body, db, current_user)
     if edited_comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message.COMM_NOT_FOUND)
+    response.headers["ETag"] = etags.version_etag(edited_comment.version)
     return edited_comment
 
 
@@ -93,6 +113,7 @@ async def delete_comment(comment_id: int,
 
 @router.get("/{comment_id}", response_model=CommentModel, dependencies=[Depends(allowed_get_comments)])
 async def single_comment(comment_id: int,
+                         response: Response,
                          db: Session = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)
                          ):
@@ -113,6 +134,7 @@ async def single_comment(comment_id: int,
     comment = await repository_comments.show_single_comment(comment_id, db, current_user)
     if comment is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message.COMM_NOT_FOUND)
+    response.headers["ETag"] = etags.version_etag(comment.version)
     return comment
 
 
@@ -0,0 +1,42 @@
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from src.conf.config import settings
+from src.services.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+def check_scraper(authorization: Optional[str]) -> None:
+    """
+    The check_scraper function lets only the configured scraper read the metrics.
+        The endpoint answers 404 while METRICS_ENABLED is off, and with METRICS_TOKEN set it requires
+        ``Authorization: Bearer <token>``, which Prometheus sends with ``authorization: credentials``.
+
+    :param authorization: Optional[str]: The Authorization header of the request
+    :return: Nothing
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token and not hmac.compare_digest(
+            (authorization or "").encode(), f"Bearer {settings.metrics_token}".encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """
+    **The `metrics` function exposes HTTP, database and storage metrics in the Prometheus text format.📈**
+    **The metrics reveal routes, traffic and failure rates, so the endpoint is off unless `METRICS_ENABLED=true`.**
+    **Set `METRICS_TOKEN` and give Prometheus the same token as a bearer credential, or block `/metrics`**
+    **at the proxy and scrape the workers on the internal network.**
+
+    - **:param**📈 `Authorization`: _header_: `Bearer <METRICS_TOKEN>` when a token is configured\n
+    **:return:** The current metric samples of all workers
+    """
+    check_scraper(authorization)
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
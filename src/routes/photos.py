@@ -1,5 +1,6 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status, Form, File, UploadFile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Form, File, UploadFile, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi.security import  HTTPBearer
 from src.database.models import User, Photo
@@ -8,21 +9,50 @@ from src.schemas.schemas import (
     PhotoUpdate,
     PhotoResponse,
     PhotoListResponse,
-    TagResponse, PhotoTransform, TransformBodyModel, PhotoLinkTransform
+    PhotoBatchResponse,
+    PhotoTransform, TransformBodyModel, PhotoLinkTransform
 )
-from src.services.auth import auth_service
 from src.repository import photos as repository_photos
 from src.database.db import get_db
-from src.repository import photos as repository_photos
-
-from src.database.models import Photo, User
-from src.repository import photos as repository_photos
 from src.services.photos import transform_image, create_link_transform_image
+from src.services import etags, export
+from src.conf.config import settings
 from src.services.auth import auth_service
+from src.services.idempotency import Idempotency, IdempotentRequest
+from src.services.rate_limit import UserRateLimiter
 
 router = APIRouter(tags=["photos"])
 security = HTTPBearer()
 
+# Максимальна кількість фото в одному пакетному запиті
+MAX_BATCH_IDS = 100
+
+# завантаження і трансформації витрачають трафік і квоту сховища
+upload_limit = UserRateLimiter("upload", "rate_limit_upload_user")
+transform_limit = UserRateLimiter("transform", "rate_limit_transform_user")
+# повтор із тим самим Idempotency-Key не рахується в ліміті завантажень
+upload_idempotency = Idempotency("photo_upload", limit=upload_limit)
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    The parse_fields function validates the ``fields`` query parameter of the photo read endpoints.
+        ``id`` is always part of a sparse representation.
+
+    :param fields: Optional[str]: Comma separated names of PhotoResponse fields
+    :return: The requested fields in PhotoResponse order, or None for the full representation
+    """
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(PhotoResponse.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return [field for field in PhotoResponse.model_fields if field in requested or field == "id"]
+
 
 @router.post("/", response_model=PhotoResponse, status_code=status.HTTP_201_CREATED)
 async def create_user_photo(
@@ -31,6 +61,7 @@ async def create_user_photo(
     tags: List[str] = Form([]),
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
+    idempotent: IdempotentRequest = Depends(upload_idempotency),
 ):
     """
     **The `create_user_photo` function creates a new photo for the current user.**
@@ -45,6 +76,7 @@ async def create_user_photo(
     - **:param**🗞 `current_user:` `User:` Get the user that is currently logged in\n
     - **:param**🗞 `db:` `Session:` Pass the database session to the repository layer\n
     - **:param**🗞 : Get the current user from the database\n
+    - **:param**🗞 `Idempotency-Key:` header: A retry with the same key returns the first response without uploading again\n
     **:return:** A photo object
     """
     if not current_user:
@@ -54,22 +86,34 @@ async def create_user_photo(
         raise HTTPException(status_code=400, detail="Too many tags provided")
 
    
+    if idempotent.response is not None:
+        return idempotent.response
+
     photo_data = PhotoCreate(description=description, tags=tags)
-    return repository_photos.create_user_photo(photo_data, image, current_user, db)
+    photo = repository_photos.create_user_photo(photo_data, image, current_user, db)
+    return await idempotent.save(PhotoResponse, photo, status.HTTP_201_CREATED)
 
 
 @router.get("/", response_model=PhotoListResponse)
 async def get_user_photos(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    fields: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(auth_service.get_current_user),
 ):
     """
     **Get a list of user photos with optional filtering and pagination🔮**\n
+    **The response carries an `ETag`; a request with a matching `If-None-Match` gets `304 Not Modified` without a body.**
+    **`fields=id,image_url` returns only the listed fields; tags are not queried unless `tags` is listed.**
 
+    - **:param**⚡ `request`: Request: The incoming request with its conditional headers.\n
+    - **:param**⚡ `response`: Response: Response whose validator headers are set.\n
     - **:param**⚡ `skip`: int: Number of photos to skip.\n
     - **:param**⚡ `limit`: int: Maximum number of photos to return.\n
+    - **:param**⚡ `fields`: str: Comma separated fields to return, all fields by default.\n
     - **:param**⚡ `db`: Session: The database session.\n
     - **:param**⚡ `current_user`: User: The currently authenticated user.\n
     **:return:** PhotoListResponse: List of photo responses.
@@ -79,21 +123,124 @@ async def get_user_photos(
     else:
         user_id = current_user.id
 
+    selected = parse_fields(fields)
+    with_tags = selected is None or "tags" in selected
+    variant = ",".join(selected) if selected else ""
+
+    # Last-Modified не надсилаємо: видалення фото зі сторінки не змінює max(updated_at)
+    if etags.has_conditions(request):
+        versions = etags.group_photo_versions(
+            repository_photos.get_user_photos_versions(user_id, skip, limit, db, with_tags)
+        )
+        etag = etags.photos_etag(versions, variant)
+        if etags.is_not_modified(request, etag):
+            return etags.not_modified(etags.cache_headers(etag))
+
+    if selected:
+        rows = repository_photos.get_user_photos_fields(user_id, skip, limit, selected, db)
+        etag = etags.photos_etag(map(etags.row_version, rows), variant)
+        return ORJSONResponse(
+            {"photos": [{field: row[field] for field in selected} for row in rows]},
+            headers=etags.cache_headers(etag),
+        )
+
     photos = repository_photos.get_user_photos(user_id, skip, limit, db)
+    response.headers.update(etags.cache_headers(etags.photos_etag(map(etags.photo_version, photos))))
     return {"photos": photos}
 
 
+@router.get("/batch", response_model=PhotoBatchResponse)
+async def get_user_photos_batch(
+    ids: str,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Get many photos by ID in one request📚**\n
+    **The result keeps the order of `ids`; photos that do not exist or are not visible to the user come back with `found: false`.**\n
+    ____
+
+    - **:param**🧹 `ids`: str: Comma separated IDs of the photos, at most 100.\n
+    - **:param**🧹 `current_user`: User: The currently authenticated user.\n
+    - **:param**🧹 `db`: Session: The database session.\n
+    **:return:** PhotoBatchResponse: One item per requested ID.\n
+    """
+    try:
+        photo_ids = list(dict.fromkeys(int(photo_id) for photo_id in ids.split(",") if photo_id.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma separated integers"
+        )
+    if not photo_ids or len(photo_ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Provide from 1 to {MAX_BATCH_IDS} ids"
+        )
+
+    if "Administrator" in current_user.roles.split(","):
+        user_id = None  # Адміністратор має доступ до фотографій будь-якого користувача
+    else:
+        user_id = current_user.id
+
+    photos = {photo.id: photo for photo in repository_photos.get_user_photos_by_ids(photo_ids, user_id, db)}
+    return {
+        "photos": [
+            {"id": photo_id, "found": photo_id in photos, "photo": photos.get(photo_id)}
+            for photo_id in photo_ids
+        ]
+    }
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_user_photos(
+    after_id: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **Download all your photos as a ZIP archive with the original images and `manifest.json`📦**\n
+    **The manifest lists the description, tags and comments of every photo. The archive is streamed while it is built.**
+    **A library larger than `limit` photos is exported in parts: when more photos follow, the response has**
+    **an `X-Export-Next-After-Id` header to pass as `after_id` of the next part. An interrupted download**
+    **is continued the same way, with `after_id` set to the id of the last image received (`photos/<id>.<ext>`).**
+
+    - **:param**⚡ `after_id`: int: Export only photos with ids above this one.\n
+    - **:param**⚡ `limit`: int: Maximum number of photos in the archive.\n
+    - **:param**⚡ `current_user`: User: The currently authenticated user.\n
+    - **:param**⚡ `db`: Session: The database session.\n
+    **:return:** StreamingResponse: The ZIP archive.
+    """
+    limit = min(limit or settings.export_max_photos, settings.export_max_photos)
+    last_id = export.next_after_id(current_user.id, after_id, limit, db)
+    headers = {"Content-Disposition": f'attachment; filename="photos-{current_user.id}-{after_id}.zip"'}
+    if last_id is not None:
+        headers["X-Export-Next-After-Id"] = str(last_id)
+    return StreamingResponse(
+        export.export_photos(current_user.id, db, after_id, last_id,
+                             settings.export_concurrency, settings.export_page_size),
+        media_type="application/zip",
+        headers=headers,
+    )
+
+
 @router.get("/{photo_id}", response_model=PhotoResponse)
 async def get_user_photo_by_id(
     photo_id: int,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = None,
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Get a user photo by ID🪶**\n
+    **The response carries `ETag` and `Last-Modified`; `If-None-Match` or `If-Modified-Since` requests for an unchanged photo get `304 Not Modified`.**\n
     ____
     
     - **:param**🧹 `photo_id`: int: ID of the photo to retrieve.\n
+    - **:param**🧹 `request`: Request: The incoming request with its conditional headers.\n
+    - **:param**🧹 `response`: Response: Response whose validator headers are set.\n
+    - **:param**🧹 `fields`: str: Comma separated fields to return, all fields by default.\n
     - **:param**🧹 `current_user`: User: The currently authenticated user.\n
     - **:param**🧹 `db`: Session: The database session.\n
     **:return:** PhotoResponse: The requested photo response.\n
@@ -103,9 +250,38 @@ async def get_user_photo_by_id(
     else:
         user_id = current_user.id
 
+    selected = parse_fields(fields)
+    with_tags = selected is None or "tags" in selected
+    variant = ",".join(selected) if selected else ""
+
+    # Дешева перевірка: лише id, updated_at і теги, без завантаження та серіалізації фото
+    if etags.has_conditions(request):
+        versions = etags.group_photo_versions(
+            repository_photos.get_user_photo_version(photo_id, user_id, db, with_tags)
+        )
+        if not versions:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+            )
+        etag = etags.photos_etag(versions, variant)
+        if etags.is_not_modified(request, etag, versions[0][1]):
+            return etags.not_modified(etags.cache_headers(etag, versions[0][1]))
+
+    if selected:
+        row = repository_photos.get_user_photo_fields(photo_id, user_id, selected, db)
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
+            )
+        etag = etags.photos_etag([etags.row_version(row)], variant)
+        return ORJSONResponse(
+            {field: row[field] for field in selected},
+            headers=etags.cache_headers(etag, row["updated_at"]),
+        )
+
     photo = (
         db.query(Photo)
-        .filter(Photo.id == photo_id, (Photo.user_id == user_id) | (user_id == None))
+        .filter(Photo.id == photo_id, repository_photos.NOT_DELETED, (Photo.user_id == user_id) | (user_id == None))
         .first()
     )
 
@@ -114,29 +290,28 @@ async def get_user_photo_by_id(
             status_code=status.HTTP_404_NOT_FOUND, detail="Photo not found"
         )
 
-    return PhotoResponse(
-        id=photo.id,
-        image_url=photo.image_url,
-        description=photo.description,
-        created_at=photo.created_at,
-        updated_at=photo.updated_at,
-        tags=[TagResponse(id=tag.id, title=tag.title, created_at=tag.created_at) for tag in photo.tags]
-    )
+    response.headers.update(etags.cache_headers(etags.photos_etag([etags.photo_version(photo)]), photo.updated_at))
+    return photo
 
 
 @router.put("/{photo_id}", response_model=PhotoResponse)
 async def update_user_photo(
     photo_id: int,
     updated_photo: PhotoUpdate,
+    request: Request,
+    response: Response,
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db),
 ):
     """
     **Update a user's photo description🦉**\n
+    **With `If-Match` set to the `ETag` of `GET /api/photos/{photo_id}` the photo is only changed if nobody changed it since,
+    otherwise the answer is 412 with the current `ETag`. A concurrent change that wins the race also gives 412, no edit is lost.**
     ____
     
     - **:param**⚯ `photo_id`: int: ID of the photo to update.\n
     - **:param**⚯ `updated_photo`: PhotoUpdate: Data for updating the photo.\n
+    - **:param**⚯ `If-Match`: header: ETag of the photo the change is based on.\n
     - **:param**⚯ `current_user`: User: The currently authenticated user.\n
     - **:param**⚯ `db`: Session: The database session.\n
     **:return:** PhotoResponse: The updated photo response.
@@ -155,7 +330,11 @@ async def update_user_photo(
     ):
         raise HTTPException(status_code=403, detail="Permission denied")
 
+    if "if-match" in request.headers:
+        etags.check_if_match(request, etags.photos_etag([etags.photo_version(photo)]))
     updated_photo = repository_photos.update_user_photo(photo, updated_photo, current_user, db)
+    response.headers.update(etags.cache_headers(etags.photos_etag([etags.photo_version(updated_photo)]),
+                                                updated_photo.updated_at))
     return updated_photo
 
 
@@ -202,7 +381,7 @@ async def delete_user_photo(
     return response_data
 
 
-@router.patch("/transformation", response_model=PhotoTransform)
+@router.patch("/transformation", response_model=PhotoTransform, dependencies=[Depends(transform_limit)])
 async def photo_transformation(
     photo_id: int,
     body: TransformBodyModel,
@@ -242,7 +421,8 @@ async def photo_transformation(
     }
 
 
-@router.post("/create_link_for_transformation", response_model=PhotoLinkTransform)
+@router.post("/create_link_for_transformation", response_model=PhotoLinkTransform,
+             dependencies=[Depends(transform_limit)])
 async def create_link_for_image_transformation(
     photo_id: int,
     current_user: User = Depends(auth_service.get_current_user),
@@ -1,6 +1,6 @@
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, status
 from sqlalchemy.orm import Session
 from src.conf import messages as message
 
@@ -10,6 +10,7 @@ from src.repository import tags as repository_tags
 from src.database.models import User, Tag
 from src.services.roles import RoleChecker
 from src.services.auth import auth_service
+from src.services import etags
 
 router = APIRouter(tags=["tags"])
 
@@ -92,6 +93,7 @@ async def read_all_tags(skip: int = 0,
 
 @router.get("/{tag_id}", response_model=TagResponse)
 async def read_tag_by_id(tag_id: int,
+                         response: Response,
                          db: Session = Depends(get_db),
                          current_user: User = Depends(auth_service.get_current_user)
                          ):
@@ -112,12 +114,15 @@ async def read_tag_by_id(tag_id: int,
     tag = await repository_tags.get_tag_by_id(tag_id, db)
     if tag is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message.NOT_FOUND)
+    response.headers["ETag"] = etags.version_etag(tag.version)
     return tag
 
 
 @router.put("/{tag_id}", response_model=TagResponse, dependencies=[Depends(allowed_edit_tag)])
 async def update_tag(body: TagBase,
                      tag_id: int,
+                     request: Request,
+                     response: Response,
                      db: Session = Depends(get_db),
                      current_user: User = Depends(auth_service.get_current_user)
                      ):
@@ -128,18 +133,25 @@ async def update_tag(body: TagBase,
     - `tag_id`: An integer representing the id of an existing hashtag to be updated.
     - `db` (optional): A Session object used to connect to and query a database, defaults to None if not provided by caller.
     If no session is provided, one will be created using get_db().🐀
+    **With `If-Match` set to the `ETag` of the tag, a tag changed by someone else in the meantime is not overwritten: the answer is 412.**
 
     ___
 
     - **:param** ϟ `body`: _TagBase_: Pass the data from the request body to the function.\n
     - **:param** ϟ `tag_id`: _int_: Identify the tag to be updated.\n
+    - **:param** ϟ `If-Match`: _header_: ETag of the tag the change is based on.\n
     - **:param** ϟ `db`: _Session_: Pass the database session to the `repository_tags`.\n
     - **:param** ϟ `current_user`: _User_: Check if the user is logged in.\n
     **:return:**  A tag object
     """
+    if "if-match" in request.headers:
+        tag = await repository_tags.get_tag_by_id(tag_id, db)
+        if tag is not None:
+            etags.check_if_match(request, etags.version_etag(tag.version))
     tag = await repository_tags.update_tag(tag_id, body, db)
     if tag is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=message.NOT_FOUND)
+    response.headers["ETag"] = etags.version_etag(tag.version)
     return tag
 
 
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from sqlalchemy.orm import Session
-from typing import Dict
+from typing import Dict, Optional
 from src.database.db import get_db
 from src.database import models
 from src.database.models import User, Photo
 from src.repository.photos import get_user_photos
-from src.schemas.schemas import UserDb, UserUpdate, AdminUserPatch
+from src.schemas.schemas import (
+    CurrentUser, UserDb, UserUpdate, AdminUserPatch, AdminUserListResponse, AdminUsersBulkPatch, AdminUsersBulkResponse,
+    Role, SortOrder, UserSortField
+)
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.roles import RoleChecker
 
 router = APIRouter(tags=["users"])
 
+allowed_list_users = RoleChecker([Role.Administrator])
+allowed_bulk_patch_users = RoleChecker([Role.Administrator])
+
 # Рахуємо фото
 def get_user_photos_count(user_id: int, db: Session) -> int:
     """
@@ -24,16 +31,49 @@ def get_user_photos_count(user_id: int, db: Session) -> int:
     **:return:** The number of photos for a user
     """
     # Отримуємо кількість фотографій для користувача
-    photos_count = db.query(Photo).filter(Photo.user_id == user_id).count()
+    photos_count = db.query(Photo).filter(Photo.user_id == user_id, Photo.deleted_at.is_(None)).count()
     return photos_count
 
 
 
+# Список користувачів для адміністратора
+
+@router.get("/", response_model=AdminUserListResponse, dependencies=[Depends(allowed_list_users)])
+async def list_users(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    sort: UserSortField = UserSortField.created_at,
+    order: SortOrder = SortOrder.desc,
+    role: Optional[Role] = None,
+    is_active: Optional[bool] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    **The `list_users` function returns a page of users with their activity for administrators.**
+        **Every user comes with `photos_count`, `comments_count`, `tags_count` and `last_activity`,**
+        **all computed by one database query together with the `total` number of matching users.🗂**
+
+    - **:param**🪄 `skip:` `int:` Number of users to skip
+    - **:param**🪄 `limit:` `int:` Maximum number of users to return, up to 100
+    - **:param**🪄 `sort:` `UserSortField:` Field to sort by, a user field or one of the counts
+    - **:param**🪄 `order:` `SortOrder:` `asc` or `desc`
+    - **:param**🪄 `role:` `Role:` Return only the users with this role
+    - **:param**🪄 `is_active:` `bool:` Return only active or only deactivated users
+    - **:param**🪄 `db:` `Session:` Access the database
+    **:return:** The users of the page and the total number of matching users
+    """
+    users, total = await repository_users.get_users_with_stats(
+        skip, limit, sort.value, order == SortOrder.desc, db,
+        role=role.value if role else None, is_active=is_active,
+    )
+    return {"users": users, "total": total}
+
+
 # Профіль користувача
 
 @router.get("/me/", response_model=UserDb)
 async def read_users_me(
-    current_user: UserDb = Depends(auth_service.get_current_user),
+    current_user: UserDb = Depends(auth_service.get_current_user_db),
     db: Session = Depends(get_db),
 ):
     """
@@ -87,6 +127,7 @@ async def edit_user_profile(
                 detail="This user already exists. Please enter another email",
             )
         user.email = user_update.email
+        auth_service.revoke_tokens(user)
 
     # Здійснюємо оновлення даних користувача
     if user_update.username is not None:
@@ -97,8 +138,10 @@ async def edit_user_profile(
         # Отримуємо реальне значення пароля з SecretStr
         password = user_update.password.get_secret_value()
         user.password = auth_service.get_password_hash(password)
+        auth_service.revoke_tokens(user)
 
     db.commit()
+    auth_service.token_versions.invalidate(user.id)
     db.refresh(user)
 
     return {"message": "Data changed successfully"}
@@ -142,6 +185,7 @@ async def patch_user_profile(
                 detail="This user already exists. Please enter another email",
             )
         user.email = user_update.email
+        auth_service.revoke_tokens(user)
 
     # Обновляем данные пользователя
     if user_update.username is not None:
@@ -152,12 +196,58 @@ async def patch_user_profile(
         # Получаем реальное значение пароля из SecretStr
         password = user_update.password.get_secret_value()
         user.password = auth_service.get_password_hash(password)
+        auth_service.revoke_tokens(user)
 
     # Если пользователь указал новый статус, то обновляем его
     if user_update.is_active is not None:
+        if user.is_active and not user_update.is_active:
+            auth_service.revoke_tokens(user)
         user.is_active = user_update.is_active
 
     db.commit()
+    auth_service.token_versions.invalidate(user.id)
     db.refresh(user)
 
     return {"message": "Data changed successfully"}
+
+
+# Масова зміна статусу і ролі користувачів
+
+@router.patch("/bulk", response_model=AdminUsersBulkResponse, dependencies=[Depends(allowed_bulk_patch_users)])
+async def bulk_patch_users(
+    body: AdminUsersBulkPatch,
+    current_user: CurrentUser = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    **The `bulk_patch_users` function activates, deactivates or changes the role of up to 1000 users at once.**
+        **All users are changed by one `UPDATE`; deactivated users and users with a new role are logged out**
+        **everywhere. Administrators can not change their own account this way.🧹**
+
+    - **:param**✉ `body:` `AdminUsersBulkPatch:` Ids of the users and the new `is_active` and/or `roles`
+    - **:param**✉ `current_user:` `CurrentUser:` The administrator making the change
+    - **:param**✉ `db:` `Session:` Pass the database session to the function
+    **:return:**✉ How many users were updated, how many already had these values and which ids do not exist
+    """
+    if body.is_active is None and body.roles is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to change")
+    ids = list(dict.fromkeys(body.ids))
+    if current_user.id in ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="You can not change your own account in bulk")
+
+    updated, existing = await repository_users.bulk_update_users(
+        ids, db, is_active=body.is_active, roles=body.roles.value if body.roles else None
+    )
+    db.commit()
+    # кеш версій токенів цього воркера, інші воркери побачать зміни після auth_cache_ttl
+    for user_id in updated:
+        auth_service.token_versions.invalidate(user_id)
+
+    found = set(existing)
+    return {
+        "requested": len(ids),
+        "updated": len(updated),
+        "unchanged": len(existing) - len(updated),
+        "not_found": [user_id for user_id in ids if user_id not in found],
+    }
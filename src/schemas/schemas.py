@@ -30,6 +30,16 @@ class Role(str, Enum):
     Administrator = "Administrator"
 
 
+class CurrentUser(BaseModel):
+    """
+    The authenticated user as described by the claims of the access token, without a database load.
+    """
+    id: int
+    email: str
+    roles: str
+    token_version: int = 0
+
+
 class UserModel(BaseModel):
     username: str
     email: EmailStr
@@ -67,12 +77,65 @@ class AdminUserPatch(BaseModel):
     is_active: Optional[bool] = None
 
 
+class AdminUsersBulkPatch(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=1000)
+    is_active: Optional[bool] = None
+    roles: Optional[Role] = None
+
+
+class AdminUsersBulkResponse(BaseModel):
+    requested: int
+    updated: int
+    unchanged: int
+    not_found: List[int]
+    detail: str = "Users successfully updated"
+
+
+class UserSortField(str, Enum):
+    id = "id"
+    created_at = "created_at"
+    username = "username"
+    email = "email"
+    photos_count = "photos_count"
+    comments_count = "comments_count"
+    tags_count = "tags_count"
+    last_activity = "last_activity"
+
+
+class SortOrder(str, Enum):
+    asc = "asc"
+    desc = "desc"
+
+
+class AdminUserStats(BaseModel):
+    id: int
+    username: Optional[str] = None
+    email: str
+    roles: str
+    is_active: Optional[bool] = None
+    created_at: Optional[datetime] = None
+    photos_count: int
+    comments_count: int
+    tags_count: int
+    last_activity: Optional[datetime] = None
+
+
+class AdminUserListResponse(BaseModel):
+    users: List[AdminUserStats]
+    total: int
+
+
 class TokenModel(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     message: str
 
 
+class RefreshTokenModel(BaseModel):
+    refresh_token: str
+
+
 class PhotoBase(BaseModel):
     image_url: str
     description: str
@@ -102,12 +165,25 @@ class PhotoResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     tags: List[TagResponse]
+
+    class Config:
+        from_attributes = True
     
 
 class PhotoListResponse(BaseModel):
     photos: List[PhotoResponse]
 
 
+class PhotoBatchItem(BaseModel):
+    id: int
+    found: bool
+    photo: Optional[PhotoResponse] = None
+
+
+class PhotoBatchResponse(BaseModel):
+    photos: List[PhotoBatchItem]
+
+
 
 #Models for transformation photos
 class PhotoTransform(BaseModel): 
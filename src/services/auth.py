@@ -1,5 +1,9 @@
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import cached_property
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException
 from passlib.context import CryptContext
@@ -8,12 +12,74 @@ from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from starlette import status
 
+from src.conf.config import settings
 from src.database.db import get_db
 from src.database.models import User
+from src.schemas.schemas import CurrentUser
 from fastapi import APIRouter
 
 router = APIRouter()
 
+
+class TokenVersionStore:
+    """
+    Compact per-worker cache of the token version and the active flag of recently authenticated users.
+
+    A token is valid while its ``ver`` claim equals the user's token version and the user is active, so
+    bumping the version (password or email change, deactivation) revokes every token issued before.
+    Entries expire after ``ttl`` seconds, which bounds how long other workers accept a revoked token.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        """
+        The __init__ function sets the lifetime and the capacity of the cache.
+
+        :param self: Represent the instance of the class
+        :param ttl: float: Seconds an entry is trusted before it is reloaded from the database
+        :param max_entries: int: Number of users kept, the least recently used are evicted first
+        :return: Nothing
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: OrderedDict[int, Tuple[int, bool, float]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def set(self, user_id: int, token_version: int, is_active: bool) -> None:
+        with self.lock:
+            self.entries[user_id] = (token_version, is_active, time.monotonic() + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, user_id: int, db: Session) -> Optional[Tuple[int, bool]]:
+        """
+        The get function returns the token version and the active flag of a user, from the cache when fresh.
+
+        :param self: Represent the instance of the class
+        :param user_id: int: Id of the user
+        :param db: Session: Database session used on a cache miss
+        :return: A (token_version, is_active) tuple, or None when the user does not exist
+        """
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[2] > time.monotonic():
+                self.entries.move_to_end(user_id)
+                return entry[0], entry[1]
+        row = db.query(User.token_version, User.is_active).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        self.set(user_id, row.token_version or 0, bool(row.is_active))
+        return row.token_version or 0, bool(row.is_active)
+
+    def invalidate(self, user_id: int) -> None:
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
 # Хешування пароля
 class Auth:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -49,6 +115,33 @@ class Auth:
 
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+    @cached_property
+    def token_versions(self) -> TokenVersionStore:
+        # кеш створюється під час першої автентифікації, тож імпорт модуля не читає налаштувань
+        return TokenVersionStore(settings.auth_cache_ttl, settings.auth_cache_entries)
+
+    def token_claims(self, user: User) -> dict:
+        """
+        The token_claims function returns the claims that let requests authenticate without loading the user.
+
+        :param self: Represent the instance of the class
+        :param user: User: The user the token is issued to
+        :return: A dictionary with the email, id, roles and token version of the user
+        """
+        self.token_versions.set(user.id, user.token_version or 0, bool(user.is_active))
+        return {"sub": user.email, "uid": user.id, "roles": user.roles, "ver": user.token_version or 0}
+
+    def revoke_tokens(self, user: User) -> None:
+        """
+        The revoke_tokens function invalidates every token issued to the user so far.
+            The caller commits the session; the cached version is dropped by invalidate after the commit.
+
+        :param self: Represent the instance of the class
+        :param user: User: The user whose tokens are revoked
+        :return: Nothing
+        """
+        user.token_version = (user.token_version or 0) + 1
+
 
     # Генерація токена
     def create_access_token(self, data: dict, expires_delta: Optional[float] = None):
@@ -73,11 +166,13 @@ class Auth:
     async def get_current_user(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
         """
         The get_current_user function is a dependency that will be used in the UserRouter class.
-        It takes a token as an argument and returns the user object associated with that token.
+        It takes a token as an argument and returns the user described by its claims.
+        The user is not loaded: only the token version and the active flag are checked, usually from the cache.
         
-        :param self: Represent the instance of a class
+        :param self: Represent the instance of the class
         :param token: str: Pass the jwt token to the function
         :param db: Session: Access the database
+        :return: A CurrentUser, or the User model for tokens issued without claims
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -91,12 +186,38 @@ class Auth:
             email = payload["sub"]
             if email is None:
                 raise credentials_exception
-        except JWTError as e:
+        except (JWTError, KeyError) as e:
             raise credentials_exception
 
-        user: User = db.query(User).filter(User.email == email).first()
-        if user is None:
+        if "uid" not in payload:
+            # токени, видані до появи claims, перевіряються за базою, доки не сплинуть
+            user: User = db.query(User).filter(User.email == email).first()
+            if user is None:
+                raise credentials_exception
+            return user
+
+        state = self.token_versions.get(payload["uid"], db)
+        if state is None or state != (payload.get("ver", 0), True):
             raise credentials_exception
+        return CurrentUser(id=payload["uid"], email=email, roles=payload["roles"], token_version=payload.get("ver", 0))
+
+    async def get_current_user_db(self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+        """
+        The get_current_user_db function authenticates like get_current_user and then loads the user from the database,
+        for the routes that need more than the token claims, such as the profile.
+
+        :param self: Represent the instance of the class
+        :param token: str: Pass the jwt token to the function
+        :param db: Session: Access the database
+        :return: The User model of the authenticated user
+        """
+        current_user = await self.get_current_user(token, db)
+        if isinstance(current_user, User):
+            return current_user
+        user = db.get(User, current_user.id)
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Could not validate credentials",
+                                headers={"WWW-Authenticate": "Bearer"})
         return user
 
 auth_service = Auth()
@@ -0,0 +1,427 @@
+"""
+Import an existing photo library into one user's account from a directory or a ZIP archive.
+
+The source holds the images and a manifest: ``manifest.json`` (a list of photos, or an object with a
+"photos" list, as written by GET /api/photos/export) or ``manifest.jsonl`` with one photo per line,
+which is read as a stream and suits libraries of hundreds of thousands of photos. A photo is
+{"file": "photos/1.jpg", "description": "...", "tags": ["sea", "2019"], "created_at": "2019-07-01T10:00:00"},
+only "file" is required and tags may also be given as "sea, 2019".
+
+Images are uploaded by a pool of worker threads while the main thread resolves the tags of a whole
+batch at once and inserts its photos and tag links with one statement each. After every committed batch
+the position in the manifest is written to a checkpoint file, so an interrupted import started again
+with the same checkpoint continues where it stopped: the images get the same public ids and are
+overwritten, and photos that were committed but not yet checkpointed are not inserted twice.
+
+Usage::
+
+    python -m src.services.bulk_import library.zip --user-email owner@example.com --workers 16
+    STORAGE_BACKEND=local python -m src.services.bulk_import ./library --user-email owner@example.com
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, IO, Iterable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from src.database.models import Photo, User, photo_2_tag
+from src.repository.photos import resolve_tags
+from src.services import storage
+
+
+logger = logging.getLogger(__name__)
+
+MANIFESTS = ("manifest.jsonl", "manifest.json")
+# ті самі обмеження, що й при завантаженні одного фото через API
+MAX_TAGS = 5
+MAX_DESCRIPTION = 500
+
+
+class ManifestEntry(NamedTuple):
+    index: int
+    file: Optional[str]
+    description: Optional[str]
+    tags: List[str]
+    created_at: Optional[datetime]
+
+
+class Uploaded(NamedTuple):
+    entry: ManifestEntry
+    public_id: str
+    image_url: Optional[str]
+    size: int
+    error: Optional[str]
+
+
+class DirectorySource:
+    """
+    Images and manifest in a directory.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root.resolve()
+
+    def names(self) -> List[str]:
+        return [name for name in MANIFESTS if (self.root / name).is_file()]
+
+    def open(self, name: str) -> IO[bytes]:
+        path = (self.root / name).resolve()
+        # шляхи з маніфесту не повинні виводити за межі каталогу
+        if not path.is_relative_to(self.root):
+            raise FileNotFoundError(name)
+        return open(path, "rb")
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as file:
+            return file.read()
+
+    def close(self) -> None:
+        pass
+
+
+class ArchiveSource:
+    """
+    Images and manifest in a ZIP archive, read by several threads at once.
+    """
+
+    def __init__(self, path: Path):
+        self.archive = zipfile.ZipFile(path)
+
+    def names(self) -> List[str]:
+        members = set(self.archive.namelist())
+        return [name for name in MANIFESTS if name in members]
+
+    def open(self, name: str) -> IO[bytes]:
+        try:
+            return self.archive.open(name)
+        except KeyError:
+            raise FileNotFoundError(name) from None
+
+    def read(self, name: str) -> bytes:
+        with self.open(name) as file:
+            return file.read()
+
+    def close(self) -> None:
+        self.archive.close()
+
+
+def open_source(path: str) -> DirectorySource | ArchiveSource:
+    """
+    The open_source function opens a directory or a ZIP archive with a photo library.
+
+    :param path: str: Path of the directory or of the archive
+    :return: The source of the images and of the manifest
+    """
+    source = Path(path)
+    if source.is_dir():
+        return DirectorySource(source)
+    if zipfile.is_zipfile(source):
+        return ArchiveSource(source)
+    raise ValueError(f"{path} is neither a directory nor a ZIP archive")
+
+
+def parse_entry(index: int, item: dict) -> ManifestEntry:
+    """
+    The parse_entry function normalizes one photo of the manifest.
+
+    :param index: int: Position of the photo in the manifest
+    :param item: dict: The photo as written in the manifest
+    :return: The photo with its tags as a list of unique titles
+    """
+    tags = item.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    titles = list(dict.fromkeys(title.strip() for title in tags if title and title.strip()))
+    created_at = item.get("created_at")
+    return ManifestEntry(index, item.get("file"), item.get("description"), titles,
+                         datetime.fromisoformat(created_at) if created_at else None)
+
+
+def read_manifest(source) -> Iterator[ManifestEntry]:
+    """
+    The read_manifest function reads the photos of the manifest in order.
+        A JSON Lines manifest is read line by line, a JSON manifest is read whole.
+
+    :param source: DirectorySource | ArchiveSource: The photo library
+    :return: The photos of the manifest
+    """
+    names = source.names()
+    if not names:
+        raise FileNotFoundError(f"No {' or '.join(MANIFESTS)} in the source")
+    with source.open(names[0]) as manifest:
+        if names[0].endswith(".jsonl"):
+            lines = (line for line in io.TextIOWrapper(manifest, encoding="utf-8") if line.strip())
+            items = map(json.loads, lines)
+        else:
+            document = json.load(manifest)
+            items = document["photos"] if isinstance(document, dict) else document
+        for index, item in enumerate(items):
+            yield parse_entry(index, item)
+
+
+@dataclass
+class Checkpoint:
+    """
+    Progress of an import: photos of the manifest before ``done`` are imported or failed.
+    """
+    path: Optional[Path]
+    run_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    done: int = 0
+    failed: List[int] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: Optional[str]) -> "Checkpoint":
+        """
+        The load function reads the checkpoint of an interrupted import, or starts a new one.
+
+        :param path: Optional[str]: Checkpoint file, None to import without one
+        :return: The checkpoint
+        """
+        if path is None:
+            return cls(None)
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        data = json.loads(path.read_text())
+        return cls(path, data["run_id"], data["done"], data["failed"])
+
+    def save(self) -> None:
+        """
+        The save function replaces the checkpoint file atomically, a crash leaves the previous one intact.
+
+        :return: Nothing
+        """
+        if self.path is None:
+            return
+        data = asdict(self)
+        del data["path"]
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        temporary.write_text(json.dumps(data))
+        os.replace(temporary, self.path)
+
+
+@dataclass
+class ImportReport:
+    """
+    Counts and throughput of an import run.
+    """
+    imported: int = 0
+    skipped: int = 0
+    failed: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def photos_per_second(self) -> float:
+        return self.imported / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / 1e6 / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"Imported {self.imported} photos ({self.bytes / 1e6:,.1f} MB) in {self.seconds:.1f} s, "
+                f"{self.photos_per_second:,.1f} photos/s, {self.megabytes_per_second:,.1f} MB/s; "
+                f"{self.skipped} already imported, {self.failed} failed")
+
+
+def validate(entry: ManifestEntry) -> Optional[str]:
+    if not entry.file:
+        return "No image file"
+    if len(entry.tags) > MAX_TAGS:
+        return "Too many tags provided"
+    if entry.description and len(entry.description) > MAX_DESCRIPTION:
+        return "Description is too long"
+    return None
+
+
+def upload_entry(source, entry: ManifestEntry, public_id: str) -> Uploaded:
+    """
+    The upload_entry function uploads the image of one photo, it runs in a worker thread.
+
+    :param source: DirectorySource | ArchiveSource: The photo library
+    :param entry: ManifestEntry: The photo
+    :param public_id: str: Public id of the image, the same when the import is resumed
+    :return: The url of the uploaded image, or the reason it was not uploaded
+    """
+    error = validate(entry)
+    if error:
+        return Uploaded(entry, public_id, None, 0, error)
+    try:
+        image = source.read(entry.file)
+        result = storage.upload(image, public_id=public_id, overwrite=True)
+    except Exception as exc:
+        return Uploaded(entry, public_id, None, 0, f"{type(exc).__name__}: {exc}")
+    return Uploaded(entry, public_id, result["secure_url"], len(image), None)
+
+
+def upload_in_order(source, entries: Iterable[ManifestEntry], public_id: Callable[[ManifestEntry], str],
+                    pool: ThreadPoolExecutor, ahead: int) -> Iterator[Uploaded]:
+    """
+    The upload_in_order function uploads the images in the pool and yields the results in manifest order.
+        At most ``ahead`` uploads are queued, so the manifest is not read far ahead of the database.
+
+    :param source: DirectorySource | ArchiveSource: The photo library
+    :param entries: Iterable[ManifestEntry]: Photos to import
+    :param public_id: Callable[[ManifestEntry], str]: Public id of the image of a photo
+    :param pool: ThreadPoolExecutor: Upload workers
+    :param ahead: int: Maximum number of queued uploads
+    :return: The upload results
+    """
+    pending = deque()
+    for entry in entries:
+        pending.append(pool.submit(upload_entry, source, entry, public_id(entry)))
+        if len(pending) >= ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def insert_batch(batch: List[Uploaded], user: User, db: Session) -> int:
+    """
+    The insert_batch function inserts the uploaded photos of a batch with their tags in one transaction.
+        The tags of the whole batch are resolved at once and only flushed, the photos and their tag links
+        are inserted with one statement each, and all of it is committed together, so an interrupted batch
+        leaves no new tags behind. Photos committed by an interrupted run are left as they are.
+
+    :param batch: List[Uploaded]: Upload results in manifest order
+    :param user: User: Owner of the photos
+    :param db: Session: Pass the database session to the function
+    :return: Number of photos that were already imported
+    """
+    uploaded = [item for item in batch if item.image_url]
+    existing = {public_id for public_id, in db.query(Photo.public_id)
+                .filter(Photo.public_id.in_([item.public_id for item in uploaded]))}
+    uploaded = [item for item in uploaded if item.public_id not in existing]
+    if not uploaded:
+        return len(existing)
+
+    tags = {tag.title: tag.id for tag in
+            resolve_tags([title for item in uploaded for title in item.entry.tags], user, db, commit=False)}
+    now = datetime.utcnow()
+    rows = [{"image_url": item.image_url, "public_id": item.public_id, "description": item.entry.description,
+             "user_id": user.id, "created_at": item.entry.created_at or now, "updated_at": item.entry.created_at or now}
+            for item in uploaded]
+    photo_ids = dict((public_id, photo_id) for photo_id, public_id in
+                     db.execute(insert(Photo).returning(Photo.id, Photo.public_id), rows,
+                                execution_options={"render_nulls": True}))
+    links = [{"photo_id": photo_ids[item.public_id], "tag_id": tags[title]}
+             for item in uploaded for title in item.entry.tags]
+    if links:
+        db.execute(insert(photo_2_tag), links)
+    db.commit()
+    return len(existing)
+
+
+def batches(results: Iterable[Uploaded], size: int) -> Iterator[List[Uploaded]]:
+    batch = []
+    for result in results:
+        batch.append(result)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_photos(source, user: User, session_factory: Callable[[], Session], checkpoint: Checkpoint,
+                  workers: int = 8, batch_size: int = 100,
+                  progress: Optional[Callable[[ImportReport], None]] = None) -> ImportReport:
+    """
+    The import_photos function imports the photos of the manifest that the checkpoint has not covered yet.
+
+    :param source: DirectorySource | ArchiveSource: The photo library
+    :param user: User: Owner of the photos and of the new tags
+    :param session_factory: Callable[[], Session]: Creates the database session of a batch
+    :param checkpoint: Checkpoint: Where to start, updated after every batch
+    :param workers: int: Number of images uploaded at the same time
+    :param batch_size: int: Photos inserted by one transaction
+    :param progress: Optional[Callable[[ImportReport], None]]: Called with the running totals after every batch
+    :return: Counts and throughput of this run
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    entries = (entry for entry in read_manifest(source) if entry.index >= checkpoint.done)
+
+    def public_id(entry: ManifestEntry) -> str:
+        return f"{user.email}_{user.id}_import_{checkpoint.run_id}_{entry.index}"
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as pool:
+        for batch in batches(upload_in_order(source, entries, public_id, pool, workers * 2), batch_size):
+            with session_factory() as db:
+                skipped = insert_batch(batch, user, db)
+            failed = [item for item in batch if item.error]
+            for item in failed:
+                logger.warning("Photo %d (%s) was not imported: %s", item.entry.index, item.entry.file, item.error)
+
+            checkpoint.done = batch[-1].entry.index + 1
+            checkpoint.failed.extend(item.entry.index for item in failed)
+            checkpoint.save()
+
+            report.skipped += skipped
+            report.failed += len(failed)
+            report.imported += len(batch) - len(failed) - skipped
+            report.bytes += sum(item.size for item in batch)
+            report.seconds = time.perf_counter() - started
+            if progress:
+                progress(report)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def print_progress(report: ImportReport) -> None:
+    print(f"\r{report.imported} photos, {report.photos_per_second:,.1f} photos/s, "
+          f"{report.megabytes_per_second:,.1f} MB/s, {report.failed} failed",
+          end="", file=sys.stderr, flush=True)
+
+
+def main():
+    from src.conf.config import settings
+    from src.database.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("source", help="directory or ZIP archive with the images and the manifest")
+    parser.add_argument("--user-email", required=True, help="owner of the imported photos")
+    parser.add_argument("--workers", type=int, default=settings.import_workers)
+    parser.add_argument("--batch-size", type=int, default=settings.import_batch_size)
+    parser.add_argument("--checkpoint", help="progress file, default <source>.checkpoint.json")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.email == args.user_email).first()
+    if user is None:
+        parser.error(f"User {args.user_email} not found")
+
+    checkpoint = Checkpoint.load(args.checkpoint or f"{args.source.rstrip('/')}.checkpoint.json")
+    if checkpoint.done:
+        print(f"Resuming from photo {checkpoint.done} of the manifest", file=sys.stderr)
+    source = open_source(args.source)
+    try:
+        report = import_photos(source, user, SessionLocal, checkpoint, args.workers, args.batch_size,
+                               progress=None if args.quiet else print_progress)
+    finally:
+        source.close()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(report.summary())
+    if checkpoint.failed:
+        print(f"Failed photos (manifest positions) are listed in {checkpoint.path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import gzip
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Dict, Iterable, Optional, Tuple
+
+import anyio
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services.etags import encoded_etag
+
+
+# Тіла, більші за цей розмір, стискаються у пулі потоків, щоб не блокувати event loop
+THREADPOOL_THRESHOLD = 256 * 1024
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    The parse_accept_encoding function turns an Accept-Encoding header into a mapping of codings to their q-values.
+
+    :param value: str: Value of the Accept-Encoding header
+    :return: A dictionary of acceptable codings and their weights
+    """
+    codings = {}
+    for item in value.split(","):
+        coding, _, params = item.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+
+class CompressedBodyCache:
+    """
+    LRU cache of compressed bodies keyed by the coding and a digest of the uncompressed body,
+    bounded both by the number of entries and by the total size of the stored bodies.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        """
+        The __init__ function sets the limits of the cache.
+
+        :param self: Represent the instance of the class
+        :param max_entries: int: Maximum number of cached bodies, 0 disables the cache
+        :param max_bytes: int: Maximum total size of the cached compressed bodies
+        :return: Nothing
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        """
+        The get function returns a cached compressed body and marks it as recently used.
+
+        :param self: Represent the instance of the class
+        :param key: Tuple[str, bytes]: Coding and digest of the uncompressed body
+        :return: The compressed body or None
+        """
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key: Tuple[str, bytes], body: bytes) -> None:
+        """
+        The put function stores a compressed body, evicting the least recently used ones over the limits.
+
+        :param self: Represent the instance of the class
+        :param key: Tuple[str, bytes]: Coding and digest of the uncompressed body
+        :param body: bytes: The compressed body
+        :return: Nothing
+        """
+        if self.max_entries <= 0 or len(body) > self.max_bytes or key in self.entries:
+            return
+        self.entries[key] = body
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware that compresses eligible responses with brotli or gzip.
+
+    Only complete (non-streaming) bodies between ``minimum_size`` and ``maximum_size`` bytes with an allowed
+    content type are compressed, which together with the configured levels bounds the CPU spent per response.
+    Compressed bodies are kept in a small LRU cache, so hot responses are compressed once and reused.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 minimum_size: int = 500,
+                 maximum_size: int = 4 * 1024 * 1024,
+                 gzip_level: int = 6,
+                 brotli_quality: int = 4,
+                 content_types: Iterable[str] = ("application/json",),
+                 cache_entries: int = 256,
+                 cache_bytes: int = 16 * 1024 * 1024):
+        """
+        The __init__ function configures the thresholds, levels and cache of the middleware.
+
+        :param self: Represent the instance of the class
+        :param app: ASGIApp: The wrapped application
+        :param minimum_size: int: Smaller bodies are sent as is
+        :param maximum_size: int: Larger bodies are sent as is to bound the compression time
+        :param gzip_level: int: Compression level for gzip, 1-9
+        :param brotli_quality: int: Compression quality for brotli, 0-11
+        :param content_types: Iterable[str]: Media types that may be compressed
+        :param cache_entries: int: Number of compressed bodies kept in memory
+        :param cache_bytes: int: Total size of compressed bodies kept in memory
+        :return: Nothing
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.maximum_size = maximum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.content_types = tuple(content_type.strip().lower() for content_type in content_types)
+        self.cache = CompressedBodyCache(cache_entries, cache_bytes)
+
+    def choose_coding(self, accept_encoding: str) -> Optional[str]:
+        """
+        The choose_coding function picks the coding to use for a request, preferring brotli over gzip.
+
+        :param self: Represent the instance of the class
+        :param accept_encoding: str: Value of the Accept-Encoding header
+        :return: "br", "gzip" or None
+        """
+        codings = parse_accept_encoding(accept_encoding)
+        wildcard = codings.get("*", 0.0)
+        candidates = [(codings.get(coding, wildcard), coding) for coding in ("br", "gzip")]
+        quality, coding = max(candidates, key=lambda candidate: candidate[0])
+        return coding if quality > 0 else None
+
+    def compress(self, coding: str, body: bytes) -> bytes:
+        """
+        The compress function compresses a body with the given coding.
+
+        :param self: Represent the instance of the class
+        :param coding: str: "br" or "gzip"
+        :param body: bytes: The uncompressed body
+        :return: The compressed body
+        """
+        if coding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        coding = self.choose_coding(request_headers.get("accept-encoding", ""))
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            # Перше тіло відповіді: вирішуємо, чи стискати
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            etag = headers.get("etag")
+            if start_message["status"] == 304 and etag and coding is not None:
+                # 304 повторює ETag того подання, яке клієнт має в кеші
+                coded = encoded_etag(etag, coding)
+                if coded in (tag.strip() for tag in request_headers.get("if-none-match", "").split(",")):
+                    headers["ETag"] = coded
+            media_type = headers.get("content-type", "").split(";")[0].strip().lower()
+            eligible = (media_type in self.content_types
+                        and "content-encoding" not in headers
+                        and not message.get("more_body", False))
+            if eligible:
+                headers.add_vary_header("Accept-Encoding")
+            if not eligible or coding is None or not self.minimum_size <= len(body) <= self.maximum_size:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            key = (coding, blake2b(body, digest_size=16).digest())
+            compressed = self.cache.get(key)
+            if compressed is None:
+                if len(body) > THREADPOOL_THRESHOLD:
+                    compressed = await anyio.to_thread.run_sync(self.compress, coding, body)
+                else:
+                    compressed = self.compress(coding, body)
+                if "no-store" not in headers.get("cache-control", ""):
+                    self.cache.put(key, compressed)
+
+            headers["Content-Encoding"] = coding
+            headers["Content-Length"] = str(len(compressed))
+            if etag:
+                headers["ETag"] = encoded_etag(etag, coding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,218 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm.exc import StaleDataError
+
+
+PhotoVersion = Tuple[int, datetime, List[Tuple[int, str]]]
+# content codings of the compression middleware, a compressed representation gets its own ETag
+ETAG_CODINGS = ("br", "gzip")
+
+
+def group_photo_versions(rows: Iterable[tuple]) -> List[PhotoVersion]:
+    """
+    The group_photo_versions function folds ``(photo_id, updated_at, tag_id, tag_title)`` rows into one entry per photo.
+        Photos without tags come from an outer join and carry ``None`` for the tag columns.
+
+    :param rows: Iterable[tuple]: Rows returned by the version queries of the photo repository
+    :return: A list of (photo_id, updated_at, tags) tuples in the order of the rows
+    """
+    photos: Dict[int, PhotoVersion] = {}
+    for photo_id, updated_at, tag_id, tag_title in rows:
+        if photo_id not in photos:
+            photos[photo_id] = (photo_id, updated_at, [])
+        if tag_id is not None:
+            photos[photo_id][2].append((tag_id, tag_title))
+    return list(photos.values())
+
+
+def photo_version(photo) -> PhotoVersion:
+    """
+    The photo_version function extracts the (photo_id, updated_at, tags) triple from a loaded photo row.
+
+    :param photo: Photo: A photo with its tags loaded
+    :return: The version triple used for ETags
+    """
+    return photo.id, photo.updated_at, [(tag.id, tag.title) for tag in photo.tags]
+
+
+def row_version(photo: dict) -> PhotoVersion:
+    """
+    The row_version function extracts the (photo_id, updated_at, tags) triple from a projected photo row.
+        Rows projected without tags produce an empty tag set, because tags are not part of that representation.
+
+    :param photo: dict: A photo row returned by the sparse fieldset queries
+    :return: The version triple used for ETags
+    """
+    return photo["id"], photo["updated_at"], [(tag["id"], tag["title"]) for tag in photo.get("tags", [])]
+
+
+def photos_etag(photos: Iterable[PhotoVersion], variant: str = "") -> str:
+    """
+    The photos_etag function builds a strong ETag from the id, ``updated_at`` and tag set of every photo in a response.
+
+    :param photos: Iterable[PhotoVersion]: (photo_id, updated_at, tags) of the photos in the response body
+    :param variant: str: Anything else that changes the representation of the same photos
+    :return: A quoted strong ETag
+    """
+    digest = blake2b(digest_size=16)
+    digest.update(variant.encode())
+    for photo_id, updated_at, tags in photos:
+        digest.update(f"|{photo_id}@{updated_at.isoformat() if updated_at else ''}".encode())
+        for tag_id, tag_title in sorted(tags):
+            digest.update(f":{tag_id}={tag_title}".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def version_etag(version: int) -> str:
+    """
+    The version_etag function builds the ETag of a tag or a comment from its version counter.
+
+    :param version: int: The version column of the row
+    :return: A quoted strong ETag
+    """
+    return f'"{version}"'
+
+
+def encoded_etag(etag: str, coding: str) -> str:
+    """
+    The encoded_etag function derives the ETag of a compressed representation, e.g. ``"<hash>-gzip"``.
+        RFC 9110 does not allow one strong ETag for different representations; weak ETags are left as they are.
+
+    :param etag: str: ETag of the uncompressed representation
+    :param coding: str: Content-Encoding of the compressed representation
+    :return: A quoted strong ETag with the coding suffix
+    """
+    if not etag.startswith('"'):
+        return etag
+    return f'{etag[:-1]}-{coding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    """
+    The decoded_etag function removes the coding suffix added by encoded_etag, so validators sent back
+        by a client that received a compressed response match the ETag computed by the route.
+
+    :param etag: str: ETag sent by the client
+    :return: The ETag of the uncompressed representation
+    """
+    for coding in ETAG_CODINGS:
+        suffix = f'-{coding}"'
+        if etag.startswith('"') and etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def http_date(value: datetime) -> str:
+    """
+    The http_date function formats a datetime for the ``Last-Modified`` header.
+        Naive datetimes stored by the application are treated as UTC.
+
+    :param value: datetime: The moment of the last modification
+    :return: An IMF-fixdate string
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    """
+    The cache_headers function returns the validator headers sent with every conditional photo response.
+
+    :param etag: str: ETag of the representation
+    :param last_modified: Optional[datetime]: Modification time of the representation, if it is meaningful
+    :return: A dictionary of response headers
+    """
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def has_conditions(request: Request) -> bool:
+    """
+    The has_conditions function tells whether the client sent any validator to check.
+
+    :param request: Request: The incoming request
+    :return: True if the request carries If-None-Match or If-Modified-Since
+    """
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    The is_not_modified function evaluates If-None-Match and If-Modified-Since as described in RFC 9110.
+        If-None-Match takes precedence, and If-Modified-Since is only compared when a modification time is known.
+
+    :param request: Request: The incoming request
+    :param etag: str: Current ETag of the representation
+    :param last_modified: Optional[datetime]: Current modification time of the representation
+    :return: True if a 304 response may be sent instead of the body
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        candidates = [decoded_etag(tag.strip().removeprefix("W/")) for tag in if_none_match.split(",")]
+        return etag in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    # HTTP-дати мають точність до секунди
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """
+    The not_modified function returns an empty 304 response carrying the current validators.
+
+    :param headers: Dict[str, str]: Validator headers of the current representation
+    :return: A 304 Not Modified response
+    """
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """
+    The check_if_match function evaluates If-Match as described in RFC 9110 before a resource is changed.
+        Only strong comparison is allowed, so weak ETags never match; the ETag of a compressed representation
+        matches the resource it was computed for. The current ETag is sent with the 412 response,
+        the client can reload the resource and repeat its change.
+
+    :param request: Request: The incoming request
+    :param etag: str: Current ETag of the resource
+    :return: Nothing
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None or if_match.strip() == "*":
+        return
+    if etag not in [decoded_etag(tag.strip()) for tag in if_match.split(",")]:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED,
+                            detail="The resource was changed, reload it and try again", headers={"ETag": etag})
+
+
+async def stale_data_handler(request: Request, exc: StaleDataError) -> Response:
+    """
+    The stale_data_handler function answers 412 when an UPDATE found another version of the row than it read:
+        a concurrent request changed it between the read and the commit, so this change is not applied.
+
+    :param request: Request: The request whose change was rejected
+    :param exc: StaleDataError: The error raised by the version check of the session
+    :return: A 412 Precondition Failed response
+    """
+    return ORJSONResponse({"detail": "The resource was changed concurrently, reload it and try again"},
+                          status_code=status.HTTP_412_PRECONDITION_FAILED)
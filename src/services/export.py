@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import zipfile
+from collections import deque
+from datetime import datetime
+from pathlib import PurePosixPath
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.database.models import Comment, Photo, Tag, photo_2_tag
+from src.repository.photos import NOT_DELETED, get_public_id_from_image_url
+from src.services import storage
+
+
+logger = logging.getLogger(__name__)
+
+
+class ZipStream:
+    """
+    Write-only file object that collects what zipfile writes until it is drained.
+    It has no ``tell`` or ``seek``, so zipfile writes the archive strictly forward, with data descriptors,
+    and every drained chunk can be sent to the client at once.
+    """
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def photo_file_name(photo) -> str:
+    """
+    The photo_file_name function names the image of a photo inside the archive by its id,
+    so an interrupted export can be resumed from the last complete file.
+
+    :param photo: A row with id and image_url
+    :return: The path of the image in the archive
+    """
+    suffix = PurePosixPath(urlparse(photo.image_url or "").path).suffix
+    return f"photos/{photo.id}{suffix}"
+
+
+def next_after_id(user_id: int, after_id: int, limit: int, db: Session) -> Optional[int]:
+    """
+    The next_after_id function finds where the next part of a large export starts.
+
+    :param user_id: int: Owner of the photos
+    :param after_id: int: The export contains photos with ids above this one
+    :param limit: int: Maximum number of photos in one archive
+    :param db: Session: Pass the database session to the function
+    :return: The id of the last photo of this part if more photos follow, otherwise None
+    """
+    ids = (
+        db.query(Photo.id)
+        .filter(Photo.user_id == user_id, NOT_DELETED, Photo.id > after_id)
+        .order_by(Photo.id)
+        .offset(limit - 1)
+        .limit(2)
+        .all()
+    )
+    return ids[0].id if len(ids) == 2 else None
+
+
+def photo_page(user_id: int, after_id: int, last_id: Optional[int], page_size: int, db: Session) -> List[tuple]:
+    """
+    The photo_page function returns the next page of photos to export, using the id as the cursor.
+
+    :param user_id: int: Owner of the photos
+    :param after_id: int: Id of the last photo of the previous page
+    :param last_id: Optional[int]: Id of the last photo of the export, None for all
+    :param page_size: int: Number of photos in a page
+    :param db: Session: Pass the database session to the function
+    :return: Photo rows with id, public_id, image_url, description, created_at and updated_at
+    """
+    query = (
+        db.query(Photo.id, Photo.public_id, Photo.image_url, Photo.description, Photo.created_at, Photo.updated_at)
+        .filter(Photo.user_id == user_id, NOT_DELETED, Photo.id > after_id)
+    )
+    if last_id is not None:
+        query = query.filter(Photo.id <= last_id)
+    return query.order_by(Photo.id).limit(page_size).all()
+
+
+def page_details(photo_ids: List[int], db: Session) -> Tuple[Dict[int, list], Dict[int, list]]:
+    """
+    The page_details function loads the tags and the comments of a page of photos with one query each.
+
+    :param photo_ids: List[int]: Ids of the photos of the page
+    :param db: Session: Pass the database session to the function
+    :return: Tags and comments by photo id
+    """
+    tags = {photo_id: [] for photo_id in photo_ids}
+    comments = {photo_id: [] for photo_id in photo_ids}
+    for photo_id, title in (
+            db.query(photo_2_tag.c.photo_id, Tag.title)
+            .join(Tag, Tag.id == photo_2_tag.c.tag_id)
+            .filter(photo_2_tag.c.photo_id.in_(photo_ids))
+            .order_by(photo_2_tag.c.id)):
+        tags[photo_id].append(title)
+    for comment in (
+            db.query(Comment.id, Comment.photos_id, Comment.user_id, Comment.text, Comment.created_at)
+            .filter(Comment.photos_id.in_(photo_ids))
+            .order_by(Comment.id)):
+        comments[comment.photos_id].append({"id": comment.id, "user_id": comment.user_id, "text": comment.text,
+                                            "created_at": isoformat(comment.created_at)})
+    return tags, comments
+
+
+def read_briefly(query: Callable, *args, db: Session):
+    """
+    The read_briefly function runs one read of the export in its own short transaction.
+        A download can take minutes, and a transaction kept open between the pages would hold its snapshot
+        and its pooled connection all that time.
+
+    :param query: Callable: photo_page or page_details
+    :param args: The arguments of the query before the session
+    :param db: Session: The database session
+    :return: The rows returned by the query
+    """
+    try:
+        return query(*args, db)
+    finally:
+        db.rollback()
+
+
+def isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+async def fetch_image(photo) -> Tuple[object, Optional[bytes]]:
+    """
+    The fetch_image function downloads the original image of a photo in a worker thread.
+        A failed download does not stop the export, the photo is marked as missing in the manifest.
+
+    :param photo: A row with id, public_id and image_url
+    :return: The photo and the image, None if it could not be downloaded
+    """
+    try:
+        public_id = photo.public_id or get_public_id_from_image_url(photo.image_url)
+        return photo, await run_in_threadpool(storage.fetch, public_id, photo.image_url)
+    except Exception:
+        logger.warning("Could not fetch the image of photo %s for export", photo.id, exc_info=True)
+        return photo, None
+
+
+async def export_photos(user_id: int, db: Session, after_id: int = 0, last_id: Optional[int] = None,
+                        concurrency: int = 4, page_size: int = 100) -> AsyncIterator[bytes]:
+    """
+    The export_photos function streams a ZIP archive with the original images of a user and a manifest.
+        Photos are read page by page, each page by its own short transaction, and at most ``concurrency`` images
+        are downloaded ahead of the one being written, so neither memory nor open transactions depend on the size
+        of the library. The images are stored as they are, already compressed, in id order. ``manifest.json``
+        comes last and lists the description, tags and comments of every photo; an archive without it
+        was interrupted and can be continued with ``after_id`` set to the id of its last complete image.
+
+    :param user_id: int: Owner of the photos
+    :param db: Session: Pass the database session to the function
+    :param after_id: int: Export only photos with ids above this one
+    :param last_id: Optional[int]: Export only photos up to this id, None for all
+    :param concurrency: int: Maximum number of images downloaded at the same time
+    :param page_size: int: Number of photos read from the database at once
+    :return: Chunks of the archive
+    """
+    stream = ZipStream()
+    archive = zipfile.ZipFile(stream, mode="w", compression=zipfile.ZIP_STORED)
+    missing: Set[int] = set()
+
+    async def write(photo, image: Optional[bytes]) -> bytes:
+        nonlocal exported
+        exported = photo.id
+        if image is None:
+            missing.add(photo.id)
+        else:
+            archive.writestr(photo_file_name(photo), image)
+        return stream.drain()
+
+    pending = deque()
+    cursor = exported = after_id
+    try:
+        while True:
+            page = await run_in_threadpool(read_briefly, photo_page, user_id, cursor, last_id, page_size, db=db)
+            for photo in page:
+                pending.append(asyncio.ensure_future(fetch_image(photo)))
+                if len(pending) >= concurrency:
+                    yield await write(*await pending.popleft())
+            if len(page) < page_size:
+                break
+            cursor = page[-1].id
+        while pending:
+            yield await write(*await pending.popleft())
+    finally:
+        # клієнт відключився: завантаження, що ще тривають, більше не потрібні
+        for task in pending:
+            task.cancel()
+
+    # маніфест пишемо другим проходом по сторінках, щоб не тримати метадані всієї бібліотеки в пам'яті;
+    # фото, додані під час експорту, в архів не потрапили, тож і в маніфест теж
+    info = zipfile.ZipInfo("manifest.json", date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    with archive.open(info, mode="w") as manifest:
+        manifest.write(f'{{"user_id": {user_id}, "after_id": {after_id}, "last_id": {exported}, "photos": ['.encode())
+        cursor, first = after_id, True
+        while cursor < exported:
+            page = await run_in_threadpool(read_briefly, photo_page, user_id, cursor, exported, page_size, db=db)
+            if not page:
+                break
+            tags, comments = await run_in_threadpool(read_briefly, page_details, [photo.id for photo in page], db=db)
+            for photo in page:
+                entry = {
+                    "id": photo.id,
+                    "file": None if photo.id in missing else photo_file_name(photo),
+                    "description": photo.description,
+                    "created_at": isoformat(photo.created_at),
+                    "updated_at": isoformat(photo.updated_at),
+                    "tags": tags[photo.id],
+                    "comments": comments[photo.id],
+                }
+                manifest.write((b"" if first else b",") + json.dumps(entry, ensure_ascii=False).encode())
+                first = False
+            yield stream.drain()
+            cursor = page[-1].id
+        manifest.write(b"]}")
+    archive.close()
+    yield stream.drain()
@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from fastapi import Depends, Header, HTTPException, Request, status
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+
+from src.conf.config import settings
+from src.schemas.schemas import CurrentUser
+from src.services.auth import auth_service
+from src.services.metrics import observe_idempotency
+from src.services.rate_limit import UserRateLimiter
+
+
+IDEMPOTENCY_BACKENDS = ("memory", "redis")
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    media_type: str
+    body: bytes
+
+    def encode(self) -> bytes:
+        return f"{self.fingerprint} {self.status_code} {self.media_type}\n".encode() + self.body
+
+    @classmethod
+    def decode(cls, data: bytes) -> "StoredResponse":
+        head, body = data.split(b"\n", 1)
+        fingerprint, status_code, media_type = head.decode().split(" ", 2)
+        return cls(fingerprint, int(status_code), media_type, body)
+
+
+class MemoryStore:
+    """
+    Responses kept in the memory of the worker, for single-node deployments.
+    Entries are kept in insertion order, so with one ttl for all of them the expired ones are always at the front.
+    Duplicates are serialized by one asyncio lock per key that exists only while someone holds or waits for it.
+    """
+
+    def __init__(self, max_keys: int = 10000, clock: Callable[[], float] = time.monotonic):
+        """
+        The __init__ function creates an empty store.
+
+        :param self: Represent the instance of the class
+        :param max_keys: int: Number of stored responses after which the oldest are dropped
+        :param clock: Callable[[], float]: Source of the current time in seconds
+        :return: Nothing
+        """
+        self.max_keys = max_keys
+        self.clock = clock
+        self._responses: OrderedDict[str, Tuple[float, StoredResponse]] = OrderedDict()
+        self._locks: Dict[str, List] = {}
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._responses.get(key)
+        if entry is None or entry[0] <= self.clock():
+            return None
+        return entry[1]
+
+    async def set(self, key: str, response: StoredResponse, ttl: float) -> None:
+        now = self.clock()
+        self._responses.pop(key, None)
+        self._responses[key] = (now + ttl, response)
+        while self._responses and (len(self._responses) > self.max_keys or next(iter(self._responses.values()))[0] <= now):
+            self._responses.popitem(last=False)
+
+    async def acquire(self, key: str, timeout: float) -> Optional[str]:
+        """
+        The acquire function waits until no other request with the same key is running.
+
+        :param self: Represent the instance of the class
+        :param key: str: The idempotency key with its scope and user
+        :param timeout: float: Seconds to wait for the running request
+        :return: A token for release, None when the running request did not finish in time
+        """
+        # [замок, кількість запитів, які його тримають або чекають]
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(entry[0].acquire(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._forget(key, entry)
+            raise
+        return key
+
+    async def release(self, key: str, token: str) -> None:
+        entry = self._locks[key]
+        entry[0].release()
+        self._forget(key, entry)
+
+    async def keep(self, key: str, token: str) -> None:
+        # замок у пам'яті не спливає, поки його не звільнять
+        pass
+
+    def _forget(self, key: str, entry: List) -> None:
+        entry[1] -= 1
+        if not entry[1]:
+            del self._locks[key]
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisStore:
+    """
+    Responses kept in Redis with their ttl, shared by all workers and nodes.
+    Duplicates are serialized by a lock key set with NX: a waiting request polls it. The request holding
+    the lock renews it while it runs, so a slow upload keeps it, and the lock expires by itself if the worker
+    holding it dies. The client is created on first use.
+    """
+
+    def __init__(self, url: str, prefix: str = "idempotency", lock_ttl: float = 60.0, poll: float = 0.05,
+                 client=None):
+        """
+        The __init__ function stores the connection settings.
+
+        :param self: Represent the instance of the class
+        :param url: str: Redis url, e.g. ``redis://localhost:6379/0``
+        :param prefix: str: Prefix of the keys
+        :param lock_ttl: float: Seconds after which the lock of a crashed request is released, renewed every third
+        :param poll: float: Seconds between two attempts to take the lock
+        :param client: An asyncio Redis client to use instead of connecting to ``url``
+        :return: Nothing
+        """
+        self.url = url
+        self.prefix = prefix
+        self.lock_ttl = lock_ttl
+        self.poll = poll
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio
+
+            self._client = redis.asyncio.from_url(self.url)
+        return self._client
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        data = await self.client.get(f"{self.prefix}:{key}")
+        return StoredResponse.decode(data) if data is not None else None
+
+    async def set(self, key: str, response: StoredResponse, ttl: float) -> None:
+        await self.client.set(f"{self.prefix}:{key}", response.encode(), px=int(ttl * 1000))
+
+    async def acquire(self, key: str, timeout: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+        while not await self.client.set(f"{self.prefix}:{key}:lock", token, nx=True, px=int(self.lock_ttl * 1000)):
+            if time.monotonic() >= deadline:
+                raise asyncio.TimeoutError
+            await asyncio.sleep(self.poll)
+        return token
+
+    async def release(self, key: str, token: str) -> None:
+        lock_key = f"{self.prefix}:{key}:lock"
+        # замок, що встиг прострочитися, вже може належати іншому запиту
+        if await self.client.get(lock_key) == token.encode():
+            await self.client.delete(lock_key)
+
+    async def keep(self, key: str, token: str) -> None:
+        """
+        The keep function renews the lock of a running request until it is cancelled or the lock is lost.
+
+        :param self: Represent the instance of the class
+        :param key: str: The idempotency key with its scope and user
+        :param token: str: The token returned by acquire
+        :return: Nothing
+        """
+        lock_key = f"{self.prefix}:{key}:lock"
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            if await self.client.get(lock_key) != token.encode():
+                return
+            await self.client.pexpire(lock_key, int(self.lock_ttl * 1000))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def get_store():
+    """
+    The get_store function creates the response store selected by ``settings.idempotency_backend``.
+
+    :return: A MemoryStore or RedisStore instance
+    """
+    if settings.idempotency_backend == "redis":
+        return RedisStore(settings.idempotency_redis_url, lock_ttl=settings.idempotency_lock_ttl or settings.web_timeout)
+    return MemoryStore(settings.idempotency_memory_keys)
+
+
+store = get_store()
+
+
+async def request_fingerprint(request: Request) -> str:
+    """
+    The request_fingerprint function hashes what a request asks for, so a key reused for another request is detected.
+        Form fields and uploaded files are hashed from the parsed form, the file is read in chunks and rewound.
+
+    :param request: Request: The request
+    :return: The sha256 of the method, the path and the body
+    """
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("multipart/form-data", "application/x-www-form-urlencoded")):
+        for name, value in (await request.form()).multi_items():
+            digest.update(name.encode() + b"\0")
+            if isinstance(value, UploadFile):
+                while chunk := await value.read(1024 * 1024):
+                    digest.update(chunk)
+                await value.seek(0)
+            else:
+                digest.update(value.encode())
+            digest.update(b"\0")
+    else:
+        digest.update(await request.body())
+    return digest.hexdigest()
+
+
+class IdempotentRequest:
+    """
+    What the route needs to know about the Idempotency-Key of its request: the response to replay, if any,
+    and how to store the response it creates.
+    """
+
+    def __init__(self, scope: str, key: Optional[str] = None, fingerprint: Optional[str] = None,
+                 stored: Optional[StoredResponse] = None):
+        self.scope = scope
+        self.key = key
+        self.fingerprint = fingerprint
+        self.stored = stored
+
+    @property
+    def response(self) -> Optional[Response]:
+        """
+        The response function rebuilds the stored response of the first request with the same key.
+
+        :param self: Represent the instance of the class
+        :return: The response to send again, None when the request has to be executed
+        """
+        if self.stored is None:
+            return None
+        return Response(self.stored.body, status_code=self.stored.status_code, media_type=self.stored.media_type,
+                        headers={REPLAYED_HEADER: "true"})
+
+    async def save(self, model: Type[BaseModel], result, status_code: int = status.HTTP_200_OK) -> Response:
+        """
+        The save function serializes the result of the route and stores it for the retries of the request.
+            Only successful results are stored: a request that failed can be retried with the same key.
+
+        :param self: Represent the instance of the class
+        :param model: Type[BaseModel]: The response model of the route
+        :param result: The object returned by the repository
+        :param status_code: int: Status of the response
+        :return: The response
+        """
+        response = ORJSONResponse(model.model_validate(result).model_dump(mode="json"), status_code=status_code)
+        if self.key is not None:
+            await store.set(self.key, StoredResponse(self.fingerprint, response.status_code, response.media_type,
+                                                     response.body), settings.idempotency_ttl)
+            observe_idempotency(self.scope, "executed")
+        return response
+
+
+class Idempotency:
+    """
+    Dependency that makes a POST route safe to retry with an ``Idempotency-Key`` header.
+    Keys are scoped by the action and the user. A retry gets the stored response of the first request
+    without running the route again; a retry that arrives while the first request is still running waits for it.
+    The same key with a different body is rejected with 422. The rate limit of the route is counted here,
+    after the stored response is looked up, so a replayed retry never uses up the limit or gets 429.
+    """
+
+    def __init__(self, scope: str, limit: Optional[UserRateLimiter] = None):
+        """
+        The __init__ function is called when the class is instantiated.
+
+        :param self: Represent the instance of the class
+        :param scope: str: Name of the action, part of the key and the label of the metrics
+        :param limit: Optional[UserRateLimiter]: Rate limit of the route, counted only for requests that are executed
+        :return: Nothing
+        """
+        self.scope = scope
+        self.limit = limit
+
+    async def count(self, current_user: CurrentUser, response: Response) -> None:
+        if self.limit is not None:
+            await self.limit.check(str(current_user.id), response)
+
+    async def __call__(self, request: Request, response: Response,
+                       idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+                       current_user: CurrentUser = Depends(auth_service.get_current_user)):
+        if idempotency_key is None or not settings.idempotency_enabled:
+            await self.count(current_user, response)
+            yield IdempotentRequest(self.scope)
+            return
+
+        fingerprint = await request_fingerprint(request)
+        key = f"{self.scope}:{current_user.id}:{idempotency_key}"
+        try:
+            token = await store.acquire(key, settings.idempotency_lock_timeout)
+        except asyncio.TimeoutError:
+            observe_idempotency(self.scope, "busy")
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail="A request with this Idempotency-Key is still being processed")
+        keeper = asyncio.create_task(store.keep(key, token))
+        try:
+            stored = await store.get(key)
+            if stored is not None and stored.fingerprint != fingerprint:
+                observe_idempotency(self.scope, "mismatch")
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail="This Idempotency-Key was used with a different request")
+            if stored is not None:
+                observe_idempotency(self.scope, "replayed")
+            else:
+                await self.count(current_user, response)
+            yield IdempotentRequest(self.scope, key, fingerprint, stored)
+        finally:
+            keeper.cancel()
+            # збій продовження замка не повинен зіпсувати відповідь, замок тоді просто спливе
+            with suppress(asyncio.CancelledError, Exception):
+                await keeper
+            await store.release(key, token)
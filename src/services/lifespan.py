@@ -0,0 +1,122 @@
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, configure_mappers
+from starlette.concurrency import run_in_threadpool
+
+from src.conf.config import get_settings, settings
+from src.database.db import SessionLocal, engine
+from src.database.models import Tag, User
+from src.services import idempotency, rate_limit, storage
+from src.services.loop_monitor import LoopLagMonitor
+from src.services.purge import PhotoPurgeWorker
+
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKENDS = ("cloudinary", "local")
+
+loop_monitor = LoopLagMonitor(settings.loop_monitor_interval, settings.loop_lag_threshold)
+photo_purge = PhotoPurgeWorker(SessionLocal, settings.photo_purge_batch_size, settings.photo_purge_interval,
+                               settings.photo_purge_pause, settings.photo_purge_grace,
+                               settings.photo_purge_claim_ttl)
+
+
+def validate_settings() -> None:
+    """
+    The validate_settings function checks the configuration once at startup, so a worker with
+    a broken configuration fails to start instead of failing its first requests.
+
+    :return: Nothing
+    """
+    try:
+        config = get_settings()
+    except ValidationError as exc:
+        raise RuntimeError(f"Invalid configuration: {exc}") from exc
+    if config.storage_backend not in STORAGE_BACKENDS:
+        raise RuntimeError(f"STORAGE_BACKEND must be one of {', '.join(STORAGE_BACKENDS)}, "
+                           f"not {config.storage_backend!r}")
+    if config.storage_backend == "cloudinary" and not all(
+            (config.cloudinary_name, config.cloudinary_api_key, config.cloudinary_api_secret)):
+        raise RuntimeError("CLOUDINARY_NAME, CLOUDINARY_API_KEY and CLOUDINARY_API_SECRET are required")
+    if config.rate_limit_backend not in rate_limit.RATE_LIMIT_BACKENDS:
+        raise RuntimeError(f"RATE_LIMIT_BACKEND must be one of {', '.join(rate_limit.RATE_LIMIT_BACKENDS)}, "
+                           f"not {config.rate_limit_backend!r}")
+    if config.idempotency_backend not in idempotency.IDEMPOTENCY_BACKENDS:
+        raise RuntimeError(f"IDEMPOTENCY_BACKEND must be one of {', '.join(idempotency.IDEMPOTENCY_BACKENDS)}, "
+                           f"not {config.idempotency_backend!r}")
+    for name in type(config).model_fields:
+        if name.startswith("rate_limit_") and name.endswith(("_ip", "_user", "_account")):
+            try:
+                rate_limit.parse_limit(getattr(config, name))
+            except ValueError as exc:
+                raise RuntimeError(f"{name.upper()}: {exc}") from exc
+
+
+def warm_up_database(bind: Engine, connections: int) -> None:
+    """
+    The warm_up_database function opens ``connections`` pooled connections and compiles the hot queries,
+    so the first requests find them ready.
+        Mapper configuration and the statement cache of SQLAlchemy are filled by running the lookups
+        of the current user and of tags once.
+
+    :param bind: Engine: Engine whose pool is warmed up
+    :param connections: int: Number of connections to open, at most the pool size
+    :return: Nothing
+    """
+    configure_mappers()
+    size = getattr(bind.pool, "size", lambda: connections)()
+    held = [bind.connect() for _ in range(min(connections, size))]
+    try:
+        for connection in held:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in held:
+            connection.close()
+    with Session(bind) as db:
+        db.query(User).filter(User.email == "").first()
+        db.query(Tag).filter(Tag.title == "").first()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    The lifespan function prepares the worker before it accepts requests and cleans up after the last one.
+        Startup validates the configuration, warms up the database pool and the storage client and starts
+        the event loop monitor and the photo purge worker; shutdown stops them and closes the rate limit client
+        and the pooled connections.
+
+    :param app: FastAPI: The application
+    :return: Nothing, the worker serves requests while the context is open
+    """
+    started = time.perf_counter()
+    validate_settings()
+    # прогрів лише прискорює перші запити, тож його збій не заважає воркеру стартувати,
+    # а збій бази не скасовує прогрів сховища
+    try:
+        await run_in_threadpool(warm_up_database, engine, settings.db_warmup_connections)
+    except Exception:
+        logger.warning("Database warm-up failed, the first requests will connect on demand", exc_info=True)
+    try:
+        await run_in_threadpool(storage.backend.warm_up)
+    except Exception:
+        logger.warning("Storage warm-up failed, the first uploads will set it up on demand", exc_info=True)
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    if settings.photo_purge_enabled:
+        photo_purge.start()
+    logger.info("Worker ready in %.0f ms", (time.perf_counter() - started) * 1000)
+    try:
+        yield
+    finally:
+        if settings.loop_monitor_enabled:
+            await loop_monitor.stop()
+        await photo_purge.stop()
+        await rate_limit.backend.close()
+        await idempotency.store.close()
+        engine.dispose()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from src.services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def blocking_origin(frame) -> str:
+    """
+    The blocking_origin function names the outermost route, repository or service function on a stack,
+    which is the handler that blocks the event loop.
+
+    :param frame: The innermost frame of the event loop thread
+    :return: "module.function" of the application frame, or "unknown"
+    """
+    origin = "unknown"
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(("src.routes", "src.repository", "src.services")) and module != __name__:
+            origin = f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return origin
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a sleeping task and exports it as a metric.
+
+    A watchdog thread checks the heartbeat of that task; when the loop has not run it for longer than
+    the threshold, the loop is blocked by synchronous code, so the watchdog captures and logs the stack
+    of the event loop thread together with the application function that is running on it.
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1):
+        """
+        The __init__ function sets the sampling interval and the lag threshold.
+
+        :param self: Represent the instance of the class
+        :param interval: float: How often the loop is probed, in seconds
+        :param threshold: float: Lag after which the blocking stack is captured, in seconds
+        :return: Nothing
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.heartbeat = time.monotonic()
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+
+    async def probe(self) -> None:
+        """
+        The probe function sleeps for the interval in a loop and records how late every wake-up is.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            self.heartbeat = time.monotonic()
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            metrics.observe_loop_lag(max(loop.time() - expected, 0.0))
+
+    def watch(self) -> None:
+        """
+        The watch function runs in the watchdog thread and reports every stall of the event loop once.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        """
+        reported = None
+        while not self.stopped.wait(min(self.interval, self.threshold) / 2):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled <= self.threshold or heartbeat == reported:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self.loop_thread_id)
+            if frame is None:
+                continue
+            origin = blocking_origin(frame)
+            metrics.observe_loop_stall(origin)
+            logger.warning("Event loop blocked for more than %.0f ms in %s:\n%s",
+                           stalled * 1000, origin, "".join(traceback.format_stack(frame)))
+
+    def start(self) -> None:
+        """
+        The start function starts the probe task on the running loop and the watchdog thread.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        """
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopped.clear()
+        self.task = asyncio.get_running_loop().create_task(self.probe())
+        self.watchdog = threading.Thread(target=self.watch, name="loop-lag-watchdog", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self) -> None:
+        """
+        The stop function cancels the probe task and stops the watchdog thread.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        """
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        if self.watchdog is not None:
+            self.watchdog.join()
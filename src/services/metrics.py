@@ -0,0 +1,252 @@
+import os
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# ASGI scope поточного запиту, щоб хуки БД і сховища знали свій роут
+current_scope: ContextVar[Optional[Scope]] = ContextVar("current_scope", default=None)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route and status code", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ["method", "route"]
+)
+DB_QUERIES = Counter(
+    "db_queries_total", "Database queries by originating route", ["route"]
+)
+DB_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database query latency by originating route", ["route"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "Number of database queries made by one request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+STORAGE_LATENCY = Histogram(
+    "storage_call_duration_seconds", "Latency of image storage calls", ["operation"]
+)
+STORAGE_ERRORS = Counter(
+    "storage_call_errors_total", "Failed image storage calls", ["operation"]
+)
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of the event loop in waking up a sleeping task",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = Counter(
+    "event_loop_stalls_total", "Event loop stalls over the threshold by blocking function", ["origin"]
+)
+
+PHOTOS_PURGED = Counter(
+    "photos_purged_total", "Deleted photos physically removed by the purge worker"
+)
+PHOTO_PURGE_FAILURES = Counter(
+    "photo_purge_failures_total", "Deleted photos whose images could not be removed from the storage"
+)
+
+RATE_LIMIT_REQUESTS = Counter(
+    "rate_limit_requests_total", "Requests checked by a rate limit, by action, key and decision",
+    ["scope", "key", "result"]
+)
+RATE_LIMIT_KEYS = Gauge(
+    "rate_limit_tracked_keys", "Clients tracked by the in-memory rate limiter", multiprocess_mode="livesum"
+)
+IDEMPOTENCY_REQUESTS = Counter(
+    "idempotency_requests_total", "Requests with an Idempotency-Key, by action and outcome", ["scope", "result"]
+)
+
+
+def route_label(scope: Optional[Scope]) -> str:
+    """
+    The route_label function returns the path template of the route that handles a request.
+        Templates keep the label cardinality bounded, raw paths are never used.
+
+    :param scope: Optional[Scope]: ASGI scope of the request, None outside of requests
+    :return: The route path template, "unmatched" or "background"
+    """
+    if scope is None:
+        return "background"
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records latency and status of every HTTP request by route
+    and exposes the request scope to the database and storage instrumentation.
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        The __init__ function stores the wrapped application.
+
+        :param self: Represent the instance of the class
+        :param app: ASGIApp: The wrapped application
+        :return: Nothing
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        token = current_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_scope.reset(token)
+            route = route_label(scope)
+            HTTP_LATENCY.labels(scope["method"], route).observe(elapsed)
+            HTTP_REQUESTS.labels(scope["method"], route, str(status_code)).inc()
+
+
+def observe_query(route: str, elapsed: float) -> None:
+    """
+    The observe_query function records one database query of a route.
+
+    :param route: str: Route label of the request that made the query
+    :param elapsed: float: Duration of the query in seconds
+    :return: Nothing
+    """
+    DB_QUERIES.labels(route).inc()
+    DB_LATENCY.labels(route).observe(elapsed)
+
+
+def observe_request_queries(route: str, count: int) -> None:
+    """
+    The observe_request_queries function records how many queries one request of a route made.
+
+    :param route: str: Route label of the request
+    :param count: int: Number of queries the request made
+    :return: Nothing
+    """
+    DB_QUERIES_PER_REQUEST.labels(route).observe(count)
+
+
+def observe_loop_lag(lag: float) -> None:
+    """
+    The observe_loop_lag function records one measurement of the event loop lag.
+
+    :param lag: float: How late the loop woke up a sleeping task, in seconds
+    :return: Nothing
+    """
+    LOOP_LAG.observe(lag)
+
+
+def observe_loop_stall(origin: str) -> None:
+    """
+    The observe_loop_stall function counts a stall of the event loop caused by ``origin``.
+
+    :param origin: str: The application function found on the blocked stack
+    :return: Nothing
+    """
+    LOOP_STALLS.labels(origin).inc()
+
+
+def observe_rate_limit(scope: str, key: str, allowed: bool) -> None:
+    """
+    The observe_rate_limit function counts one decision of a rate limit.
+
+    :param scope: str: The limited action, e.g. "login"
+    :param key: str: What the client is identified by: "ip", "user" or "account"
+    :param allowed: bool: Whether the request was let through
+    :return: Nothing
+    """
+    RATE_LIMIT_REQUESTS.labels(scope, key, "allowed" if allowed else "limited").inc()
+
+
+def observe_rate_limit_keys(count: int) -> None:
+    """
+    The observe_rate_limit_keys function records how many clients the in-memory rate limiter tracks.
+
+    :param count: int: Number of tracked counters
+    :return: Nothing
+    """
+    RATE_LIMIT_KEYS.set(count)
+
+
+def observe_idempotency(scope: str, result: str) -> None:
+    """
+    The observe_idempotency function counts one request with an Idempotency-Key.
+
+    :param scope: str: The action, e.g. "photo_upload"
+    :param result: str: "executed", "replayed", "mismatch" or "busy"
+    :return: Nothing
+    """
+    IDEMPOTENCY_REQUESTS.labels(scope, result).inc()
+
+
+def observe_photo_purge(purged: int, failed: int) -> None:
+    """
+    The observe_photo_purge function counts the photos handled by one batch of the purge worker.
+
+    :param purged: int: Photos removed with their images
+    :param failed: int: Photos left for the next run because their images could not be removed
+    :return: Nothing
+    """
+    PHOTOS_PURGED.inc(purged)
+    PHOTO_PURGE_FAILURES.inc(failed)
+
+
+def storage_call(operation: str):
+    """
+    The storage_call decorator records latency and failures of an image storage operation.
+
+    :param operation: str: Name of the operation used as the metric label
+    :return: A decorator for the storage function
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                STORAGE_ERRORS.labels(operation).inc()
+                raise
+            finally:
+                STORAGE_LATENCY.labels(operation).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def render_metrics() -> tuple:
+    """
+    The render_metrics function renders all metrics in the Prometheus text format.
+        When PROMETHEUS_MULTIPROC_DIR is set, every worker writes its samples there
+        and the samples of all workers are aggregated here.
+
+    :return: A tuple of the payload and its content type
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,108 @@
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.database.db import get_db
+from src.schemas.schemas import Role
+from src.services.auth import auth_service
+from src.services.roles import RoleChecker
+
+
+PROFILE_FORMATS = ("html", "speedscope")
+PROFILE_SCOPE = ("event loop thread only: sync (def) routes and dependencies run in the threadpool "
+                 "and appear as time awaited in run_in_threadpool, not as their own frames")
+
+allowed_profiling = RoleChecker([Role.Administrator])
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a single request when an administrator adds ``profile=html``
+    or ``profile=speedscope`` to its query string.
+
+    The profiled request runs normally, but its response is replaced by the report of a sampling
+    profiler: a flamegraph page for ``html`` or a speedscope JSON document for ``speedscope``.
+    Requests without the parameter only pay for one substring check.
+
+    Only the event loop thread is sampled: pyinstrument profiles the thread it was started on. Sync (``def``)
+    routes and dependencies run in Starlette's threadpool, so their time shows up as one await of
+    ``run_in_threadpool`` without the frames inside; only ``async def`` code is broken down. The response
+    says so in its ``X-Profile-Scope`` header.
+    """
+
+    def __init__(self, app: ASGIApp, interval: float = 0.001):
+        """
+        The __init__ function stores the wrapped application and the sampling interval.
+
+        :param self: Represent the instance of the class
+        :param app: ASGIApp: The wrapped application
+        :param interval: float: Sampling interval of the profiler in seconds
+        :return: Nothing
+        """
+        self.app = app
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or b"profile=" not in scope["query_string"]:
+            await self.app(scope, receive, send)
+            return
+        profile_format = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [""])[0]
+        if profile_format not in PROFILE_FORMATS:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.authorize(Request(scope, receive))
+        except HTTPException as exc:
+            response = ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+        # профайлер потрібен лише для профільованих запитів, тож не сповільнює старт воркера
+        from pyinstrument import Profiler
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+
+        headers = {"X-Profiled-Status": str(status_code), "X-Profile-Scope": PROFILE_SCOPE,
+                   "Cache-Control": "no-store"}
+        if profile_format == "html":
+            response = HTMLResponse(profiler.output(HTMLRenderer()), headers=headers)
+        else:
+            response = Response(profiler.output(SpeedscopeRenderer()), media_type="application/json",
+                                headers=headers)
+        await response(scope, receive, send)
+
+    async def authorize(self, request: Request) -> None:
+        """
+        The authorize function lets only administrators profile requests, using the same
+        token validation and RoleChecker as the routes.
+
+        :param self: Represent the instance of the class
+        :param request: Request: The request to profile
+        :return: Nothing, raises HTTPException when the user may not profile
+        """
+        token = await auth_service.oauth2_scheme(request)
+        # middleware працює поза системою залежностей, тому враховуємо перевизначення get_db вручну
+        provider = request.app.dependency_overrides.get(get_db, get_db)
+        db_session = provider()
+        try:
+            user = await auth_service.get_current_user(token, next(db_session))
+            await allowed_profiling(request, user)
+        finally:
+            db_session.close()
@@ -0,0 +1,176 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import delete, or_, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.database.models import Comment, Photo, photo_2_tag
+from src.repository.photos import get_public_id_from_image_url
+from src.services import metrics, storage
+
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeBatch(NamedTuple):
+    last_id: Optional[int]
+    purged: int
+    failed: int
+
+
+def destroy_photo_assets(public_id: str) -> None:
+    """
+    The destroy_photo_assets function removes the original, the transformed image and the QR code of a photo
+    from the storage.
+
+    :param public_id: str: Public id of the original image
+    :return: Nothing
+    """
+    storage.destroy(public_id)
+    storage.destroy("PhotoshareApp_tr/" + public_id)
+    storage.destroy("PhotoshareApp_tr/" + public_id + '_qr')
+
+
+class PhotoPurgeWorker:
+    """
+    Background task that physically removes the photos marked as deleted.
+    Photos are taken in small batches in id order. A short transaction claims the batch, the images of every
+    photo are removed from the storage with no transaction open, then a second short transaction deletes
+    the rows of the batch (with their comments and tag links), and the worker pauses before the next batch
+    so the purge never competes with requests for long. A photo whose images could not be removed
+    is released and retried by the next run; a batch claimed by a worker that died is taken again
+    after ``claim_ttl``.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], batch_size: int = 50, interval: float = 60.0,
+                 pause: float = 1.0, grace: float = 300.0, claim_ttl: float = 600.0):
+        """
+        The __init__ function sets the size and the pace of the purge.
+
+        :param self: Represent the instance of the class
+        :param session_factory: Callable[[], Session]: Creates the database session of a batch
+        :param batch_size: int: Photos removed by one transaction
+        :param interval: float: Seconds between two runs over all deleted photos
+        :param pause: float: Seconds between two batches of one run
+        :param grace: float: Seconds a deleted photo is kept before it is purged
+        :param claim_ttl: float: Seconds after which photos claimed by another worker may be claimed again
+        :return: Nothing
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.pause = pause
+        self.grace = grace
+        self.claim_ttl = claim_ttl
+        self.task: Optional[asyncio.Task] = None
+
+    def claim_batch(self, after_id: int) -> list:
+        """
+        The claim_batch function marks the next batch of deleted photos with ids above ``after_id`` as taken
+            by this worker and commits at once, so no transaction stays open while their images are removed.
+            On PostgreSQL the rows are locked with SKIP LOCKED while they are claimed, so the workers
+            of several processes take different batches instead of removing the same photos twice.
+
+        :param self: Represent the instance of the class
+        :param after_id: int: The last photo id handled by the previous batch of this run
+        :return: The id, public id and image url of the claimed photos
+        """
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            photos = (
+                db.query(Photo.id, Photo.public_id, Photo.image_url)
+                .filter(Photo.deleted_at.isnot(None), Photo.deleted_at <= now - timedelta(seconds=self.grace),
+                        Photo.id > after_id,
+                        or_(Photo.purge_claimed_at.is_(None),
+                            Photo.purge_claimed_at <= now - timedelta(seconds=self.claim_ttl)))
+                .order_by(Photo.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if photos:
+                db.execute(update(Photo).where(Photo.id.in_([photo.id for photo in photos]))
+                           .values(purge_claimed_at=now))
+            db.commit()
+        return photos
+
+    def purge_batch(self, after_id: int = 0) -> PurgeBatch:
+        """
+        The purge_batch function removes the next batch of deleted photos with ids above ``after_id``.
+
+        :param self: Represent the instance of the class
+        :param after_id: int: The last photo id handled by the previous batch of this run
+        :return: The last id of the batch (None when nothing is left), how many photos were purged and how many failed
+        """
+        photos = self.claim_batch(after_id)
+        if not photos:
+            return PurgeBatch(None, 0, 0)
+
+        purged: List[int] = []
+        for photo in photos:
+            try:
+                destroy_photo_assets(photo.public_id or get_public_id_from_image_url(photo.image_url))
+            except Exception:
+                logger.warning("Could not remove the images of photo %s, will retry", photo.id, exc_info=True)
+            else:
+                purged.append(photo.id)
+
+        failed = [photo.id for photo in photos if photo.id not in purged]
+        with self.session_factory() as db:
+            if purged:
+                # без ORM-каскаду: SQLite не виконує ON DELETE CASCADE, якщо не ввімкнено foreign_keys
+                db.execute(delete(photo_2_tag).where(photo_2_tag.c.photo_id.in_(purged)))
+                db.execute(delete(Comment).where(Comment.photos_id.in_(purged)))
+                db.execute(delete(Photo).where(Photo.id.in_(purged)))
+            if failed:
+                db.execute(update(Photo).where(Photo.id.in_(failed)).values(purge_claimed_at=None))
+            db.commit()
+        return PurgeBatch(photos[-1].id, len(purged), len(failed))
+
+    async def run_once(self) -> int:
+        """
+        The run_once function purges all deleted photos past the grace period, batch by batch.
+
+        :param self: Represent the instance of the class
+        :return: Number of purged photos
+        """
+        after_id, total = 0, 0
+        while True:
+            batch = await run_in_threadpool(self.purge_batch, after_id)
+            if batch.last_id is None:
+                return total
+            metrics.observe_photo_purge(batch.purged, batch.failed)
+            total += batch.purged
+            after_id = batch.last_id
+            await asyncio.sleep(self.pause)
+
+    async def run(self) -> None:
+        """
+        The run function purges deleted photos every ``interval`` seconds until it is cancelled.
+
+        :param self: Represent the instance of the class
+        :return: Nothing
+        """
+        while True:
+            try:
+                purged = await self.run_once()
+                if purged:
+                    logger.info("Purged %d deleted photos", purged)
+            except Exception:
+                logger.exception("Photo purge failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
@@ -0,0 +1,151 @@
+import logging
+import sys
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.services import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """
+    Number and total duration of the database queries made while handling one request.
+    """
+    __slots__ = ("count", "duration")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+# Статистика запитів до БД поточного HTTP-запиту
+request_queries: ContextVar[Optional[QueryStats]] = ContextVar("request_queries", default=None)
+
+
+def query_origin() -> str:
+    """
+    The query_origin function finds the repository or service function that issued the current query.
+
+    :return: "module.function" of the innermost application frame, or "unknown"
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith(("src.repository", "src.services", "src.routes")) and module != __name__:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def instrument_engine(engine: Engine, slow_query_threshold_ms: float = 200.0) -> None:
+    """
+    The instrument_engine function times every statement executed by ``engine``.
+        Each query is added to the metrics of its route and to the statistics of the current request,
+        and queries slower than the threshold are logged with their route and repository function.
+
+    :param engine: Engine: The SQLAlchemy engine to instrument
+    :param slow_query_threshold_ms: float: Queries taking longer are logged as slow
+    :return: Nothing
+    """
+    threshold = slow_query_threshold_ms / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # час початку живе в контексті запиту: запит, що впав, не лишає його на з'єднанні з пулу
+        context._query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start_time
+        route = metrics.route_label(metrics.current_scope.get())
+        metrics.observe_query(route, elapsed)
+
+        stats = request_queries.get()
+        if stats is not None:
+            stats.count += 1
+            stats.duration += elapsed
+
+        if elapsed >= threshold:
+            logger.warning("Slow query %.1f ms on %s from %s: %s",
+                           elapsed * 1000, route, query_origin(), " ".join(statement.split()))
+
+
+class QueryStatsMiddleware:
+    """
+    ASGI middleware that collects the query statistics of every request, reports them to the metrics
+    and, in debug mode, returns them in the ``X-DB-Query-Count`` and ``X-DB-Time-Ms`` response headers.
+    """
+
+    def __init__(self, app: ASGIApp, debug: bool = False):
+        """
+        The __init__ function stores the wrapped application and the debug flag.
+
+        :param self: Represent the instance of the class
+        :param app: ASGIApp: The wrapped application
+        :param debug: bool: Add the statistics to the response headers
+        :return: Nothing
+        """
+        self.app = app
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start" and self.debug:
+                headers = MutableHeaders(scope=message)
+                headers["X-DB-Query-Count"] = str(stats.count)
+                headers["X-DB-Time-Ms"] = f"{stats.duration * 1000:.2f}"
+            await send(message)
+
+        token = request_queries.set(stats)
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            request_queries.reset(token)
+            metrics.observe_request_queries(metrics.route_label(scope), stats.count)
+
+
+class QueryCounter:
+    """
+    Context manager that records every statement executed by an engine, used by the tests
+    to put a query budget on an endpoint so N+1 regressions fail.
+    """
+
+    def __init__(self, engine: Engine):
+        """
+        The __init__ function stores the engine to listen to.
+
+        :param self: Represent the instance of the class
+        :param engine: Engine: The engine whose statements are recorded
+        :return: Nothing
+        """
+        self.engine = engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "after_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "after_cursor_execute", self.record)
+        return False
@@ -0,0 +1,293 @@
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from src.conf.config import settings
+from src.schemas.schemas import CurrentUser
+from src.services.auth import auth_service
+from src.services.metrics import observe_rate_limit, observe_rate_limit_keys
+
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+RATE_LIMIT_BACKENDS = ("memory", "redis")
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+
+
+@lru_cache(maxsize=64)
+def parse_limit(spec: str) -> Tuple[int, int]:
+    """
+    The parse_limit function reads a limit written as ``"<count>/<period>"``, e.g. ``"5/minute"``.
+        The period is second, minute, hour or day, optionally prefixed with a number: ``"100/10minute"``.
+
+    :param spec: str: The limit as written in the settings
+    :return: A tuple of the number of requests and the window in seconds
+    """
+    try:
+        count, period = "".join(spec.split()).lower().split("/")
+        period = period.rstrip("s")
+        digits = len(period) - len(period.lstrip("0123456789"))
+        window = int(period[:digits] or 1) * PERIODS[period[digits:]]
+        limit = int(count)
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '5/minute'")
+    if limit < 1 or window < 1:
+        raise ValueError(f"Invalid rate limit {spec!r}, count and period must be positive")
+    return limit, window
+
+
+def evaluate(previous: int, current: int, elapsed: float, window: int, limit: int) -> RateLimitResult:
+    """
+    The evaluate function applies the sliding window to the counters of two fixed windows.
+        The requests of the previous window are weighted by the part of it that still lies inside the
+        sliding window, so the estimate moves smoothly instead of resetting at the window boundary.
+        ``current`` already includes the request being checked.
+
+    :param previous: int: Requests counted in the previous fixed window
+    :param current: int: Requests counted in the current fixed window, including this one
+    :param elapsed: float: Seconds since the start of the current fixed window
+    :param window: int: Length of the window in seconds
+    :param limit: int: Number of requests allowed per window
+    :return: The decision with the remaining requests and the seconds to wait when denied
+    """
+    estimate = previous * (1 - elapsed / window) + current
+    if estimate <= limit:
+        return RateLimitResult(True, limit, int(limit - estimate), 0)
+    accepted = current - 1
+    if accepted + 1 <= limit:
+        # досить дочекатися, поки вага попереднього вікна зменшиться
+        wait = window * (1 - (limit - accepted - 1) / previous) - elapsed
+    else:
+        wait = window - elapsed + window * (1 - (limit - 1) / accepted)
+    return RateLimitResult(False, limit, 0, max(1, math.ceil(wait)))
+
+
+class MemoryBackend:
+    """
+    Rate limit counters kept in the memory of the worker, for single-node deployments.
+    Every worker counts on its own, so with several workers a client gets up to ``workers`` times the limit.
+    """
+
+    def __init__(self, max_keys: int = 100000, clock: Callable[[], float] = time.time):
+        """
+        The __init__ function creates an empty counter table.
+
+        :param self: Represent the instance of the class
+        :param max_keys: int: Number of tracked clients after which stale counters are dropped
+        :param clock: Callable[[], float]: Source of the current time in seconds
+        :return: Nothing
+        """
+        self.max_keys = max_keys
+        self.clock = clock
+        self._counters: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """
+        The hit function counts a request of ``key`` if it fits into the limit.
+            Denied requests are not counted, so a client that keeps retrying is let in as soon as the window allows.
+
+        :param self: Represent the instance of the class
+        :param key: str: The client, e.g. ``"login:ip:10.0.0.1"``
+        :param limit: int: Number of requests allowed per window
+        :param window: int: Length of the window in seconds
+        :return: The decision
+        """
+        now = self.clock()
+        index = int(now // window)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                if len(self._counters) >= self.max_keys:
+                    self._evict(now)
+                counter = self._counters[key] = [index, 0, 0, 0.0]
+            if counter[0] != index:
+                # [номер вікна, запити поточного, запити попереднього, коли лічильник застаріє]
+                counter[2] = counter[1] if counter[0] == index - 1 else 0
+                counter[0], counter[1] = index, 0
+            counter[3] = (index + 2) * window
+            result = evaluate(counter[2], counter[1] + 1, now - index * window, window, limit)
+            if result.allowed:
+                counter[1] += 1
+            observe_rate_limit_keys(len(self._counters))
+        return result
+
+    def _evict(self, now: float) -> None:
+        """
+        The _evict function drops the counters that can no longer limit anyone and, if the table is
+        still full, the oldest ones. The caller holds the lock.
+
+        :param self: Represent the instance of the class
+        :param now: float: The current time in seconds
+        :return: Nothing
+        """
+        for key in [key for key, counter in self._counters.items() if counter[3] <= now]:
+            del self._counters[key]
+        while len(self._counters) >= self.max_keys:
+            del self._counters[next(iter(self._counters))]
+
+    async def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            observe_rate_limit_keys(0)
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBackend:
+    """
+    Rate limit counters kept in Redis (or any server speaking its protocol), shared by all workers and nodes.
+    Only INCR, DECR, EXPIRE and GET are used, without scripts: the request is counted first and
+    taken back when it does not fit, so concurrent requests never get past the limit together.
+    The client is created on first use.
+    """
+
+    def __init__(self, url: str, prefix: str = "rate_limit", clock: Callable[[], float] = time.time, client=None):
+        """
+        The __init__ function stores the connection settings.
+
+        :param self: Represent the instance of the class
+        :param url: str: Redis url, e.g. ``redis://localhost:6379/0``
+        :param prefix: str: Prefix of the counter keys
+        :param clock: Callable[[], float]: Source of the current time in seconds, shared by all nodes
+        :param client: An asyncio Redis client to use instead of connecting to ``url``
+        :return: Nothing
+        """
+        self.url = url
+        self.prefix = prefix
+        self.clock = clock
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            import redis.asyncio
+
+            self._client = redis.asyncio.from_url(self.url)
+        return self._client
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """
+        The hit function counts a request of ``key`` if it fits into the limit.
+
+        :param self: Represent the instance of the class
+        :param key: str: The client, e.g. ``"upload:user:42"``
+        :param limit: int: Number of requests allowed per window
+        :param window: int: Length of the window in seconds
+        :return: The decision
+        """
+        now = self.clock()
+        index = int(now // window)
+        current_key = f"{self.prefix}:{key}:{window}:{index}"
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.incr(current_key)
+            pipe.expire(current_key, window * 2)
+            pipe.get(f"{self.prefix}:{key}:{window}:{index - 1}")
+            current, _, previous = await pipe.execute()
+        result = evaluate(int(previous or 0), current, now - index * window, window, limit)
+        if not result.allowed:
+            await self.client.decr(current_key)
+        return result
+
+    async def reset(self) -> None:
+        async for key in self.client.scan_iter(match=f"{self.prefix}:*"):
+            await self.client.delete(key)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def get_backend():
+    """
+    The get_backend function creates the rate limit backend selected by ``settings.rate_limit_backend``.
+
+    :return: A MemoryBackend or RedisBackend instance
+    """
+    if settings.rate_limit_backend == "redis":
+        return RedisBackend(settings.rate_limit_redis_url)
+    return MemoryBackend(settings.rate_limit_memory_keys)
+
+
+backend = get_backend()
+
+
+class RateLimiter:
+    """
+    Dependency that limits how often one client calls a route, by client IP.
+    Behind a proxy the IP comes from X-Forwarded-For only when the proxy is listed in WEB_FORWARDED_ALLOW_IPS.
+    The limit is read from the setting named ``setting`` on every request, so it can be changed in tests.
+    """
+
+    key_type = "ip"
+
+    def __init__(self, scope: str, setting: str):
+        """
+        The __init__ function is called when the class is instantiated.
+
+        :param self: Represent the instance of the class
+        :param scope: str: Name of the limited action, the label of the metrics
+        :param setting: str: Name of the setting with the limit, e.g. ``"rate_limit_login_ip"``
+        :return: Nothing
+        """
+        self.scope = scope
+        self.setting = setting
+
+    async def __call__(self, request: Request, response: Response):
+        await self.check(request.client.host if request.client else "unknown", response)
+
+    async def check(self, client: str, response: Response) -> None:
+        """
+        The check function counts a request of ``client`` and raises 429 Too Many Requests when it is over the limit.
+            The limit headers are added to the response either way.
+
+        :param self: Represent the instance of the class
+        :param client: str: The IP address, user id or account name of the client
+        :param response: Response: The response of the route
+        :return: Nothing
+        """
+        if not settings.rate_limit_enabled:
+            return
+        limit, window = parse_limit(getattr(settings, self.setting))
+        result = await backend.hit(f"{self.scope}:{self.key_type}:{client}", limit, window)
+        observe_rate_limit(self.scope, self.key_type, result.allowed)
+        headers = {"X-RateLimit-Limit": str(result.limit), "X-RateLimit-Remaining": str(result.remaining)}
+        if not result.allowed:
+            headers["Retry-After"] = str(result.retry_after)
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="Too many requests, try again later", headers=headers)
+        response.headers.update(headers)
+
+
+class UserRateLimiter(RateLimiter):
+    """
+    Dependency that limits how often one authenticated user calls a route, wherever the requests come from.
+    """
+
+    key_type = "user"
+
+    async def __call__(self, response: Response, current_user: CurrentUser = Depends(auth_service.get_current_user)):
+        await self.check(str(current_user.id), response)
+
+
+class AccountRateLimiter(RateLimiter):
+    """
+    Dependency that limits login attempts on one account, so passwords can not be guessed from many addresses.
+    """
+
+    key_type = "account"
+
+    async def __call__(self, response: Response, body: OAuth2PasswordRequestForm = Depends()):
+        await self.check(body.username.strip().lower(), response)
@@ -0,0 +1,172 @@
+import os
+import shutil
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from src.conf.config import settings
+from src.services.metrics import storage_call
+
+
+class CloudinaryStorage:
+    """
+    Image storage backed by Cloudinary, used in production.
+    The SDK is imported and configured once, on first use or by warm_up at startup.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._http = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import cloudinary
+            import cloudinary.uploader
+
+            cloudinary.config(
+                cloud_name=settings.cloudinary_name,
+                api_key=settings.cloudinary_api_key,
+                api_secret=settings.cloudinary_api_secret,
+                secure=True
+            )
+            self._client = cloudinary
+        return self._client
+
+    def warm_up(self) -> None:
+        self.client
+
+    def upload(self, file, **options) -> dict:
+        return self.client.uploader.upload(file, **options)
+
+    def destroy(self, public_id: str) -> dict:
+        return self.client.uploader.destroy(public_id)
+
+    def build_url(self, public_id: str, format: str = None, **options) -> str:
+        return self.client.CloudinaryImage(public_id, format=format).build_url(**options)
+
+    def fetch(self, public_id: str, url: str = None) -> bytes:
+        if self._http is None:
+            import requests
+
+            self._http = requests.Session()
+        response = self._http.get(url or self.build_url(public_id), timeout=30)
+        response.raise_for_status()
+        return response.content
+
+
+class LocalStorage:
+    """
+    Image storage on the local file system with the same interface as CloudinaryStorage.
+    It stands in for Cloudinary in tests, load tests and local development: uploads are written
+    under ``root`` and transformations are not applied, so a transformed image is a copy of the original.
+    """
+
+    def __init__(self, root: str, base_url: str):
+        """
+        The __init__ function sets the directory and the url prefix of the stored images.
+
+        :param self: Represent the instance of the class
+        :param root: str: Directory the images are written to
+        :param base_url: str: Url prefix under which the images are served
+        :return: Nothing
+        """
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def warm_up(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, public_id: str) -> Path:
+        return self.root / public_id
+
+    def upload(self, file, public_id: str, folder: str = None, **options) -> dict:
+        if folder:
+            public_id = f"{folder}/{public_id}"
+        target = self.path(public_id)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(file, (bytes, bytearray)):
+            target.write_bytes(file)
+        elif isinstance(file, str):
+            # завантаження за url: копіюємо оригінал, трансформації локально не застосовуються
+            source = urlparse(file).path.removeprefix(urlparse(self.base_url).path).strip("/")
+            shutil.copyfile(self.path(source), target)
+        else:
+            with open(target, "wb") as output:
+                shutil.copyfileobj(file, output)
+        return {"public_id": public_id, "version": int(time.time()), "secure_url": self.build_url(public_id)}
+
+    def destroy(self, public_id: str) -> dict:
+        try:
+            os.remove(self.path(public_id))
+        except FileNotFoundError:
+            return {"result": "not found"}
+        return {"result": "ok"}
+
+    def build_url(self, public_id: str, format: str = None, **options) -> str:
+        return f"{self.base_url}/{public_id}"
+
+    def fetch(self, public_id: str, url: str = None) -> bytes:
+        return self.path(public_id).read_bytes()
+
+
+def get_backend():
+    """
+    The get_backend function creates the storage backend selected by ``settings.storage_backend``.
+
+    :return: A CloudinaryStorage or LocalStorage instance
+    """
+    if settings.storage_backend == "local":
+        return LocalStorage(settings.local_storage_path, settings.local_storage_url)
+    return CloudinaryStorage()
+
+
+backend = get_backend()
+
+
+@storage_call("upload")
+def upload(file, **options) -> dict:
+    """
+    The upload function uploads an image (bytes, file object or URL) to the storage.
+
+    :param file: The image to upload
+    :param **options: Upload options such as public_id, folder and overwrite
+    :return: The upload result with secure_url, version and public_id
+    """
+    return backend.upload(file, **options)
+
+
+@storage_call("destroy")
+def destroy(public_id: str) -> dict:
+    """
+    The destroy function removes an image from the storage.
+
+    :param public_id: str: Public id of the image, including its folder
+    :return: The result of the removal
+    """
+    return backend.destroy(public_id)
+
+
+@storage_call("build_url")
+def build_url(public_id: str, format: str = None, **options) -> str:
+    """
+    The build_url function builds the delivery url of an image with optional transformations.
+
+    :param public_id: str: Public id of the image, including its folder
+    :param format: str: Delivery format, for example "png"
+    :param **options: Transformation options
+    :return: The url of the image
+    """
+    return backend.build_url(public_id, format=format, **options)
+
+
+@storage_call("fetch")
+def fetch(public_id: str, url: str = None) -> bytes:
+    """
+    The fetch function downloads an image from the storage.
+
+    :param public_id: str: Public id of the image, including its folder
+    :param url: str: Delivery url of the image, used instead of building one when it is known
+    :return: The content of the image
+    """
+    return backend.fetch(public_id, url)
@@ -1,17 +1,27 @@
+import os
+from contextlib import contextmanager
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 
+# ліміти частоти вмикають лише тести, які їх перевіряють
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# /metrics вимкнено за замовчуванням, тести читають його без токена
+os.environ.setdefault("METRICS_ENABLED", "true")
+
 from main import app
 from src.database.models import Base
 from src.database.db import get_db
+from src.services.queries import instrument_engine, QueryCounter
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+instrument_engine(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 @pytest.fixture(scope="module")
@@ -41,6 +51,23 @@ def test_client(session: Session):
     yield TestClient(app)
 
 
+@pytest.fixture
+def max_queries():
+    """
+    The max_queries fixture returns a context manager that fails the test when the code inside it
+    runs more database queries than the given budget.
+
+    :return: A function taking the budget and returning the context manager
+    """
+    @contextmanager
+    def budget(limit: int):
+        with QueryCounter(engine) as counter:
+            yield counter
+        assert counter.count <= limit, f"{counter.count} queries over a budget of {limit}: {counter.statements}"
+
+    return budget
+
+
 @pytest.fixture(scope="module")
 def user_data():
     return {
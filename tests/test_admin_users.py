@@ -0,0 +1,136 @@
+from datetime import datetime
+
+import pytest
+from starlette import status
+
+from src.database.models import Comment, Photo, Tag, User
+
+
+@pytest.fixture(scope="module")
+def admin_headers(test_client, session):
+    def signup(name: str, roles: list) -> int:
+        user_data = {"username": name, "email": f"{name}@example.com", "password": f"{name}password",
+                     "roles": roles, "is_active": True}
+        assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+        return session.query(User).filter(User.email == user_data["email"]).first().id
+
+    admin_id = signup("listadmin", ["Administrator"])
+    busy_id = signup("listbusy", ["User"])
+    idle_id = signup("listidle", ["User"])
+    moderator_id = signup("listmoderator", ["Moderator"])
+
+    photos = [Photo(image_url=f"https://example.com/list{i}.png", description="listed", user_id=busy_id,
+                    updated_at=datetime(2026, 1, 1 + i)) for i in range(3)]
+    session.add_all(photos)
+    session.add(Tag(title="listtag", user_id=busy_id, created_at=datetime(2026, 2, 1)))
+    session.flush()
+    session.add_all([Comment(text="listed", user_id=busy_id, photos_id=photos[0].id, updated_at=datetime(2025, 1, 1)),
+                     Comment(text="listed", user_id=moderator_id, photos_id=photos[0].id,
+                             updated_at=datetime(2026, 3, 1))])
+    session.query(User).filter(User.id == idle_id).update({"is_active": False})
+    session.commit()
+
+    response = test_client.post("/api/auth/login",
+                                data={"username": "listadmin@example.com", "password": "listadminpassword"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}",
+            "ids": {"admin": admin_id, "busy": busy_id, "idle": idle_id, "moderator": moderator_id}}
+
+
+def listing(test_client, admin_headers, query: str = "") -> dict:
+    response = test_client.get(f"/api/users/?limit=100{query}",
+                               headers={"Authorization": admin_headers["Authorization"]})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_list_users_with_stats(test_client, admin_headers, max_queries):
+    with max_queries(1):
+        result = listing(test_client, admin_headers)
+    users = {user["id"]: user for user in result["users"]}
+    assert result["total"] == len(result["users"])
+
+    busy = users[admin_headers["ids"]["busy"]]
+    assert (busy["photos_count"], busy["comments_count"], busy["tags_count"]) == (3, 1, 1)
+    assert busy["last_activity"].startswith("2026-02-01")
+    assert users[admin_headers["ids"]["moderator"]]["last_activity"].startswith("2026-03-01")
+    assert users[admin_headers["ids"]["idle"]]["last_activity"] is None
+
+
+def test_list_users_sort_and_filter(test_client, admin_headers):
+    result = listing(test_client, admin_headers, "&sort=photos_count&order=desc")
+    assert result["users"][0]["photos_count"] >= result["users"][-1]["photos_count"]
+
+    result = listing(test_client, admin_headers, "&sort=last_activity&order=desc")
+    assert result["users"][0]["id"] == admin_headers["ids"]["moderator"]
+    assert result["users"][-1]["last_activity"] is None
+
+    result = listing(test_client, admin_headers, "&is_active=false")
+    assert [user["id"] for user in result["users"]] == [admin_headers["ids"]["idle"]]
+    assert result["total"] == 1
+
+    result = listing(test_client, admin_headers, "&role=Moderator")
+    assert {user["roles"] for user in result["users"]} == {"Moderator"}
+
+    response = test_client.get("/api/users/?limit=1&skip=1&sort=id&order=asc",
+                               headers={"Authorization": admin_headers["Authorization"]})
+    page = response.json()
+    assert len(page["users"]) == 1 and page["total"] >= 4
+
+
+def test_list_users_requires_administrator(test_client, admin_headers):
+    user_data = {"username": "listuser", "email": "listuser@example.com", "password": "listuserpassword",
+                 "roles": ["User"], "is_active": True}
+    test_client.post("/api/auth/signup", json=user_data)
+    token = test_client.post("/api/auth/login", data={"username": user_data["email"],
+                                                      "password": user_data["password"]}).json()["access_token"]
+
+    response = test_client.get("/api/users/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_bulk_deactivate_and_reactivate(test_client, admin_headers, session, max_queries):
+    auth = {"Authorization": admin_headers["Authorization"]}
+    ids = []
+    for i in range(3):
+        user_data = {"username": f"spam{i}", "email": f"spam{i}@example.com", "password": "spampassword",
+                     "roles": ["User"], "is_active": True}
+        test_client.post("/api/auth/signup", json=user_data)
+        ids.append(session.query(User.id).filter(User.email == user_data["email"]).scalar())
+    tokens = test_client.post("/api/auth/login",
+                              data={"username": "spam0@example.com", "password": "spampassword"}).json()
+    spam_auth = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert test_client.get("/api/tags/my/", headers=spam_auth).status_code == status.HTTP_200_OK
+
+    with max_queries(2):
+        response = test_client.patch("/api/users/bulk", json={"ids": ids + [ids[0], 999999], "is_active": False},
+                                     headers=auth)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {"requested": 4, "updated": 3, "unchanged": 0, "not_found": [999999],
+                               "detail": "Users successfully updated"}
+    assert test_client.get("/api/tags/my/", headers=spam_auth).status_code == status.HTTP_401_UNAUTHORIZED
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = test_client.patch("/api/users/bulk", json={"ids": ids, "is_active": False}, headers=auth)
+    assert response.json()["unchanged"] == 3
+
+    response = test_client.patch("/api/users/bulk", json={"ids": ids[:2], "is_active": True, "roles": "Moderator"},
+                                 headers=auth)
+    assert response.json()["updated"] == 2
+    session.expire_all()
+    assert [user.is_active for user in session.query(User).filter(User.id.in_(ids)).order_by(User.id)] \
+        == [True, True, False]
+    tokens = test_client.post("/api/auth/login",
+                              data={"username": "spam0@example.com", "password": "spampassword"}).json()
+    assert test_client.get("/api/tags/my/",
+                           headers={"Authorization": f"Bearer {tokens['access_token']}"}).status_code == 200
+
+
+def test_bulk_patch_rejects_own_account_and_empty_change(test_client, admin_headers):
+    auth = {"Authorization": admin_headers["Authorization"]}
+    response = test_client.patch("/api/users/bulk", json={"ids": [admin_headers["ids"]["admin"]], "is_active": False},
+                                 headers=auth)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = test_client.patch("/api/users/bulk", json={"ids": [admin_headers["ids"]["busy"]]}, headers=auth)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
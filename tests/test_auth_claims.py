@@ -0,0 +1,91 @@
+import pytest
+from jose import jwt
+from starlette import status
+
+from src.conf.config import get_settings
+from src.services.auth import Auth, auth_service
+
+
+@pytest.fixture(scope="module")
+def claims_user(test_client):
+    user_data = {"username": "claims", "email": "claims@example.com", "password": "claimspassword",
+                 "roles": ["User"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    admin_data = {"username": "claimsadmin", "email": "claimsadmin@example.com", "password": "adminpassword",
+                  "roles": ["Administrator"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=admin_data).status_code == status.HTTP_201_CREATED
+    return user_data, admin_data
+
+
+def login(test_client, user_data) -> dict:
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_token_carries_claims(test_client, claims_user):
+    headers = login(test_client, claims_user[0])
+
+    payload = jwt.decode(headers["Authorization"][7:], auth_service.SECRET_KEY, algorithms=[auth_service.ALGORITHM])
+
+    assert payload["sub"] == "claims@example.com"
+    assert payload["roles"] == "User"
+    assert payload["ver"] == 0
+    assert isinstance(payload["uid"], int)
+
+
+def test_authenticated_read_skips_user_query(test_client, claims_user, max_queries):
+    headers = login(test_client, claims_user[0])
+
+    with max_queries(1) as counter:
+        response = test_client.get("/api/tags/my/", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert not any("FROM users" in statement for statement in counter.statements)
+
+
+def test_token_version_cache_reads_settings_on_first_use(monkeypatch):
+    auth = Auth()
+    monkeypatch.setattr(get_settings(), "auth_cache_ttl", 5.0)
+    monkeypatch.setattr(get_settings(), "auth_cache_entries", 7)
+
+    assert (auth.token_versions.ttl, auth.token_versions.max_entries) == (5.0, 7)
+    assert auth.token_versions is auth.token_versions
+
+
+def test_version_is_loaded_on_cache_miss(test_client, claims_user):
+    headers = login(test_client, claims_user[0])
+    auth_service.token_versions.clear()
+
+    assert test_client.get("/api/tags/my/", headers=headers).status_code == status.HTTP_200_OK
+
+
+def test_password_change_revokes_tokens(test_client, claims_user):
+    user_data = claims_user[0]
+    headers = login(test_client, user_data)
+
+    update = {"email": user_data["email"], "username": user_data["username"], "password": user_data["password"]}
+    response = test_client.put("/api/users/edit", json=update, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    assert test_client.get("/api/tags/my/", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+    assert test_client.get("/api/tags/my/", headers=login(test_client, user_data)).status_code == status.HTTP_200_OK
+
+
+def test_deactivation_revokes_tokens(test_client, claims_user):
+    user_data, admin_data = claims_user
+    headers = login(test_client, user_data)
+    user_id = test_client.get("/api/users/me/", headers=headers).json()["id"]
+
+    response = test_client.patch(f"/api/users/patch/{user_id}", json={"is_active": False},
+                                 headers=login(test_client, admin_data))
+    assert response.status_code == status.HTTP_200_OK
+
+    assert test_client.get("/api/tags/my/", headers=headers).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_role_check_uses_claims(test_client, claims_user):
+    response = test_client.get("/api/tags/all/", headers=login(test_client, claims_user[1]))
+
+    assert response.status_code == status.HTTP_200_OK
@@ -0,0 +1,161 @@
+import json
+import zipfile
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from src.database.models import Photo, Tag, User, photo_2_tag
+from src.services import bulk_import, storage
+from src.services.bulk_import import Checkpoint, import_photos, open_source
+from src.services.storage import LocalStorage
+
+
+MANIFEST = [
+    {"file": "a.png", "description": "first", "tags": ["imported", "sea"], "created_at": "2019-07-01T10:00:00"},
+    {"file": "b.png", "description": "second", "tags": "sea, mountains"},
+    {"file": "missing.png", "description": "lost"},
+    {"file": "c.png", "tags": ["one", "two", "three", "four", "five", "six"]},
+    {"file": "d.png"},
+    {"file": "e.png", "tags": ["imported"]},
+]
+
+
+@pytest.fixture(scope="module")
+def owner(session):
+    user = User(username="importer", email="importer@example.com", password="secret")
+    session.add_all([user, Tag(title="sea", user_id=None)])
+    session.commit()
+    return user
+
+
+@pytest.fixture(autouse=True)
+def local_storage(tmp_path, monkeypatch):
+    backend = LocalStorage(str(tmp_path / "storage"), "http://testserver/storage")
+    monkeypatch.setattr(storage, "backend", backend)
+    return backend
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / "library"
+    root.mkdir()
+    for name in ("a.png", "b.png", "c.png", "d.png", "e.png"):
+        (root / name).write_bytes(name.encode())
+    (root / "manifest.jsonl").write_text("\n".join(json.dumps(item) for item in MANIFEST) + "\n")
+    return root
+
+
+def imported(session, owner) -> list:
+    session.expire_all()
+    return session.query(Photo).filter(Photo.user_id == owner.id).order_by(Photo.id).all()
+
+
+def run(session, owner, source, checkpoint, **options):
+    source = open_source(str(source))
+    try:
+        return import_photos(source, owner, lambda: Session(session.get_bind()), checkpoint, **options)
+    finally:
+        source.close()
+
+
+def test_import_directory(session, owner, library, tmp_path, local_storage, max_queries):
+    checkpoint = Checkpoint.load(str(tmp_path / "import.json"))
+    # один пакет: власник, наявні фото, теги (SQLite вставляє нові теги по одному), фото і зв'язки
+    with max_queries(9):
+        report = run(session, owner, library, checkpoint, workers=3, batch_size=10)
+
+    assert (report.imported, report.failed, report.skipped) == (4, 2, 0)
+    assert report.bytes == 20 and report.photos_per_second > 0
+    photos = imported(session, owner)
+    assert [photo.description for photo in photos] == ["first", "second", None, None]
+    assert [[tag.title for tag in photo.tags] for photo in photos[:2]] == [["imported", "sea"], ["sea", "mountains"]]
+    assert photos[0].created_at.year == 2019
+    assert session.query(Tag).filter(Tag.title == "sea").count() == 1
+    assert local_storage.fetch(photos[1].public_id) == b"b.png"
+
+    saved = json.loads((tmp_path / "import.json").read_text())
+    assert (saved["done"], saved["failed"]) == (6, [2, 3])
+    # повторний запуск з тим самим checkpoint нічого не додає
+    assert run(session, owner, library, Checkpoint.load(str(tmp_path / "import.json"))).imported == 0
+
+    for photo in photos:
+        session.delete(photo)
+    session.commit()
+
+
+def test_import_resumes_after_crash(session, owner, library, tmp_path, monkeypatch):
+    path = str(tmp_path / "import.json")
+    save = Checkpoint.save
+    calls = []
+
+    def crash_after_commit(self):
+        calls.append(self.done)
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        save(self)
+
+    monkeypatch.setattr(Checkpoint, "save", crash_after_commit)
+    with pytest.raises(KeyboardInterrupt):
+        run(session, owner, library, Checkpoint.load(path), workers=2, batch_size=3)
+    monkeypatch.setattr(Checkpoint, "save", save)
+
+    # другий пакет уже в базі, але checkpoint його не записав
+    assert len(imported(session, owner)) == 4
+    checkpoint = Checkpoint.load(path)
+    assert checkpoint.done == 3
+    report = run(session, owner, library, checkpoint, workers=2, batch_size=3)
+
+    assert (report.imported, report.skipped, report.failed) == (0, 2, 1)
+    photos = imported(session, owner)
+    assert len(photos) == 4 and len({photo.public_id for photo in photos}) == 4
+    assert session.query(photo_2_tag).filter(photo_2_tag.c.photo_id.in_([photo.id for photo in photos])).count() == 5
+
+    for photo in photos:
+        session.delete(photo)
+    session.commit()
+
+
+def test_import_export_archive(session, owner, tmp_path):
+    archive = tmp_path / "export.zip"
+    with zipfile.ZipFile(archive, "w") as output:
+        output.writestr("photos/1.png", b"exported")
+        output.writestr("manifest.json", json.dumps({"user_id": 1, "photos": [
+            {"id": 1, "file": "photos/1.png", "description": "from export", "tags": ["sea"], "comments": []},
+            {"id": 2, "file": None, "description": "image was missing", "tags": [], "comments": []},
+        ]}))
+
+    report = run(session, owner, archive, Checkpoint.load(None))
+
+    assert (report.imported, report.failed) == (1, 1)
+    assert [photo.description for photo in imported(session, owner)] == ["from export"]
+
+
+def test_directory_source_stays_inside_root(library):
+    with pytest.raises(FileNotFoundError):
+        bulk_import.DirectorySource(library).read("../outside.png")
+
+
+def test_resume_check_uses_public_id_index(session):
+    plan = session.execute(text("EXPLAIN QUERY PLAN SELECT public_id FROM photos WHERE public_id IN ('a', 'b')")).all()
+    assert any("ix_photos_public_id" in row[-1] for row in plan)
+
+
+def test_failed_batch_leaves_no_tags(session, owner, tmp_path, monkeypatch):
+    root = tmp_path / "failing"
+    root.mkdir()
+    (root / "a.png").write_bytes(b"a")
+    (root / "manifest.json").write_text(json.dumps([{"file": "a.png", "tags": ["never-committed"]}]))
+    insert = bulk_import.insert
+
+    def insert_failing_on_photos(table):
+        if table is Photo:
+            raise RuntimeError("database went away")
+        return insert(table)
+
+    monkeypatch.setattr(bulk_import, "insert", insert_failing_on_photos)
+    with pytest.raises(RuntimeError):
+        run(session, owner, root, Checkpoint.load(None))
+
+    session.expire_all()
+    assert session.query(Tag).filter(Tag.title == "never-committed").count() == 0
@@ -0,0 +1,68 @@
+import gzip
+
+import brotli
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+from starlette import status
+
+from src.services.compression import CompressionMiddleware, parse_accept_encoding
+from src.services.etags import check_if_match, is_not_modified, not_modified
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip, br;q=0.5, identity;q=0") == {"gzip": 1.0, "br": 0.5, "identity": 0.0}
+    middleware = CompressionMiddleware(app=None)
+    assert middleware.choose_coding("gzip, deflate, br") == "br"
+    assert middleware.choose_coding("gzip, br;q=0") == "gzip"
+    assert middleware.choose_coding("identity") is None
+    assert middleware.choose_coding("*") == "br"
+
+
+def test_compressed_responses(test_client):
+    plain = test_client.get("/openapi.json", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+
+    # httpx розпаковує тіло сам, тому порівнюємо сирі байти
+    with test_client.stream("GET", "/openapi.json", headers={"Accept-Encoding": "br"}) as response:
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-encoding"] == "br"
+        assert brotli.decompress(b"".join(response.iter_raw())) == plain.content
+
+    with test_client.stream("GET", "/openapi.json", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert int(response.headers["content-length"]) < len(plain.content)
+        assert gzip.decompress(b"".join(response.iter_raw())) == plain.content
+
+    small = test_client.get("/", headers={"Accept-Encoding": "br"})
+    assert "content-encoding" not in small.headers
+
+
+def test_compressed_representation_has_own_etag():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=10)
+    etag = '"0123abcd"'
+
+    @app.get("/resource")
+    def read(request: Request):
+        if is_not_modified(request, etag):
+            return not_modified({"ETag": etag})
+        return Response(b"[" + b"1," * 50 + b"1]", media_type="application/json", headers={"ETag": etag})
+
+    @app.put("/resource")
+    def update(request: Request):
+        check_if_match(request, etag)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    client = TestClient(app)
+    assert client.get("/resource", headers={"Accept-Encoding": "identity"}).headers["etag"] == etag
+    compressed = client.get("/resource", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    assert compressed == '"0123abcd-gzip"'
+    assert client.get("/resource", headers={"Accept-Encoding": "br"}).headers["etag"] == '"0123abcd-br"'
+
+    revalidated = client.get("/resource", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed})
+    assert revalidated.status_code == status.HTTP_304_NOT_MODIFIED
+    assert revalidated.headers["etag"] == compressed
+    assert client.put("/resource", headers={"If-Match": compressed}).status_code == status.HTTP_204_NO_CONTENT
+    assert client.put("/resource", headers={"If-Match": '"0123abcd-deflate"'}).status_code == \
+        status.HTTP_412_PRECONDITION_FAILED
@@ -0,0 +1,123 @@
+import io
+import json
+import threading
+import time
+import zipfile
+
+import pytest
+from starlette import status
+
+from src.conf.config import get_settings
+from src.database.models import Comment, Photo, Tag, User
+from src.services import storage
+from src.services.storage import LocalStorage
+
+
+@pytest.fixture(scope="module")
+def exporter(test_client, session, tmp_path_factory):
+    root = tmp_path_factory.mktemp("export-storage")
+    user_data = {"username": "exporter", "email": "exporter@example.com", "password": "exportpassword",
+                 "roles": ["User"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    user = session.query(User).filter(User.email == user_data["email"]).first()
+    tag = Tag(title="exported", user_id=user.id)
+    photos = [Photo(image_url=f"http://testserver/storage/export_{i}.png", public_id=f"export_{i}",
+                    description=f"photo {i}", user_id=user.id) for i in range(7)]
+    session.add_all(photos)
+    session.flush()
+    # тег додаємо після вставки, інакше каскад через backref змінює порядок id
+    for photo in photos[1::2]:
+        photo.tags = [tag]
+    session.add(Comment(text="nice", user_id=user.id, photos_id=photos[1].id))
+    for photo in photos:
+        (root / photo.public_id).write_bytes(f"image {photo.id}".encode())
+    (root / photos[3].public_id).unlink()
+    photos[6].deleted_at = photos[6].created_at
+    session.commit()
+    ids = [photo.id for photo in photos]
+
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    return {"headers": {"Authorization": f"Bearer {response.json()['access_token']}"}, "ids": ids, "root": root}
+
+
+@pytest.fixture(autouse=True)
+def local_storage(exporter, monkeypatch):
+    monkeypatch.setattr(storage, "backend", LocalStorage(str(exporter["root"]), "http://testserver/storage"))
+
+
+def download(test_client, exporter, query: str = ""):
+    response = test_client.get(f"/api/photos/export{query}", headers=exporter["headers"])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/zip"
+    return response, zipfile.ZipFile(io.BytesIO(response.content))
+
+
+def test_export_archive_with_manifest(test_client, exporter):
+    ids = exporter["ids"]
+    response, archive = download(test_client, exporter)
+
+    assert "x-export-next-after-id" not in response.headers
+    assert archive.namelist() == [f"photos/{photo_id}.png" for photo_id in ids[:6] if photo_id != ids[3]] \
+        + ["manifest.json"]
+    assert archive.read(f"photos/{ids[0]}.png") == f"image {ids[0]}".encode()
+
+    manifest = json.loads(archive.read("manifest.json"))
+    assert [photo["id"] for photo in manifest["photos"]] == ids[:6]
+    assert manifest["last_id"] == ids[5]
+    second = manifest["photos"][1]
+    assert (second["description"], second["tags"]) == ("photo 1", ["exported"])
+    assert [comment["text"] for comment in second["comments"]] == ["nice"]
+    assert manifest["photos"][3]["file"] is None
+
+
+def test_export_in_parts_and_resume(test_client, exporter):
+    ids = exporter["ids"]
+    response, archive = download(test_client, exporter, "?limit=2")
+    assert response.headers["x-export-next-after-id"] == str(ids[1])
+    assert [photo["id"] for photo in json.loads(archive.read("manifest.json"))["photos"]] == ids[:2]
+
+    response, archive = download(test_client, exporter, f"?after_id={ids[1]}&limit=2")
+    assert response.headers["x-export-next-after-id"] == str(ids[3])
+    assert archive.namelist() == [f"photos/{ids[2]}.png", "manifest.json"]
+
+    response, archive = download(test_client, exporter, f"?after_id={ids[3]}")
+    assert "x-export-next-after-id" not in response.headers
+    assert [photo["id"] for photo in json.loads(archive.read("manifest.json"))["photos"]] == ids[4:6]
+
+
+def test_export_bounds_concurrent_fetches(test_client, exporter, monkeypatch):
+    monkeypatch.setattr(get_settings(), "export_concurrency", 2)
+    monkeypatch.setattr(get_settings(), "export_page_size", 2)
+    backend = storage.backend
+    lock, running, peak = threading.Lock(), [0], [0]
+
+    def slow_fetch(public_id, url=None):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return LocalStorage.fetch(backend, public_id, url)
+
+    monkeypatch.setattr(backend, "fetch", slow_fetch)
+    _, archive = download(test_client, exporter)
+
+    assert len(archive.namelist()) == 6
+    assert peak[0] == 2
+
+
+def test_export_keeps_no_transaction_open_while_streaming(test_client, exporter, session, monkeypatch):
+    backend = storage.backend
+    in_transaction = []
+
+    def fetch(public_id, url=None):
+        in_transaction.append(session.in_transaction())
+        return LocalStorage.fetch(backend, public_id, url)
+
+    monkeypatch.setattr(backend, "fetch", fetch)
+    _, archive = download(test_client, exporter)
+
+    assert len(in_transaction) == 6 and not any(in_transaction)
+    assert len(json.loads(archive.read("manifest.json"))["photos"]) == 6
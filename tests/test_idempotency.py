@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer, aioredis
+from starlette import status
+
+from src.conf.config import get_settings
+from src.database.models import Comment, Photo, User
+from src.services import idempotency, rate_limit, storage
+from src.services.idempotency import MemoryStore, RedisStore, StoredResponse
+from src.services.rate_limit import MemoryBackend
+from src.services.storage import LocalStorage
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def headers(test_client, session):
+    user_data = {"username": "retrier", "email": "retrier@example.com", "password": "retrierpassword",
+                 "roles": ["User"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(autouse=True)
+def memory_store(monkeypatch):
+    monkeypatch.setattr(idempotency, "store", MemoryStore())
+
+
+def test_photo_upload_retry_is_replayed(test_client, headers, session, tmp_path, monkeypatch):
+    backend = LocalStorage(str(tmp_path), "http://testserver/storage")
+    uploads = []
+    upload = backend.upload
+    monkeypatch.setattr(backend, "upload", lambda *args, **options: uploads.append(1) or upload(*args, **options))
+    monkeypatch.setattr(storage, "backend", backend)
+
+    def post(key: str, image: bytes = b"retried image"):
+        return test_client.post("/api/photos/", headers={**headers, "Idempotency-Key": key},
+                                files={"image": ("cat.png", image)}, data={"description": "retried", "tags": "a,b"})
+
+    first = post("upload-1")
+    assert first.status_code == status.HTTP_201_CREATED
+    retry = post("upload-1")
+    assert retry.status_code == status.HTTP_201_CREATED
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert len(uploads) == 1
+    assert session.query(Photo).filter(Photo.description == "retried").count() == 1
+
+    assert post("upload-1", b"another image").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert post("upload-2").json()["id"] != first.json()["id"]
+    assert len(uploads) == 2
+
+
+def test_comment_retry_is_replayed(test_client, headers, session):
+    user_id = session.query(User.id).filter(User.email == "retrier@example.com").scalar()
+    photo = Photo(image_url="https://example.com/commented.png", description="commented", user_id=user_id)
+    session.add(photo)
+    session.commit()
+    photo_id = photo.id
+
+    def post(key=None, text="first!"):
+        extra = {"Idempotency-Key": key} if key else {}
+        return test_client.post(f"/api/comments/{photo_id}", headers={**headers, **extra}, json={"text": text})
+
+    first = post("comment-1")
+    assert first.status_code == status.HTTP_200_OK
+    assert post("comment-1").json() == first.json()
+    assert post("comment-1", "edited").status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+    assert "Idempotent-Replayed" not in post().headers
+    assert session.query(Comment).filter(Comment.photos_id == photo_id).count() == 2
+
+
+def test_replay_is_not_rate_limited(test_client, headers, session, tmp_path, monkeypatch):
+    config = get_settings()
+    monkeypatch.setattr(config, "rate_limit_enabled", True)
+    monkeypatch.setattr(config, "rate_limit_upload_user", "1/hour")
+    monkeypatch.setattr(config, "rate_limit_comment_user", "1/hour")
+    monkeypatch.setattr(rate_limit, "backend", MemoryBackend())
+    monkeypatch.setattr(storage, "backend", LocalStorage(str(tmp_path), "http://testserver/storage"))
+
+    def upload(key: str):
+        return test_client.post("/api/photos/", headers={**headers, "Idempotency-Key": key},
+                                files={"image": ("limit.png", b"limited image")},
+                                data={"description": "near the limit", "tags": "a"})
+
+    first = upload("limited-upload")
+    assert first.status_code == status.HTTP_201_CREATED
+    # ліміт вичерпано, але повтор отримує збережену відповідь
+    retry = upload("limited-upload")
+    assert (retry.status_code, retry.json()) == (status.HTTP_201_CREATED, first.json())
+    assert upload("another-upload").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    photo_id = first.json()["id"]
+
+    def comment(key: str):
+        return test_client.post(f"/api/comments/{photo_id}", headers={**headers, "Idempotency-Key": key},
+                                json={"text": "near the limit"})
+
+    first = comment("limited-comment")
+    assert first.status_code == status.HTTP_200_OK
+    assert comment("limited-comment").json() == first.json()
+    assert comment("another-comment").status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        store = MemoryStore(max_keys=2, clock=Clock())
+    else:
+        store = RedisStore("redis://fake", poll=0.01, client=aioredis.FakeRedis(server=FakeServer()))
+    store.loop = asyncio.new_event_loop()
+    yield store
+    store.loop.run_until_complete(store.close())
+    store.loop.close()
+
+
+def test_store_serializes_duplicates(store):
+    order = []
+
+    async def request(name: str, delay: float):
+        token = await store.acquire("comment:1:key", timeout=1)
+        order.append(f"{name} started")
+        await asyncio.sleep(delay)
+        order.append(f"{name} finished")
+        await store.release("comment:1:key", token)
+
+    async def scenario():
+        await asyncio.gather(request("first", 0.05), request("retry", 0))
+        with pytest.raises(asyncio.TimeoutError):
+            token = await store.acquire("comment:1:key", timeout=1)
+            await store.acquire("comment:1:key", timeout=0.05)
+        await store.release("comment:1:key", token)
+        assert await store.acquire("comment:1:key", timeout=0.05)
+
+    store.loop.run_until_complete(scenario())
+    assert order == ["first started", "first finished", "retry started", "retry finished"]
+
+
+def test_store_keeps_responses_for_ttl(store):
+    response = StoredResponse("f" * 64, 201, "application/json", b'{"id": 1}')
+
+    async def scenario():
+        await store.set("photo_upload:1:key", response, ttl=60)
+        assert await store.get("photo_upload:1:key") == response
+        assert await store.get("photo_upload:1:other") is None
+
+    store.loop.run_until_complete(scenario())
+
+
+def test_redis_lock_is_renewed_while_request_runs(monkeypatch):
+    store = RedisStore("redis://fake", lock_ttl=0.15, poll=0.01, client=aioredis.FakeRedis(server=FakeServer()))
+
+    async def scenario():
+        token = await store.acquire("photo_upload:1:key", timeout=1)
+        keeper = asyncio.create_task(store.keep("photo_upload:1:key", token))
+        # запит триває довше за ttl замка, але дублікат усе одно чекає
+        with pytest.raises(asyncio.TimeoutError):
+            await store.acquire("photo_upload:1:key", timeout=0.4)
+        keeper.cancel()
+        await store.release("photo_upload:1:key", token)
+        assert await store.acquire("photo_upload:1:key", timeout=0.05)
+        await store.close()
+
+    asyncio.run(scenario())
+
+    monkeypatch.setattr(get_settings(), "idempotency_backend", "redis")
+    monkeypatch.setattr(get_settings(), "idempotency_lock_ttl", 0.0)
+    assert idempotency.get_store().lock_ttl == get_settings().web_timeout
+    monkeypatch.setattr(get_settings(), "idempotency_lock_ttl", 300.0)
+    assert idempotency.get_store().lock_ttl == 300.0
+
+
+def test_memory_store_drops_expired_and_oldest():
+    clock = Clock()
+    store = MemoryStore(max_keys=2, clock=clock)
+    response = StoredResponse("f" * 64, 200, "application/json", b"{}")
+
+    async def scenario():
+        for key in ("a", "b", "c"):
+            await store.set(key, response, ttl=10)
+        assert [await store.get(key) for key in ("a", "b")] == [None, response]
+        clock.now += 10
+        assert await store.get("c") is None
+        await store.set("d", response, ttl=10)
+        assert list(store._responses) == ["d"]
+
+    asyncio.run(scenario())
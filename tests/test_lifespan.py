@@ -0,0 +1,56 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+
+from main import app
+from src.conf.config import get_settings
+from src.database import db
+from src.database.models import Base
+from src.services import lifespan, storage
+from src.services.lifespan import validate_settings
+from src.services.storage import LocalStorage
+
+
+@pytest.fixture
+def fresh_database(monkeypatch, tmp_path):
+    # окрема база, щоб тест не залежав від схеми бази з налаштувань
+    engine = create_engine(f"sqlite:///{tmp_path / 'lifespan.db'}")
+    monkeypatch.setattr(lifespan, "engine", engine)
+    monkeypatch.setattr(storage, "backend", LocalStorage(tmp_path / "storage", "http://testserver/storage"))
+    yield engine
+    engine.dispose()
+
+
+def test_lifespan_warms_up_and_disposes(fresh_database, tmp_path):
+    Base.metadata.create_all(bind=fresh_database)
+
+    with TestClient(app) as client:
+        assert fresh_database.pool.checkedin() >= 1
+        assert (tmp_path / "storage").is_dir()
+        assert client.get("/").status_code == 200
+
+    assert fresh_database.pool.checkedin() == 0
+
+
+def test_database_warm_up_failure_still_warms_up_storage(fresh_database, tmp_path, caplog):
+    # у базі немає таблиць, тож прогрів запитів падає
+    with TestClient(app) as client:
+        assert (tmp_path / "storage").is_dir()
+        assert client.get("/").status_code == 200
+
+    assert "Database warm-up failed" in caplog.text
+
+
+def test_invalid_storage_backend_fails_startup(monkeypatch):
+    monkeypatch.setattr(get_settings(), "storage_backend", "ftp")
+
+    with pytest.raises(RuntimeError, match="STORAGE_BACKEND"):
+        validate_settings()
+
+
+def test_pool_is_replaced_after_fork():
+    pool = db.engine.pool
+
+    db.reset_pool_after_fork()
+
+    assert db.engine.pool is not pool
@@ -0,0 +1,31 @@
+import asyncio
+import logging
+import time
+
+from prometheus_client import REGISTRY
+
+from src.services.loop_monitor import LoopLagMonitor
+
+
+def test_loop_monitor_captures_blocking_stack(caplog):
+    lag_count = REGISTRY.get_sample_value("event_loop_lag_seconds_count") or 0
+
+    def blocking_handler():
+        time.sleep(0.3)
+
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.02, threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_handler()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    with caplog.at_level(logging.WARNING, logger="src.services.loop_monitor"):
+        asyncio.run(scenario())
+
+    assert "Event loop blocked" in caplog.text
+    assert "in blocking_handler" in caplog.text
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_count") > lag_count
+    assert REGISTRY.get_sample_value("event_loop_lag_seconds_bucket", {"le": "0.1"}) < \
+        REGISTRY.get_sample_value("event_loop_lag_seconds_count")
@@ -0,0 +1,53 @@
+import pytest
+from prometheus_client import REGISTRY
+from starlette import status
+
+from src.conf.config import get_settings
+from src.services.metrics import storage_call
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_http_and_db_metrics(test_client):
+    before = sample("http_requests_total", method="GET", route="/api/healthchecker/", status="200")
+    queries_before = sample("db_queries_total", route="/api/healthchecker/")
+
+    assert test_client.get("/api/healthchecker/").status_code == status.HTTP_200_OK
+    test_client.get("/api/photos/does-not-exist/at-all")
+
+    assert sample("http_requests_total", method="GET", route="/api/healthchecker/", status="200") == before + 1
+    assert sample("db_queries_total", route="/api/healthchecker/") == queries_before + 1
+    assert sample("http_request_duration_seconds_count", method="GET", route="unmatched") >= 1
+
+    response = test_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/healthchecker/"' in response.text
+    assert "db_query_duration_seconds_bucket" in response.text
+
+
+def test_metrics_endpoint_is_protected(test_client, monkeypatch):
+    monkeypatch.setattr(get_settings(), "metrics_token", "scraper-token")
+    assert test_client.get("/metrics").status_code == status.HTTP_401_UNAUTHORIZED
+    assert test_client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == \
+        status.HTTP_401_UNAUTHORIZED
+    response = test_client.get("/metrics", headers={"Authorization": "Bearer scraper-token"})
+    assert response.status_code == status.HTTP_200_OK
+
+    monkeypatch.setattr(get_settings(), "metrics_enabled", False)
+    assert test_client.get("/metrics", headers={"Authorization": "Bearer scraper-token"}).status_code == \
+        status.HTTP_404_NOT_FOUND
+
+
+def test_storage_call_metrics():
+    @storage_call("test_failure")
+    def failing():
+        raise RuntimeError("storage is down")
+
+    with pytest.raises(RuntimeError):
+        failing()
+
+    assert sample("storage_call_errors_total", operation="test_failure") == 1
+    assert sample("storage_call_duration_seconds_count", operation="test_failure") == 1
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+from starlette import status
+
+from src.database.models import Comment, Photo, Tag, User
+from src.repository import comments as repository_comments
+
+
+@pytest.fixture(scope="module")
+def editor(test_client, session):
+    user_data = {"username": "editor", "email": "editor@example.com", "password": "editorpassword",
+                 "roles": ["Administrator"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    user = session.query(User).filter(User.email == user_data["email"]).first()
+    photo = Photo(image_url="https://example.com/edited.png", description="original", user_id=user.id)
+    tag = Tag(title="edited", user_id=user.id)
+    session.add_all([photo, tag])
+    session.flush()
+    comment = Comment(text="original", user_id=user.id, photos_id=photo.id)
+    session.add(comment)
+    session.commit()
+    ids = {"photo": photo.id, "tag": tag.id, "comment": comment.id}
+
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    return {"headers": {"Authorization": f"Bearer {response.json()['access_token']}"}, **ids}
+
+
+def test_photo_update_requires_current_etag(test_client, editor):
+    headers, photo_id = editor["headers"], editor["photo"]
+    etag = test_client.get(f"/api/photos/{photo_id}", headers=headers).headers["ETag"]
+
+    response = test_client.put(f"/api/photos/{photo_id}", headers={**headers, "If-Match": etag},
+                               json={"description": "first edit"})
+    assert response.status_code == status.HTTP_200_OK
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+    assert test_client.get(f"/api/photos/{photo_id}", headers=headers).headers["ETag"] == new_etag
+
+    response = test_client.put(f"/api/photos/{photo_id}", headers={**headers, "If-Match": etag},
+                               json={"description": "lost edit"})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    assert response.headers["ETag"] == new_etag
+    assert test_client.get(f"/api/photos/{photo_id}", headers=headers).json()["description"] == "first edit"
+
+    response = test_client.put(f"/api/photos/{photo_id}", headers={**headers, "If-Match": "*"},
+                               json={"description": "any version"})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_tag_and_comment_etags_follow_version(test_client, editor):
+    headers = editor["headers"]
+    tag_url, comment_url = f"/api/tags/{editor['tag']}", f"/api/comments/{editor['comment']}"
+    assert test_client.get(tag_url, headers=headers).headers["ETag"] == '"1"'
+    assert test_client.get(comment_url, headers=headers).headers["ETag"] == '"1"'
+
+    response = test_client.put(tag_url, headers={**headers, "If-Match": '"1"'}, json={"title": "renamed"})
+    assert (response.status_code, response.headers["ETag"]) == (status.HTTP_200_OK, '"2"')
+    response = test_client.put(tag_url, headers={**headers, "If-Match": '"1"'}, json={"title": "stale"})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    response = test_client.put(comment_url, headers={**headers, "If-Match": '"1"'}, json={"text": "edited"})
+    assert (response.status_code, response.headers["ETag"]) == (status.HTTP_200_OK, '"2"')
+    response = test_client.put(comment_url, headers={**headers, "If-Match": 'W/"2"'}, json={"text": "weak"})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+    # без If-Match зміна застосовується до поточної версії
+    response = test_client.put(comment_url, headers=headers, json={"text": "unconditional"})
+    assert (response.status_code, response.headers["ETag"]) == (status.HTTP_200_OK, '"3"')
+
+
+def test_concurrent_edit_is_not_lost(test_client, editor, session, monkeypatch):
+    headers, comment_id = editor["headers"], editor["comment"]
+    etag = test_client.get(f"/api/comments/{comment_id}", headers=headers).headers["ETag"]
+    edit_comment = repository_comments.edit_comment
+
+    async def edit_after_concurrent_change(comment_id, body, db, user):
+        # інший запит читає коментар першим і встигає зберегти свою зміну
+        db.get(Comment, comment_id)
+        with Session(session.get_bind()) as other:
+            other.get(Comment, comment_id).text = "concurrent edit"
+            other.commit()
+        return await edit_comment(comment_id, body, db, user)
+
+    monkeypatch.setattr(repository_comments, "edit_comment", edit_after_concurrent_change)
+    response = test_client.put(f"/api/comments/{comment_id}", headers={**headers, "If-Match": etag},
+                               json={"text": "late edit"})
+    assert response.status_code == status.HTTP_412_PRECONDITION_FAILED
+
+    session.expire_all()
+    comment = session.get(Comment, comment_id)
+    assert (comment.text, comment.version) == ("concurrent edit", int(etag.strip('"')) + 1)
+
+
+def test_stale_session_can_not_overwrite(session, editor):
+    first, second = Session(session.get_bind()), Session(session.get_bind())
+    first.get(Tag, editor["tag"]).title = "first writer"
+    second.get(Tag, editor["tag"]).title = "second writer"
+    first.commit()
+    with pytest.raises(StaleDataError):
+        second.commit()
+    first.close()
+    second.close()
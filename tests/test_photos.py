@@ -0,0 +1,271 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from starlette import status
+
+from src.database.models import Comment, Photo, Tag, User
+from src.services import storage
+from src.services.purge import PhotoPurgeWorker
+from src.services.storage import LocalStorage
+
+
+@pytest.fixture(scope="module")
+def photo_user(test_client, session):
+    user_data = {
+        "username": "photographer",
+        "email": "photographer@example.com",
+        "password": "photopassword",
+        "roles": ["User"],
+        "is_active": True
+    }
+    response = test_client.post("/api/auth/signup", json=user_data)
+    assert response.status_code == status.HTTP_201_CREATED
+
+    user = session.query(User).filter(User.email == user_data["email"]).first()
+    tags = [Tag(title=f"tag{i}", user_id=user.id) for i in range(3)]
+    for i in range(5):
+        session.add(Photo(image_url=f"https://example.com/photo_{i}.png", description=f"photo {i}",
+                          user_id=user.id, public_id=f"photo_{i}", tags=tags[:i % 3 + 1]))
+    session.commit()
+    return user_data
+
+
+@pytest.fixture(scope="module")
+def headers(test_client, photo_user):
+    response = test_client.post("/api/auth/login",
+                                data={"username": photo_user["email"], "password": photo_user["password"]})
+    assert response.status_code == status.HTTP_200_OK
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_get_user_photos(test_client, headers):
+    response = test_client.get("/api/photos/", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    photos = response.json()["photos"]
+    assert len(photos) == 5
+    assert photos[0]["image_url"] == "https://example.com/photo_0.png"
+    assert [tag["title"] for tag in photos[2]["tags"]] == ["tag0", "tag1", "tag2"]
+
+    response = test_client.get("/api/photos/?skip=4&limit=10", headers=headers)
+    assert [photo["description"] for photo in response.json()["photos"]] == ["photo 4"]
+
+
+def test_get_user_photo_by_id(test_client, headers):
+    photo_id = test_client.get("/api/photos/", headers=headers).json()["photos"][1]["id"]
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["description"] == "photo 1"
+    assert len(response.json()["tags"]) == 2
+
+    response = test_client.get("/api/photos/9999", headers=headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_photo_conditional_requests(test_client, headers):
+    photo_id = test_client.get("/api/photos/", headers=headers).json()["photos"][0]["id"]
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers=headers)
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers={**headers, "If-None-Match": '"stale"'})
+    assert response.status_code == status.HTTP_200_OK
+
+    list_etag = test_client.get("/api/photos/", headers=headers).headers["etag"]
+    response = test_client.get("/api/photos/", headers={**headers, "If-None-Match": list_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = test_client.put(f"/api/photos/{photo_id}", json={"description": "changed", "tags": ["tag0"]},
+                               headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = test_client.get(f"/api/photos/{photo_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+    response = test_client.get("/api/photos/", headers={**headers, "If-None-Match": list_etag})
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_photo_sparse_fields(test_client, headers):
+    response = test_client.get("/api/photos/?fields=image_url", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    photos = response.json()["photos"]
+    assert len(photos) == 5
+    assert set(photos[0]) == {"id", "image_url"}
+
+    response = test_client.get("/api/photos/?fields=description,tags", headers=headers)
+    photos = response.json()["photos"]
+    assert set(photos[2]) == {"id", "description", "tags"}
+    assert [tag["title"] for tag in photos[2]["tags"]] == ["tag0", "tag1", "tag2"]
+
+    response = test_client.get(f"/api/photos/{photos[1]['id']}?fields=tags", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()) == {"id", "tags"}
+    etag = response.headers["etag"]
+    assert etag != test_client.get(f"/api/photos/{photos[1]['id']}", headers=headers).headers["etag"]
+
+    response = test_client.get(f"/api/photos/{photos[1]['id']}?fields=tags",
+                               headers={**headers, "If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    list_etag = test_client.get("/api/photos/?fields=image_url", headers=headers).headers["etag"]
+    response = test_client.get("/api/photos/?fields=image_url", headers={**headers, "If-None-Match": list_etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = test_client.get("/api/photos/?fields=image_url,password", headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_user_photos_batch(test_client, headers, session):
+    photo_ids = [photo["id"] for photo in test_client.get("/api/photos/", headers=headers).json()["photos"]]
+    stranger = User(username="stranger", email="stranger@example.com", password="x", roles="User", is_active=True)
+    session.add(stranger)
+    session.flush()
+    foreign = Photo(image_url="https://example.com/foreign.png", description="foreign", user_id=stranger.id)
+    session.add(foreign)
+    session.commit()
+
+    ids = [photo_ids[3], 9999, photo_ids[1], foreign.id, photo_ids[3]]
+    response = test_client.get(f"/api/photos/batch?ids={','.join(map(str, ids))}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    items = response.json()["photos"]
+    assert [(item["id"], item["found"]) for item in items] == [
+        (photo_ids[3], True), (9999, False), (photo_ids[1], True), (foreign.id, False)
+    ]
+    assert items[0]["photo"]["description"] == "photo 3"
+    assert len(items[2]["photo"]["tags"]) == 2
+    assert items[1]["photo"] is None
+
+    assert test_client.get("/api/photos/batch?ids=1,x", headers=headers).status_code == status.HTTP_400_BAD_REQUEST
+    too_many = ",".join(str(i) for i in range(101))
+    assert test_client.get(f"/api/photos/batch?ids={too_many}", headers=headers).status_code == 400
+
+
+def test_create_transform_delete_photo(test_client, headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "backend", LocalStorage(str(tmp_path), "http://testserver/storage"))
+
+    response = test_client.post("/api/photos/", headers=headers, files={"image": ("cat.png", b"image bytes")},
+                                data={"description": "uploaded", "tags": "cats,pets"})
+    assert response.status_code == status.HTTP_201_CREATED
+    photo = response.json()
+    assert [tag["title"] for tag in photo["tags"]] == ["cats", "pets"]
+    public_id = photo["image_url"].rsplit("/", 1)[1]
+    assert (tmp_path / public_id).read_bytes() == b"image bytes"
+
+    transformation = {
+        "circle": {}, "effect": {}, "text": {}, "rotate": {},
+        "resize": {"use_filter": True, "crop": True, "height": 100, "width": 100},
+    }
+    response = test_client.patch(f"/api/photos/transformation?photo_id={photo['id']}", headers=headers,
+                                 json=transformation)
+    assert response.status_code == status.HTTP_200_OK
+    assert (tmp_path / "PhotoshareApp_tr" / public_id).exists()
+
+    response = test_client.post(f"/api/photos/create_link_for_transformation?photo_id={photo['id']}",
+                                headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert (tmp_path / "PhotoshareApp_tr" / f"{public_id}_qr").read_bytes().startswith(b"\x89PNG")
+
+    response = test_client.delete(f"/api/photos/{photo['id']}", headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+    assert test_client.get(f"/api/photos/{photo['id']}", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+    assert photo["id"] not in [item["id"] for item in test_client.get("/api/photos/", headers=headers).json()["photos"]]
+    assert test_client.delete(f"/api/photos/{photo['id']}", headers=headers).status_code == status.HTTP_404_NOT_FOUND
+    # файли прибирає фоновий purge, а не запит
+    assert (tmp_path / public_id).exists()
+
+
+def test_purge_removes_deleted_photos(test_client, headers, session, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "backend", LocalStorage(str(tmp_path), "http://testserver/storage"))
+    worker = PhotoPurgeWorker(lambda: Session(session.get_bind()), batch_size=2, pause=0, grace=0)
+    asyncio.run(worker.run_once())
+    user_id = session.query(User.id).filter(User.email == "photographer@example.com").scalar()
+    photos = [Photo(image_url=f"https://example.com/purge_{i}.png", description="purged", user_id=user_id,
+                    public_id=f"purge_{i}", tags=[Tag(title=f"purge{i}", user_id=user_id)]) for i in range(5)]
+    session.add_all(photos)
+    session.flush()
+    session.add(Comment(text="purged", user_id=user_id, photos_id=photos[0].id))
+    session.commit()
+    for photo in photos:
+        (tmp_path / photo.public_id).write_bytes(b"image")
+    ids = [photo.id for photo in photos]
+    for photo_id in ids[:4]:
+        assert test_client.delete(f"/api/photos/{photo_id}", headers=headers).status_code == status.HTTP_200_OK
+
+    assert asyncio.run(worker.run_once()) == 4
+
+    session.expire_all()
+    assert [photo_id for (photo_id,) in session.query(Photo.id).filter(Photo.id.in_(ids))] == [ids[4]]
+    assert session.query(Comment).filter(Comment.photos_id == ids[0]).count() == 0
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["purge_4"]
+
+
+def test_purge_retries_photos_left_in_storage(test_client, headers, session, monkeypatch):
+    user_id = session.query(User.id).filter(User.email == "photographer@example.com").scalar()
+    photo = Photo(image_url="https://example.com/stuck.png", description="stuck", user_id=user_id, public_id="stuck")
+    session.add(photo)
+    session.commit()
+    photo_id = photo.id
+    assert test_client.delete(f"/api/photos/{photo_id}", headers=headers).status_code == status.HTTP_200_OK
+
+    def unavailable(public_id):
+        raise ConnectionError("storage is down")
+
+    monkeypatch.setattr(storage.backend, "destroy", unavailable)
+    worker = PhotoPurgeWorker(lambda: Session(session.get_bind()), pause=0, grace=0)
+    assert worker.purge_batch().failed == 1
+    session.expire_all()
+    assert session.get(Photo, photo_id) is not None
+
+    monkeypatch.undo()
+    monkeypatch.setattr(storage, "backend", LocalStorage("/nonexistent-purge-root", "http://testserver/storage"))
+    assert worker.purge_batch().purged == 1
+
+
+def test_purge_removes_images_outside_transaction(test_client, headers, session, monkeypatch):
+    user_id = session.query(User.id).filter(User.email == "photographer@example.com").scalar()
+    photos = [Photo(image_url=f"https://example.com/claimed_{i}.png", description="claimed", user_id=user_id,
+                    public_id=f"claimed_{i}")
+              for i in range(2)]
+    session.add_all(photos)
+    session.commit()
+    ids = [photo.id for photo in photos]
+    for photo_id in ids:
+        assert test_client.delete(f"/api/photos/{photo_id}", headers=headers).status_code == status.HTTP_200_OK
+
+    destroyed = []
+
+    def destroy(public_id):
+        # заявку вже закомічено, і інший сеанс може писати в таблицю, поки файли видаляються
+        original = public_id.removeprefix("PhotoshareApp_tr/").removesuffix("_qr")
+        with Session(session.get_bind()) as other:
+            assert other.query(Photo.purge_claimed_at).filter(Photo.public_id == original).scalar() is not None
+            other.execute(update(Photo).where(Photo.id.in_(ids)).values(description="edited meanwhile"))
+            other.commit()
+        destroyed.append(public_id)
+
+    monkeypatch.setattr(storage, "destroy", destroy)
+    worker = PhotoPurgeWorker(lambda: Session(session.get_bind()), batch_size=1, pause=0, grace=0)
+    # фото, яке взяв на видалення воркер, що впав, чекає, поки спливе заявка
+    session.execute(update(Photo).where(Photo.id == ids[1]).values(purge_claimed_at=datetime.utcnow()))
+    session.commit()
+
+    assert worker.purge_batch().purged == 1
+    assert worker.purge_batch().last_id is None
+    session.expire_all()
+    assert session.get(Photo, ids[0]) is None and session.get(Photo, ids[1]) is not None
+
+    worker.claim_ttl = 0
+    assert worker.purge_batch().purged == 1
+    assert destroyed[::3] == ["claimed_0", "claimed_1"]
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+from starlette import status
+
+from src.database.models import User
+
+
+@pytest.fixture(scope="module")
+def tokens(test_client, session):
+    tokens = {}
+    for role in ("Administrator", "User"):
+        user_data = {"username": role, "email": f"{role.lower()}@profile.com", "password": "profilepassword",
+                     "roles": [role], "is_active": True}
+        assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+        response = test_client.post("/api/auth/login",
+                                    data={"username": user_data["email"], "password": user_data["password"]})
+        tokens[role] = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return tokens
+
+
+def test_profile_request(test_client, tokens):
+    response = test_client.get("/api/photos/?profile=speedscope", headers=tokens["Administrator"])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["x-profiled-status"] == "200"
+    assert response.headers["x-profile-scope"].startswith("event loop thread only")
+    assert "speedscope" in json.loads(response.content)["$schema"]
+
+    response = test_client.get("/api/photos/?profile=html", headers=tokens["Administrator"])
+    assert response.headers["content-type"].startswith("text/html")
+    assert "pyinstrument" in response.text
+
+    response = test_client.get("/api/photos/?profile=html", headers=tokens["User"])
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = test_client.get("/api/photos/?profile=html")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = test_client.get("/api/photos/?profile=other", headers=tokens["User"])
+    assert response.json() == {"photos": []}
@@ -0,0 +1,89 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+from starlette import status
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from src.database.models import Comment, Photo, Tag, User
+from src.services.queries import QueryStatsMiddleware, instrument_engine
+
+
+@pytest.fixture(scope="module")
+def headers(test_client, session):
+    user_data = {"username": "budget", "email": "budget@example.com", "password": "budgetpassword",
+                 "roles": ["User"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    user = session.query(User).filter(User.email == user_data["email"]).first()
+    tags = [Tag(title=f"budget{i}", user_id=user.id) for i in range(4)]
+    photos = [Photo(image_url=f"https://example.com/{i}.png", description=f"budget photo {i}",
+                    user_id=user.id, tags=tags[:i % 4 + 1]) for i in range(20)]
+    session.add_all(photos)
+    session.flush()
+    session.add_all(Comment(text=f"comment {i}", user_id=user.id, photos_id=photos[i].id) for i in range(20))
+    session.commit()
+    user_id = user.id
+
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    return {"Authorization": f"Bearer {response.json()['access_token']}", "user_id": str(user_id)}
+
+
+# автентифікація береться з claims токена, тож бюджет не містить запиту користувача
+@pytest.mark.parametrize("url, budget", [
+    ("/api/photos/?limit=20", 2),
+    ("/api/photos/?limit=20&fields=id,image_url", 1),
+    ("/api/photos/?limit=20&fields=id,tags", 2),
+    ("/api/photos/batch?ids=1,2,3,4,5,6,7,8,9,10", 2),
+    ("/api/photos/1", 2),
+    ("/api/comments/all/{user_id}", 1),
+    ("/api/tags/my/", 1),
+])
+def test_endpoint_query_budget(test_client, headers, max_queries, url, budget):
+    auth = {"Authorization": headers["Authorization"]}
+    with max_queries(budget):
+        response = test_client.get(url.format(user_id=headers["user_id"]), headers=auth)
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_debug_query_headers():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+
+    def endpoint(request):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            connection.execute(text("SELECT 2"))
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/", endpoint)])
+    response = TestClient(QueryStatsMiddleware(app, debug=True)).get("/")
+    assert response.headers["x-db-query-count"] == "2"
+    assert float(response.headers["x-db-time-ms"]) >= 0
+
+    response = TestClient(QueryStatsMiddleware(app, debug=False)).get("/")
+    assert "x-db-query-count" not in response.headers
+
+
+def test_slow_query_log(caplog):
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, slow_query_threshold_ms=0)
+    with caplog.at_level(logging.WARNING, logger="src.services.queries"):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT   1"))
+    assert "Slow query" in caplog.text
+    assert "SELECT 1" in caplog.text
+
+
+def test_failed_queries_leave_nothing_on_connection():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    with engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(Exception):
+                connection.execute(text("SELECT * FROM missing_table"))
+        assert connection.execute(text("SELECT 1")).scalar() == 1
+        assert "query_start_time" not in connection.connection.info
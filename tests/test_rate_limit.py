@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fakeredis import FakeServer, aioredis
+from starlette import status
+
+from src.conf.config import get_settings
+from src.services import rate_limit
+from src.services.rate_limit import MemoryBackend, RedisBackend, parse_limit
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def hits(backend, count: int, limit: int = 3, window: int = 10) -> list:
+    async def scenario():
+        return [await backend.hit("login:ip:10.0.0.1", limit, window) for _ in range(count)]
+    return backend.loop.run_until_complete(scenario())
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    clock = Clock()
+    if request.param == "memory":
+        backend = MemoryBackend(clock=clock)
+    else:
+        backend = RedisBackend("redis://fake", clock=clock, client=aioredis.FakeRedis(server=FakeServer()))
+    # клієнт redis прив'язаний до свого циклу подій
+    backend.loop = asyncio.new_event_loop()
+    yield backend
+    backend.loop.run_until_complete(backend.close())
+    backend.loop.close()
+
+
+def test_parse_limit():
+    assert parse_limit("5/minute") == (5, 60)
+    assert parse_limit("100 / 10 seconds") == (100, 10)
+    with pytest.raises(ValueError):
+        parse_limit("5/fortnight")
+    with pytest.raises(ValueError):
+        parse_limit("0/minute")
+
+
+def test_window_blocks_over_limit(backend):
+    results = hits(backend, 4)
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    # запити попереднього вікна вважаються рівномірними, тож місце звільняється вже в наступному
+    assert 10 < results[-1].retry_after <= 20
+
+
+def test_window_slides(backend):
+    hits(backend, 3)
+    # через 4 секунди наступного вікна три попередні запити ще важать 1.8
+    backend.clock.now += 14
+    assert [result.allowed for result in hits(backend, 2)] == [True, False]
+
+    backend.clock.now += 6
+    assert [result.allowed for result in hits(backend, 3)] == [True, True, False]
+
+    backend.clock.now += 20
+    assert [result.allowed for result in hits(backend, 4)] == [True, True, True, False]
+
+
+def test_denied_requests_are_not_counted(backend):
+    denied = hits(backend, 10)[-1]
+
+    backend.clock.now += denied.retry_after
+    assert hits(backend, 1)[0].allowed
+
+
+def test_memory_backend_bounds_tracked_keys():
+    clock = Clock()
+    backend = MemoryBackend(max_keys=2, clock=clock)
+
+    async def scenario():
+        for client in ("a", "b", "c"):
+            await backend.hit(client, 1, 10)
+
+    asyncio.run(scenario())
+    assert list(backend._counters) == ["b", "c"]
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    config = get_settings()
+    monkeypatch.setattr(config, "rate_limit_enabled", True)
+    monkeypatch.setattr(config, "rate_limit_login_ip", "4/minute")
+    monkeypatch.setattr(config, "rate_limit_login_account", "2/minute")
+    monkeypatch.setattr(rate_limit, "backend", MemoryBackend())
+    return config
+
+
+def test_login_limited_per_account(test_client, limits):
+    credentials = {"username": "nobody@example.com", "password": "wrong"}
+    for _ in range(2):
+        response = test_client.post("/api/auth/login", data=credentials)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = test_client.post("/api/auth/login", data=credentials)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.headers["X-RateLimit-Limit"] == "2"
+
+    # інший обліковий запис ще має спроби, але ліміт адреси вже вичерпано
+    response = test_client.post("/api/auth/login", data={"username": "other@example.com", "password": "wrong"})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = test_client.post("/api/auth/login", data={"username": "third@example.com", "password": "wrong"})
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    metrics = test_client.get("/metrics").text
+    assert 'rate_limit_requests_total{key="account",result="limited",scope="login"}' in metrics
+    assert 'rate_limit_requests_total{key="ip",result="limited",scope="login"}' in metrics
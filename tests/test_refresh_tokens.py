@@ -0,0 +1,68 @@
+import pytest
+from starlette import status
+
+from src.database.models import RefreshToken
+from src.repository.tokens import hash_token
+from src.services.auth import auth_service
+
+
+@pytest.fixture(scope="module")
+def refresh_user(test_client):
+    user_data = {"username": "refresher", "email": "refresher@example.com", "password": "refreshpassword",
+                 "roles": ["User"], "is_active": True}
+    assert test_client.post("/api/auth/signup", json=user_data).status_code == status.HTTP_201_CREATED
+    return user_data
+
+
+def login(test_client, user_data) -> dict:
+    response = test_client.post("/api/auth/login",
+                                data={"username": user_data["email"], "password": user_data["password"]})
+    assert response.status_code == status.HTTP_200_OK
+    return response.json()
+
+
+def test_refresh_rotates_tokens_without_bcrypt(test_client, refresh_user, session, monkeypatch):
+    tokens = login(test_client, refresh_user)
+    stored = session.query(RefreshToken).filter(RefreshToken.token_hash == hash_token(tokens["refresh_token"])).one()
+    assert stored.token_hash != tokens["refresh_token"]
+
+    def no_bcrypt(*args, **kwargs):
+        raise AssertionError("refresh must not verify the password")
+
+    monkeypatch.setattr(auth_service.pwd_context, "verify", no_bcrypt)
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert response.status_code == status.HTTP_200_OK
+    refreshed = response.json()
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert test_client.get("/api/tags/my/", headers=headers).status_code == status.HTTP_200_OK
+
+
+def test_reused_refresh_token_revokes_family(test_client, refresh_user):
+    first = login(test_client, refresh_user)["refresh_token"]
+    second = test_client.post("/api/auth/refresh", json={"refresh_token": first}).json()["refresh_token"]
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": first})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": second})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_password_change_invalidates_refresh_tokens(test_client, refresh_user):
+    tokens = login(test_client, refresh_user)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    update = {"email": refresh_user["email"], "username": refresh_user["username"],
+              "password": refresh_user["password"]}
+    assert test_client.put("/api/users/edit", json=update, headers=headers).status_code == status.HTTP_200_OK
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_unknown_refresh_token(test_client):
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": "not-a-token"})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,38 @@
+import logging
+
+from gunicorn.config import Config
+
+from src.conf import server
+from src.conf.config import get_settings
+
+
+def test_gunicorn_config_uses_uvicorn_worker_with_limits():
+    config = Config()
+    for name in ("bind", "workers", "worker_class", "keepalive", "backlog", "max_requests",
+                 "max_requests_jitter", "timeout", "graceful_timeout", "forwarded_allow_ips"):
+        config.set(name, getattr(server, name))
+
+    assert config.worker_class is server.Worker
+    assert config.workers >= 1
+    assert config.max_requests > 0 and config.max_requests_jitter > 0
+    assert config.forwarded_allow_ips == ["127.0.0.1"]
+    assert server.Worker.CONFIG_KWARGS["timeout_graceful_shutdown"] == config.graceful_timeout
+
+
+def test_memory_idempotency_store_warns_with_several_workers(monkeypatch, caplog):
+    class Master:
+        log = logging.getLogger("gunicorn.error")
+
+    monkeypatch.setattr(get_settings(), "idempotency_backend", "memory")
+    monkeypatch.setattr(server, "workers", 1)
+    server.on_starting(Master)
+    assert "IDEMPOTENCY_BACKEND" not in caplog.text
+
+    monkeypatch.setattr(server, "workers", 4)
+    server.on_starting(Master)
+    assert "IDEMPOTENCY_BACKEND=memory does not protect against duplicates with 4 workers" in caplog.text
+
+    caplog.clear()
+    monkeypatch.setattr(get_settings(), "idempotency_backend", "redis")
+    server.on_starting(Master)
+    assert "IDEMPOTENCY_BACKEND" not in caplog.text
@@ -0,0 +1,46 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# запас на повільні CI-машини, перевизначається змінною STARTUP_BUDGET_MS
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", 4000))
+LAZY_MODULES = ("cloudinary", "qrcode", "PIL", "pyinstrument", "uvicorn")
+
+
+def run_python(code: str, **env) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, **env})
+
+
+def test_heavy_dependencies_are_imported_lazily():
+    result = run_python(f"import sys, main; print([m for m in {LAZY_MODULES!r} if m in sys.modules])")
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_settings_are_read_on_first_use(tmp_path):
+    # без обов'язкових змінних і без .env імпорт має пройти, помилка можлива лише під час читання
+    env = {name: value for name, value in os.environ.items()
+           if not name.startswith(("SQLALCHEMY_", "CLOUDINARY_"))}
+    code = "from src.conf.config import settings\ntry:\n    settings.debug\nexcept Exception:\n    print('deferred')"
+    result = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, capture_output=True, text=True,
+                            env={**env, "PYTHONPATH": str(ROOT)})
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "deferred"
+
+
+def test_startup_within_budget():
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        result = run_python("import main")
+        timings.append((time.perf_counter() - started) * 1000)
+        assert result.returncode == 0, result.stderr
+
+    assert statistics.median(timings) < STARTUP_BUDGET_MS